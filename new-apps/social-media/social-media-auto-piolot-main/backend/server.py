@@ -1,16 +1,36 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Generic, TypeVar, Union
+from datetime import datetime, timezone, timedelta
 import os
+import asyncio
+import codecs
+import json
 import logging
 import uuid
-from services.content_safety import content_safety
-from services.viral_predictor import viral_predictor
+from services.content_safety import content_safety, safety_batch_checker
+from services.viral_predictor import FEATURES, viral_predictor
+from services.online_trainer import online_trainer
+from services.uniqueness_index import uniqueness_index
+from services.timing_tables import timing_tables
+from services.model_artifacts import model_registry
+from services.performance_rollups import performance_rollups
+from services.index_manager import index_manager
+from services.snapshot_cache import SnapshotCache
+from services.trend_scanner import TRENDS_COUNTER
+from services.pagination import paginate, encode_cursor, decode_cursor, InvalidCursorError, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.capability_search import capability_search
+from services.affiliate_engine import affiliate_engine
+from services.publishing_worker import PublishingWorker, HttpPlatformPublisher
+from services.webhook_ingest import webhook_ingestor
+from services.metrics_store import metrics_store
+from services.job_queue import job_queue, JobWorker
+from pymongo import ReturnDocument
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -55,6 +75,8 @@ class TrendItem(BaseModel):
     risk_flags: List[str] = []
     audience_fit_score: float = 0.0
     suggested_angles: List[str] = []
+    sources: List[str] = []  # every source that reported this trend after deduplication
+    fingerprint: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class VideoDraft(BaseModel):
@@ -94,6 +116,7 @@ class AffiliateOffer(BaseModel):
     epc: Optional[float] = None
     url: str
     rules: Optional[str] = None
+    keywords: List[str] = []
     reputation_score: float = 5.0
     enabled: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -108,6 +131,10 @@ class Capability(BaseModel):
     tags: List[str] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CapabilityHit(Capability):
+    score: Optional[float] = None  # BM25 relevance, only set for searches
+    highlights: Dict[str, str] = {}  # field: snippet with <mark> around matched terms
+
 class PlatformCredential(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -140,6 +167,12 @@ class DailyDirective(BaseModel):
     avoid_topics: List[str] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T] = []
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
 # ==================== AUTH ====================
 
 @api_router.post("/auth/register")
@@ -188,27 +221,45 @@ async def login(credentials: UserLogin):
 
 # ==================== DASHBOARD ====================
 
+async def load_dashboard_snapshot() -> Dict[str, Any]:
+    """Run the independent dashboard queries concurrently"""
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    pending_videos, scheduled_posts, trends_count, recent_posts = await asyncio.gather(
+        db.video_drafts.count_documents({"status": "pending_approval"}),
+        db.post_plans.count_documents({"status": "scheduled"}),
+        # Today's trend brief (the dashboard shows at most 10)
+        db.trends.count_documents({"date": today}, limit=10),
+        # Recent analytics
+        db.post_plans.find(
+            {"status": "published"},
+            {"_id": 0}
+        ).sort("posted_at", -1).limit(5).to_list(5)
+    )
+    return {
+        "pending_videos": pending_videos,
+        "scheduled_posts": scheduled_posts,
+        "trends_count": trends_count,
+        "recent_posts": recent_posts
+    }
+
+async def dashboard_snapshot_version() -> int:
+    """Trend scans run in the worker process; their counter bump reaches this process's snapshot"""
+    counter = await db.counters.find_one({'name': TRENDS_COUNTER}, {'_id': 0, 'version': 1})
+    return (counter or {}).get('version', 0)
+
+# Invalidated on every write to video_drafts, post_plans or trends
+dashboard_snapshot = SnapshotCache(
+    load_dashboard_snapshot,
+    ttl_seconds=float(os.environ.get('DASHBOARD_SNAPSHOT_TTL', '5')),
+    version=dashboard_snapshot_version
+)
+
 @api_router.get("/dashboard/status")
 async def get_dashboard_status():
     try:
-        pending_videos = await db.video_drafts.count_documents({"status": "pending_approval"})
-        scheduled_posts = await db.post_plans.count_documents({"status": "scheduled"})
-        
-        # Get today's trend brief
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        trends = await db.trends.find({"date": today}, {"_id": 0}).to_list(10)
-        
-        # Get recent analytics
-        recent_posts = await db.post_plans.find(
-            {"status": "published"}, 
-            {"_id": 0}
-        ).sort("posted_at", -1).limit(5).to_list(5)
-        
+        snapshot = await dashboard_snapshot.get()
         return {
-            "pending_videos": pending_videos,
-            "scheduled_posts": scheduled_posts,
-            "trends_count": len(trends),
-            "recent_posts": recent_posts,
+            **snapshot,
             "last_generation": datetime.now(timezone.utc).isoformat()
         }
     except Exception as e:
@@ -228,59 +279,31 @@ async def get_daily_trends():
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/trends/scan")
-async def trigger_trend_scan(background_tasks: BackgroundTasks):
+async def trigger_trend_scan():
     try:
-        # Trigger trend scanning in background
-        background_tasks.add_task(scan_trends_task)
-        return {"message": "Trend scanning initiated"}
+        # Runs on a job worker process (python worker.py), not in the API event loop
+        job = await job_queue.enqueue(db, 'scan_trends')
+        return {"message": "Trend scanning initiated", "job_id": job['id'], "deduplicated": job['deduplicated']}
     except Exception as e:
         logger.error(f"Trigger scan error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def scan_trends_task():
-    """Background task to scan trends"""
-    logger.info("Starting trend scan...")
-    # This will be implemented with actual trend scanning logic
-    # For now, create sample trends
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    
-    sample_trends = [
-        TrendItem(
-            source="youtube",
-            title="AI Automation for Small Business",
-            summary="Trending topic about AI automation tools for entrepreneurs",
-            tags=["AI", "automation", "business"],
-            audience_fit_score=9.2,
-            suggested_angles=["How AI reduces burnout", "Systems that work while you sleep"]
-        ),
-        TrendItem(
-            source="tiktok",
-            title="Gen X Catching Up with Tech",
-            summary="Content about Gen X learning modern productivity tools",
-            tags=["tech", "productivity", "gen-x"],
-            audience_fit_score=8.5,
-            suggested_angles=["It's not too late to automate", "Tools your kids already use"]
-        )
-    ]
-    
-    for trend in sample_trends:
-        doc = trend.model_dump()
-        doc['date'] = today
-        doc['created_at'] = doc['created_at'].isoformat()
-        await db.trends.insert_one(doc)
-    
-    logger.info(f"Trend scan complete: {len(sample_trends)} trends saved")
-
 # ==================== VIDEO DRAFTS ====================
 
-@api_router.get("/videos/queue", response_model=List[VideoDraft])
-async def get_video_queue():
+@api_router.get("/videos/queue", response_model=Page[VideoDraft])
+async def get_video_queue(cursor: Optional[str] = None,
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     try:
-        videos = await db.video_drafts.find(
-            {"status": "pending_approval"}, 
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(100)
-        return videos
+        return await paginate(
+            db.video_drafts,
+            {"status": "pending_approval"},
+            sort_field="created_at",
+            direction=-1,
+            cursor=cursor,
+            limit=limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get queue error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -292,6 +315,7 @@ async def approve_video(video_id: str):
             {"id": video_id},
             {"$set": {"status": "approved", "updated_at": datetime.now(timezone.utc).isoformat()}}
         )
+        dashboard_snapshot.invalidate()
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Video not found")
@@ -310,6 +334,7 @@ async def reject_video(video_id: str):
             {"id": video_id},
             {"$set": {"status": "rejected", "updated_at": datetime.now(timezone.utc).isoformat()}}
         )
+        dashboard_snapshot.invalidate()
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Video not found")
@@ -322,37 +347,101 @@ async def reject_video(video_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/videos/generate")
-async def trigger_video_generation(background_tasks: BackgroundTasks):
+async def trigger_video_generation():
     try:
-        background_tasks.add_task(generate_videos_task)
-        return {"message": "Video generation initiated"}
+        job = await job_queue.enqueue(db, 'generate_videos')
+        return {"message": "Video generation initiated", "job_id": job['id'], "deduplicated": job['deduplicated']}
     except Exception as e:
         logger.error(f"Trigger generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def generate_videos_task():
-    """Background task to generate videos"""
-    logger.info("Starting video generation...")
-    # Placeholder - will be implemented with actual generation logic
-    logger.info("Video generation complete")
+@api_router.post("/videos/render/{video_id}")
+async def trigger_video_render(video_id: str):
+    """Re-render one draft after an edit; only changed scenes are re-encoded"""
+    try:
+        job = await job_queue.enqueue(db, 'render_video', {"video_id": video_id})
+        return {"message": "Video render initiated", "job_id": job['id'], "deduplicated": job['deduplicated']}
+    except Exception as e:
+        logger.error(f"Trigger render error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== JOBS ====================
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, progress and result"""
+    try:
+        job = await job_queue.get(db, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get job error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/jobs")
+async def list_jobs(status: Optional[str] = None,
+                    cursor: Optional[str] = None,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Most recent jobs first, optionally filtered by status"""
+    try:
+        query = {"status": status} if status else {}
+        return await paginate(db.jobs, query, sort_field="created_at", direction=-1, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"List jobs error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 # ==================== SCHEDULE ====================
 
-@api_router.get("/schedule/posts", response_model=List[PostPlan])
-async def get_scheduled_posts():
+@api_router.get("/schedule/posts", response_model=Page[PostPlan])
+async def get_scheduled_posts(cursor: Optional[str] = None,
+                              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     try:
-        posts = await db.post_plans.find(
-            {}, 
-            {"_id": 0}
-        ).sort("scheduled_time", 1).to_list(100)
-        return posts
+        return await paginate(
+            db.post_plans,
+            {},
+            sort_field="scheduled_time",
+            direction=1,
+            cursor=cursor,
+            limit=limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get schedule error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def suggest_slots(platform: str, count: int) -> List[Dict[str, Any]]:
+    """Best hours in the coming week from the platform's timing table, skipping hours already booked there"""
+    await timing_tables.ensure_fresh(db)
+    now = datetime.now(timezone.utc)
+    booked = await db.post_plans.find(
+        {"platform": platform, "status": "scheduled",
+         "scheduled_time": {"$gte": now.isoformat(), "$lt": (now + timedelta(days=8)).isoformat()}},
+        {"_id": 0, "scheduled_time": 1}
+    ).to_list(None)
+    taken = [datetime.fromisoformat(booked_plan['scheduled_time']) for booked_plan in booked]
+    return timing_tables.best_slots(platform, after=now, count=count, taken=taken)
+
+@api_router.get("/schedule/suggest")
+async def get_schedule_suggestions(platform: str, count: int = Query(3, ge=1, le=24)):
+    """Free posting hours ranked by the learned timing table"""
+    try:
+        return {"platform": platform, "slots": await suggest_slots(platform, count)}
+    except Exception as e:
+        logger.error(f"Schedule suggestion error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/schedule/create")
-async def create_schedule(plan: PostPlan):
+async def create_schedule(plan: PostPlan, auto_slot: bool = False):
     try:
+        if auto_slot:
+            # Replace the requested time with the best free slot for the platform
+            plan.scheduled_time = (await suggest_slots(plan.platform, 1))[0]['scheduled_time']
         doc = plan.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
         doc['scheduled_time'] = doc['scheduled_time'].isoformat()
@@ -360,6 +449,7 @@ async def create_schedule(plan: PostPlan):
             doc['posted_at'] = doc['posted_at'].isoformat()
         
         await db.post_plans.insert_one(doc)
+        dashboard_snapshot.invalidate()
         return {"message": "Post scheduled successfully", "id": plan.id}
     except Exception as e:
         logger.error(f"Create schedule error: {str(e)}")
@@ -367,11 +457,13 @@ async def create_schedule(plan: PostPlan):
 
 # ==================== AFFILIATES ====================
 
-@api_router.get("/affiliates", response_model=List[AffiliateOffer])
-async def get_affiliates():
+@api_router.get("/affiliates", response_model=Page[AffiliateOffer])
+async def get_affiliates(cursor: Optional[str] = None,
+                         limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     try:
-        offers = await db.affiliate_offers.find({}, {"_id": 0}).to_list(100)
-        return offers
+        return await paginate(db.affiliate_offers, {}, sort_field="id", cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get affiliates error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -382,6 +474,7 @@ async def create_affiliate(offer: AffiliateOffer):
         doc = offer.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
         await db.affiliate_offers.insert_one(doc)
+        await affiliate_engine.catalog_changed(db)
         return {"message": "Affiliate offer created", "id": offer.id}
     except Exception as e:
         logger.error(f"Create affiliate error: {str(e)}")
@@ -397,6 +490,7 @@ async def update_affiliate(offer_id: str, offer: AffiliateOffer):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Offer not found")
         
+        await affiliate_engine.catalog_changed(db)
         return {"message": "Affiliate offer updated"}
     except HTTPException:
         raise
@@ -411,6 +505,7 @@ async def delete_affiliate(offer_id: str):
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Offer not found")
         
+        await affiliate_engine.catalog_changed(db)
         return {"message": "Affiliate offer deleted"}
     except HTTPException:
         raise
@@ -418,21 +513,93 @@ async def delete_affiliate(offer_id: str):
         logger.error(f"Delete affiliate error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class OfferSelectionQuery(BaseModel):
+    content_theme: str
+    script: str = ""
+    max_offers: int = Field(2, ge=1, le=50)
+
+@api_router.post("/affiliates/select")
+async def select_affiliates(query: OfferSelectionQuery):
+    """Best-matching enabled offers for a piece of content, scored against the indexed catalog"""
+    try:
+        await affiliate_engine.ensure_fresh(db)
+        offers = await affiliate_engine.select_offers_for_content(
+            query.content_theme, query.script, max_offers=query.max_offers
+        )
+        return {"offers": offers, "indexed": len(affiliate_engine.offer_index)}
+    except Exception as e:
+        logger.error(f"Select affiliates error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class TrackingLinkBatch(BaseModel):
+    offer_ids: List[str] = Field(..., min_length=1)
+    video_ids: List[str] = Field(..., min_length=1)
+    platforms: List[str] = Field(..., min_length=1)
+
+MAX_TRACKING_LINKS = 10000
+
+@api_router.post("/affiliates/tracking-links")
+async def create_tracking_links(batch: TrackingLinkBatch):
+    """Tracking links for every offer x video x platform; codes come from this process's reserved block"""
+    try:
+        total = len(batch.offer_ids) * len(batch.video_ids) * len(batch.platforms)
+        if total > MAX_TRACKING_LINKS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_TRACKING_LINKS} links per batch")
+        
+        found = await db.affiliate_offers.find(
+            {"id": {"$in": batch.offer_ids}}, {"_id": 0, "id": 1, "url": 1}
+        ).to_list(None)
+        by_id = {offer['id']: offer for offer in found}
+        missing = [offer_id for offer_id in batch.offer_ids if offer_id not in by_id]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Offers not found: {', '.join(missing)}")
+        
+        links = await affiliate_engine.generate_tracking_links(
+            db, [by_id[offer_id] for offer_id in batch.offer_ids], batch.video_ids, batch.platforms
+        )
+        await db.tracking_links.insert_many([dict(link) for link in links], ordered=False)
+        return {"links": links, "count": len(links)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Create tracking links error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/affiliates/tracking-links/{short_code}")
+async def get_tracking_link(short_code: str):
+    try:
+        link = await db.tracking_links.find_one({"short_code": short_code}, {"_id": 0})
+        if not link:
+            raise HTTPException(status_code=404, detail="Tracking link not found")
+        return link
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get tracking link error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== CAPABILITIES ====================
 
-@api_router.get("/capabilities", response_model=List[Capability])
-async def get_capabilities(search: Optional[str] = None):
+@api_router.get("/capabilities", response_model=Page[CapabilityHit])
+async def get_capabilities(search: Optional[str] = None,
+                           cursor: Optional[str] = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     try:
-        query = {}
         if search:
-            query = {"$or": [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"problem_solved": {"$regex": search, "$options": "i"}},
-                {"tags": {"$regex": search, "$options": "i"}}
-            ]}
+            # Ranked search over the in-process inverted index; cursor carries the rank offset
+            await capability_search.ensure_fresh(db)
+            offset = 0
+            if cursor:
+                offset, _ = decode_cursor(cursor)
+                if not isinstance(offset, int) or offset < 0:
+                    raise InvalidCursorError("Invalid cursor")
+            hits, has_more = capability_search.search(search, limit=limit, offset=offset)
+            next_cursor = encode_cursor(offset + len(hits), hits[-1]['id']) if has_more else None
+            return {"items": hits, "next_cursor": next_cursor}
         
-        capabilities = await db.capabilities.find(query, {"_id": 0}).to_list(500)
-        return capabilities
+        return await paginate(db.capabilities, {}, sort_field="id", cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get capabilities error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -443,6 +610,8 @@ async def create_capability(capability: Capability):
         doc = capability.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
         await db.capabilities.insert_one(doc)
+        doc.pop('_id', None)
+        capability_search.add(doc)
         return {"message": "Capability created", "id": capability.id}
     except Exception as e:
         logger.error(f"Create capability error: {str(e)}")
@@ -545,64 +714,271 @@ async def check_content_safety(data: Dict):
         if not script:
             raise HTTPException(status_code=400, detail="Script is required")
         
-        # Run safety check
-        safety_result = await content_safety.check_script(script)
+        # Safety check plus brand safety score, served from the verdict cache when seen before
+        return await safety_batch_checker.check_script(db, script)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Safety check error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SafetyCheckItem(BaseModel):
+    id: Optional[str] = None
+    script: Optional[str] = None
+    platform: Optional[str] = None
+    content: Optional[Dict[str, Any]] = None  # title/caption for the platform check; defaults to the script
+
+class SafetyCheckBatch(BaseModel):
+    items: List[SafetyCheckItem]
+
+SAFETY_BATCH_MAX = int(os.environ.get('SAFETY_BATCH_MAX', '1000'))
+
+@api_router.post("/content/safety-check/batch")
+async def check_content_safety_batch(batch: SafetyCheckBatch, stream: bool = False):
+    """Safety and platform compliance for many scripts/captions; stream=true returns NDJSON as results complete"""
+    try:
+        if len(batch.items) > SAFETY_BATCH_MAX:
+            raise HTTPException(status_code=413, detail=f"At most {SAFETY_BATCH_MAX} items per batch")
+        
+        items = [item.model_dump() for item in batch.items]
+        invalid = [i for i, item in enumerate(items) if not item['script'] and not item['platform']]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Items need a script or a platform: {invalid}")
         
-        # Add brand safety score
-        safety_result['brand_safety_score'] = content_safety.calculate_brand_safety_score({
-            'script_safety_score': safety_result['score']
-        })
+        if stream:
+            async def ndjson():
+                async for result in safety_batch_checker.stream(db, items):
+                    yield json.dumps(result) + "\n"
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
         
-        return safety_result
+        return {"results": await safety_batch_checker.check_many(db, items)}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Safety check error: {str(e)}")
+        logger.error(f"Batch safety check error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/content/safety-check/stream")
+async def check_content_safety_stream(request: Request):
+    """Safety scan of a long-form transcript sent as the raw (UTF-8 text) request body.
+
+    Returns NDJSON: one 'match' event per hit with character offsets as the body
+    streams in, then a 'summary' event with the score and flags.
+    """
+    async def body_text():
+        # Incremental decoding so multi-byte characters split across network chunks survive
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        async for data in request.stream():
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    async def ndjson():
+        try:
+            async for event in content_safety.scan_stream(body_text()):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Streaming safety check error: {str(e)}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@api_router.get("/content/safety-check/cache-stats")
+async def get_safety_cache_stats():
+    """Hit/miss counters of this process's safety verdict cache"""
+    return {"ruleset_version": content_safety.ruleset_version, **safety_batch_checker.cache.stats()}
+
+async def refresh_viral_model():
+    """Pick up model artifacts, learned weights and index updates from other processes (each throttled)"""
+    model_registry.ensure_fresh()
+    await online_trainer.ensure_fresh(db)
+    await uniqueness_index.ensure_fresh(db)
+    await timing_tables.ensure_fresh(db)
+
 @api_router.post("/content/viral-prediction")
-async def predict_viral_potential(video_data: Dict):
+async def predict_viral_potential(video_data: Dict, background_tasks: BackgroundTasks):
     """Predict viral potential of video content"""
     try:
+        await refresh_viral_model()
         prediction = await viral_predictor.predict_viral_score(video_data)
+        # A scored draft keeps its real inputs for the online trainer
+        background_tasks.add_task(online_trainer.record_features, db, video_data)
+        if model_registry.shadow_predictor is not None:
+            # Scored after the response is sent
+            factors = prediction['factors']
+            background_tasks.add_task(
+                model_registry.shadow_score, [video_data], [prediction['viral_score']],
+                {'hook_quality': [factors['hook_quality']], 'uniqueness': [factors['uniqueness']]}
+            )
         return prediction
     except Exception as e:
         logger.error(f"Viral prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class ViralPredictionBatch(BaseModel):
+    # Columnar ({"script": [...], "trend_score": [...]}) or a list of predict_viral_score payloads
+    candidates: Union[Dict[str, List[Any]], List[Dict[str, Any]]]
+
+VIRAL_BATCH_MAX = int(os.environ.get('VIRAL_BATCH_MAX', '50000'))
+
+@api_router.post("/content/viral-prediction/batch")
+async def predict_viral_potential_batch(batch: ViralPredictionBatch, background_tasks: BackgroundTasks):
+    """Score many candidates in one vectorized pass; results are columnar, in input order"""
+    try:
+        candidates = batch.candidates
+        count = len(candidates) if isinstance(candidates, list) else max((len(v) for v in candidates.values()), default=0)
+        if count > VIRAL_BATCH_MAX:
+            raise HTTPException(status_code=413, detail=f"At most {VIRAL_BATCH_MAX} candidates per batch")
+        
+        await refresh_viral_model()
+        result = viral_predictor.predict_batch(candidates)
+        background_tasks.add_task(online_trainer.record_batch, db, candidates, result['factors'])
+        if model_registry.shadow_predictor is not None:
+            factors = result['factors']
+            background_tasks.add_task(
+                model_registry.shadow_score, candidates, result['viral_score'].tolist(),
+                {'hook_quality': factors[:, FEATURES.index('hook_quality')].tolist(),
+                 'uniqueness': factors[:, FEATURES.index('uniqueness')].tolist()}
+            )
+        return viral_predictor.batch_to_json(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch viral prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class UniquenessQuery(BaseModel):
+    script: str
+    video_id: Optional[str] = None
+    limit: int = Field(5, ge=1, le=50)
+
+@api_router.post("/content/uniqueness")
+async def check_uniqueness(query: UniquenessQuery):
+    """Nearest scripts and trends from the last week, with estimated Jaccard similarity"""
+    try:
+        await uniqueness_index.ensure_fresh(db)
+        exclude = f"video:{query.video_id}" if query.video_id else None
+        return {
+            "uniqueness": round(uniqueness_index.uniqueness(query.script, exclude=exclude), 2),
+            "nearest": uniqueness_index.nearest(query.script, limit=query.limit, exclude=exclude),
+            "indexed": len(uniqueness_index)
+        }
+    except Exception as e:
+        logger.error(f"Uniqueness check error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/analytics/viral-model")
+async def get_viral_model():
+    """Served and learned weights of the viral predictor, plus its model artifacts"""
+    try:
+        await online_trainer.load(db)
+        model_registry.ensure_fresh()
+        return {
+            "version": online_trainer.version,
+            "samples": online_trainer.samples,
+            "learned_weights": online_trainer.weights,
+            "model_version": viral_predictor.model_version,
+            "weights": viral_predictor.weights,
+            "artifacts": model_registry.status()
+        }
+    except Exception as e:
+        logger.error(f"Get viral model error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/analytics/viral-model/artifacts")
+async def publish_viral_model(role: Optional[str] = Query(None, pattern="^(live|shadow)$")):
+    """Snapshot the learned weights and timing tables as the next model artifact version"""
+    try:
+        await online_trainer.load(db)
+        await timing_tables.rebuild(db)
+        version = model_registry.publish(
+            online_trainer.weights,
+            timing_tables.scores,
+            metadata={"trainer_version": online_trainer.version, "samples": online_trainer.samples},
+            role=role
+        )
+        return {"version": version, "role": role}
+    except Exception as e:
+        logger.error(f"Publish viral model error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class ModelPointer(BaseModel):
+    version: Optional[int] = None  # None clears the shadow / returns live to online-learned weights
+
+@api_router.put("/analytics/viral-model/{role}")
+async def point_viral_model(role: str, pointer: ModelPointer):
+    """Serve (live) or shadow-score (shadow) an artifact version; swaps without a restart"""
+    try:
+        if role not in ('live', 'shadow'):
+            raise HTTPException(status_code=404, detail="Role must be live or shadow")
+        model_registry.point(role, pointer.version)
+        if role == 'live' and pointer.version is None:
+            await online_trainer.load(db)
+        return model_registry.status()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Point viral model error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/analytics/performance-trends")
-async def get_performance_trends():
+async def get_performance_trends(stream: bool = False):
     """Analyze historical performance trends"""
     try:
-        # Fetch historical video performance
-        videos = await db.video_drafts.find(
-            {"status": "published"},
-            {"_id": 0}
-        ).to_list(1000)
-        
-        # Get performance data from post_plans
-        performance_data = []
-        for video in videos:
-            posts = await db.post_plans.find(
-                {"video_draft_id": video['id'], "status": "published"},
-                {"_id": 0}
-            ).to_list(100)
-            
-            for post in posts:
-                performance_data.append({
-                    'video_id': video['id'],
-                    'platform': post.get('platform'),
-                    'views': post.get('views', 0),
-                    'engagement_rate': post.get('engagement_rate', 0),
-                    'theme': video.get('theme', 'general')
-                })
-        
-        trends = await viral_predictor.analyze_performance_trends(performance_data)
+        if stream:
+            # One pass over the rollup rows in the app; memory is bounded by the top decile
+            total = await performance_rollups.count_eligible(db)
+            return await viral_predictor.analyze_performance_trends(performance_rollups.eligible_rows(db), total=total)
+        # Ranked at rollup refresh time; this is a single document read
+        summary = await performance_rollups.summarize(db)
+        trends = viral_predictor.summarize_performance_rollup(summary)
         return trends
     except Exception as e:
         logger.error(f"Performance trends error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/analytics/metrics/posts/{post_id}")
+async def get_post_metrics(post_id: str,
+                           resolution: str = Query("day", pattern="^(raw|hour|day)$"),
+                           start: Optional[datetime] = None,
+                           end: Optional[datetime] = None):
+    """Performance time-series for one post"""
+    try:
+        series = await metrics_store.post_series(
+            db, post_id, resolution,
+            start=start,
+            end=end
+        )
+        return {"post_id": post_id, "resolution": resolution, "series": series}
+    except Exception as e:
+        logger.error(f"Post metrics error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/analytics/metrics/platforms/{platform}")
+async def get_platform_metrics(platform: str,
+                               resolution: str = Query("day", pattern="^(hour|day)$"),
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None):
+    """Views gained and engagement per bucket across all posts on a platform"""
+    try:
+        series = await metrics_store.platform_series(
+            db, platform, resolution,
+            start=start,
+            end=end
+        )
+        return {"platform": platform, "resolution": resolution, "series": series}
+    except Exception as e:
+        logger.error(f"Platform metrics error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/webhooks/n8n")
 async def n8n_webhook(data: Dict):
     """Webhook endpoint for n8n workflow integration"""
@@ -615,10 +991,14 @@ async def n8n_webhook(data: Dict):
         if event_type == 'video_generated':
             # Video generation completed
             video_id = payload.get('video_id')
-            await db.video_drafts.update_one(
+            draft = await db.video_drafts.find_one_and_update(
                 {"id": video_id},
-                {"$set": {"status": "pending_approval", "updated_at": datetime.now(timezone.utc).isoformat()}}
+                {"$set": {"status": "pending_approval", "updated_at": datetime.now(timezone.utc).isoformat()}},
+                projection={"_id": 0, "id": 1, "script": 1, "created_at": 1}
             )
+            if draft is not None:
+                uniqueness_index.add_script(draft)
+            dashboard_snapshot.invalidate()
             return {"message": "Video status updated"}
         
         elif event_type == 'publishing_completed':
@@ -633,20 +1013,43 @@ async def n8n_webhook(data: Dict):
                     "posted_at": datetime.now(timezone.utc).isoformat()
                 }}
             )
+            await performance_rollups.refresh_post(db, post_id)
+            dashboard_snapshot.invalidate()
             return {"message": "Post status updated"}
         
         elif event_type == 'performance_update':
             # Performance metrics update
             post_id = payload.get('post_id')
             metrics = payload.get('metrics', {})
-            await db.post_plans.update_one(
+            previous = await db.post_plans.find_one_and_update(
                 {"id": post_id},
                 {"$set": {
                     "views": metrics.get('views', 0),
                     "engagement_rate": metrics.get('engagement_rate', 0),
                     "watch_time": metrics.get('watch_time', 0)
-                }}
+                }},
+                projection={"_id": 0, "platform": 1, "views": 1, "engagement_rate": 1, "status": 1, "posted_at": 1},
+                return_document=ReturnDocument.BEFORE
             )
+            # Keep every reading as a time-series sample, not just the latest values
+            if previous is not None:
+                sample = {
+                    'post_id': post_id,
+                    'platform': previous.get('platform'),
+                    'ts': datetime.now(timezone.utc),
+                    'views': metrics.get('views', 0),
+                    'engagement_rate': metrics.get('engagement_rate', 0),
+                    'watch_time': metrics.get('watch_time', 0),
+                    'previous_views': previous.get('views', 0),
+                    'status': previous.get('status'),
+                    'posted_at': previous.get('posted_at'),
+                    'previous_engagement_rate': previous.get('engagement_rate', 0)
+                }
+                await metrics_store.record(db, sample)
+            await performance_rollups.refresh_post(db, post_id)
+            dashboard_snapshot.invalidate()
+            if previous is not None:
+                await learn_from_readings([sample])
             return {"message": "Metrics updated"}
         
         return {"message": "Webhook processed"}
@@ -654,14 +1057,59 @@ async def n8n_webhook(data: Dict):
         logger.error(f"Webhook error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def learn_from_readings(readings: List[Dict[str, Any]]):
+    """Online update of the viral predictor's weights and timing tables; never fails the webhook that carried the metrics"""
+    try:
+        timing_tables.observe(readings)
+        steps = await online_trainer.observe(db, readings)
+        if steps:
+            logger.info(f"Viral model updated from {steps} posts (version {online_trainer.version})")
+    except Exception as e:
+        logger.error(f"Viral model update error: {str(e)}")
+
+class WebhookEvent(BaseModel):
+    event_type: str
+    payload: Dict[str, Any] = {}
+    idempotency_key: Optional[str] = None  # defaults to a hash of event_type + payload
+
+class WebhookBatch(BaseModel):
+    events: List[WebhookEvent]
+
+WEBHOOK_BATCH_MAX = int(os.environ.get('WEBHOOK_BATCH_MAX', '5000'))
+
+@api_router.post("/webhooks/n8n/batch")
+async def n8n_webhook_batch(batch: WebhookBatch):
+    """Batch form of the n8n webhook: one unordered bulk_write per collection"""
+    try:
+        if len(batch.events) > WEBHOOK_BATCH_MAX:
+            raise HTTPException(status_code=413, detail=f"At most {WEBHOOK_BATCH_MAX} events per batch")
+        
+        events = [event.model_dump() for event in batch.events]
+        outcome = await webhook_ingestor.ingest(db, events)
+        
+        logger.info(f"N8N webhook batch received: {outcome['counts']}")
+        if outcome['counts'].get('applied'):
+            await metrics_store.record_many(db, outcome['performance_samples'])
+            await performance_rollups.refresh_posts(db, outcome['updated_post_ids'])
+            dashboard_snapshot.invalidate()
+            await learn_from_readings(outcome['performance_samples'])
+        
+        return {"results": outcome['results'], "counts": outcome['counts']}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Webhook batch error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/templates")
-async def get_templates():
+async def get_templates(cursor: Optional[str] = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     """Get video templates library"""
     try:
-        templates = await db.templates.find({}, {"_id": 0}).to_list(100)
+        page = await paginate(db.templates, {}, sort_field="id", cursor=cursor, limit=limit)
         
         # Return default templates if none exist
-        if not templates:
+        if not page['items'] and not cursor:
             default_templates = [
                 {
                     "id": str(uuid.uuid4()),
@@ -688,9 +1136,11 @@ async def get_templates():
                     "success_rate": 0.72
                 }
             ]
-            return default_templates
+            return {"items": default_templates, "next_cursor": None}
         
-        return templates
+        return page
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get templates error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -732,8 +1182,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_indexes():
+    report = await index_manager.reconcile(db)
+    if report['created'] or report['rebuilt'] or report['unknown']:
+        logger.info(f"Index drift reconciled: {report}")
+    if report['failed']:
+        logger.error(f"Indexes left unbuilt until duplicate rows are cleaned up: {', '.join(report['failed'])}")
+    # Verification mode fails startup if any router query shape does a COLLSCAN
+    if os.environ.get('INDEX_VERIFY', '').lower() in ('1', 'true', 'yes'):
+        await index_manager.verify(db)
+    await performance_rollups.backfill_if_empty(db)
+
+@app.on_event("startup")
+async def startup_capability_search():
+    await capability_search.load(db)
+
+@app.on_event("startup")
+async def startup_affiliate_index():
+    await affiliate_engine.load_offers(db)
+
+@app.on_event("startup")
+async def startup_viral_model():
+    await online_trainer.load(db)
+    await uniqueness_index.rebuild(db)
+    viral_predictor.uniqueness_source = uniqueness_index
+    await timing_tables.rebuild(db)
+    # A pinned model artifact overrides the learned weights loaded above
+    model_registry.refresh(force=True)
+
+async def on_post_published(post_id: str):
+    await performance_rollups.refresh_post(db, post_id)
+    dashboard_snapshot.invalidate()
+
+publishing_worker: Optional[PublishingWorker] = None
+job_worker: Optional[JobWorker] = None
+
+@app.on_event("startup")
+async def startup_publishing_worker():
+    # Safe to enable on every uvicorn worker/host: plans are claimed with atomic leases
+    global publishing_worker
+    if os.environ.get('PUBLISHING_WORKER', '').lower() in ('1', 'true', 'yes'):
+        publishing_worker = PublishingWorker(
+            db,
+            HttpPlatformPublisher(os.environ.get('PUBLISHER_BASE_URL', 'http://localhost:8010')),
+            lease_seconds=float(os.environ.get('PUBLISH_LEASE_SECONDS', '120')),
+            publish_timeout_seconds=float(os.environ.get('PUBLISH_TIMEOUT_SECONDS', '0')) or None,
+            on_published=on_post_published
+        )
+        publishing_worker.start()
+
+@app.on_event("startup")
+async def startup_job_worker():
+    # Single-process development only; production runs `python worker.py` separately
+    global job_worker
+    if os.environ.get('JOB_WORKER_INPROCESS', '').lower() in ('1', 'true', 'yes'):
+        from worker import register_handlers
+        job_worker = JobWorker(db, concurrency=int(os.environ.get('JOB_WORKER_CONCURRENCY', '1')))
+        register_handlers(job_worker)
+        job_worker.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if publishing_worker:
+        await publishing_worker.stop()
+    if job_worker:
+        await job_worker.stop()
+    safety_batch_checker.shutdown()
     client.close()
 
 if __name__ == "__main__":
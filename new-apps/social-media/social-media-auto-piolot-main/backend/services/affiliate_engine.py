@@ -1,54 +1,207 @@
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timezone
-import hashlib
+import heapq
+import itertools
+import os
 import random
 import re
+import time
+
+from services.safety_matcher import AhoCorasick
+from services.short_codes import ShortCodeAllocator, short_codes
+
+# counters document bumped on every catalog write through the API
+CATALOG_COUNTER = 'affiliate_catalog'
+
+RELATED_CATEGORIES = {
+    'automation': ['software', 'tools', 'saas', 'productivity'],
+    'business': ['entrepreneur', 'startup', 'marketing', 'sales'],
+    'ai': ['machine learning', 'software', 'automation', 'technology'],
+    'productivity': ['software', 'tools', 'business', 'organization']
+}
+
+
+def _parse_commission(commission: str) -> float:
+    """Parse commission string to numeric value"""
+    if not commission:
+        return 0.0
+    
+    # Extract percentage (e.g., "15%" -> 15.0)
+    match = re.search(r'(\d+(?:\.\d+)?)%?', commission)
+    if match:
+        return float(match.group(1))
+    
+    return 0.0
+
+
+def _is_related_category(category: str, theme: str) -> bool:
+    """Check if category is related to content theme"""
+    theme_lower = theme.lower()
+    for key, related in RELATED_CATEGORIES.items():
+        if key in theme_lower:
+            return category.lower() in related
+    
+    return False
+
+
+class OfferIndex:
+    """Enabled offers compiled for selection: keyword automaton, category lists and static score parts.
+
+    Commission, EPC and reputation don't depend on the content, so they are
+    summed once. Offers without a keyword or category match score exactly
+    their static part, so only the front of the static-score order is looked at.
+    """
+
+    # Static order and rounded full scores can disagree by rounding; keep scoring past the k-th within this margin
+    TIE_MARGIN = 0.011
+
+    def __init__(self, offers: List[Dict]):
+        self.offers = [offer for offer in offers if offer.get('enabled', True)]
+        self.categories: List[str] = []
+        self.static: List[tuple] = []
+        self.static_total: List[float] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.always: Dict[int, int] = {}  # empty keywords match every script
+
+        for i, offer in enumerate(self.offers):
+            self.categories.append((offer.get('category') or '').lower())
+            epc = offer.get('epc') or 0
+            reputation = offer.get('reputation_score')
+            parts = (min(1.5, _parse_commission(offer.get('commission', '')) / 100),
+                     min(1.0, epc / 10),
+                     (5.0 if reputation is None else reputation) / 20)
+            self.static.append(parts)
+            self.static_total.append(round(((0.0 + parts[0]) + parts[1]) + parts[2], 2))
+            for keyword in offer.get('keywords', []):
+                keyword = keyword.lower()
+                if keyword:
+                    self.postings.setdefault(keyword, []).append(i)
+                else:
+                    self.always[i] = self.always.get(i, 0) + 1
+
+        self.automaton = AhoCorasick((keyword, keyword) for keyword in self.postings)
+        self.order = sorted(range(len(self.offers)), key=lambda i: (-self.static_total[i], i))
+        self.by_category: Dict[str, List[int]] = {}
+        for i in self.order:
+            self.by_category.setdefault(self.categories[i], []).append(i)
+
+    def __len__(self):
+        return len(self.offers)
+
+    def _score(self, i: int, category_bonus: float, matches: int) -> float:
+        """Same arithmetic, in the same order, as AffiliateEngine._calculate_offer_score"""
+        commission, epc, reputation = self.static[i]
+        score = 0.0 + category_bonus
+        score += min(3.0, matches * 0.5)
+        score += commission
+        score += epc
+        score += reputation
+        return round(score, 2)
+
+    def select(self, content_theme: str, script: str, max_offers: int) -> List[Dict]:
+        """Top max_offers by relevance score; ties keep catalog order"""
+        if max_offers <= 0 or not self.offers:
+            return []
+
+        theme_lower = content_theme.lower()
+        bonus = {}
+        for category in self.by_category:
+            if category in theme_lower:
+                bonus[category] = 4.0
+            elif _is_related_category(category, content_theme):
+                bonus[category] = 2.0
+
+        # One automaton pass finds every keyword present in the script
+        matches = dict(self.always)
+        for keyword in {keyword for _, _, keyword in self.automaton.iter(script.lower())}:
+            for i in self.postings[keyword]:
+                matches[i] = matches.get(i, 0) + 1
+        scored = {i: self._score(i, bonus.get(self.categories[i], 0.0), count) for i, count in matches.items()}
+
+        def take_best(indexes: List[int]):
+            """Score unmatched offers from a static-ordered list until k are in and the rest can't tie"""
+            taken, cutoff = 0, None
+            for i in indexes:
+                if cutoff is not None and self.static_total[i] < cutoff:
+                    break
+                if i in scored:
+                    continue
+                scored[i] = self._score(i, bonus.get(self.categories[i], 0.0), 0)
+                taken += 1
+                if taken == max_offers:
+                    cutoff = self.static_total[i] - self.TIE_MARGIN
+
+        for category in bonus:
+            take_best(self.by_category[category])
+        take_best(self.order)
+
+        best = heapq.nsmallest(max_offers, scored, key=lambda i: (-scored[i], i))
+        return [{**self.offers[i], 'relevance_score': scored[i]} for i in best]
+
 
 class AffiliateEngine:
     """Intelligent affiliate link automation and optimization"""
     
-    def __init__(self):
+    def __init__(self, refresh_seconds: float = 60.0, allocator: Optional[ShortCodeAllocator] = None):
         self.base_url = "https://kdn.ai"  # Branded short domain
+        self.short_codes = allocator or short_codes
         self.networks = {
             'shareasale': {'priority': 1, 'conversion_rate': 0.03},
             'cj': {'priority': 2, 'conversion_rate': 0.025},
             'impact': {'priority': 3, 'conversion_rate': 0.028},
             'rakuten': {'priority': 4, 'conversion_rate': 0.022}
         }
+        self.refresh_seconds = refresh_seconds
+        # Catalog compiled for select_offers_for_content; rebuilt when offers change
+        self.offer_index = OfferIndex([])
+        self._catalog_state: Optional[tuple] = None
+        self._loaded_at = 0.0
     
     async def select_offers_for_content(self, 
                                        content_theme: str, 
                                        script: str,
-                                       available_offers: List[Dict],
+                                       available_offers: Optional[List[Dict]] = None,
                                        max_offers: int = 2) -> List[Dict]:
-        """Intelligently select affiliate offers for content"""
-        
-        if not available_offers:
+        """Intelligently select affiliate offers for content (the loaded catalog when no offers are given)"""
+        if available_offers is None:
+            index = self.offer_index
+        elif not available_offers:
             return []
+        else:
+            index = OfferIndex(available_offers)
         
-        # Score each offer
-        scored_offers = []
-        for offer in available_offers:
-            if not offer.get('enabled', True):
-                continue
-            
-            score = self._calculate_offer_score(
-                offer=offer,
-                content_theme=content_theme,
-                script=script
-            )
-            
-            scored_offers.append({
-                **offer,
-                'relevance_score': score
-            })
-        
-        # Sort by score (descending)
-        scored_offers.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        # Return top offers
-        return scored_offers[:max_offers]
+        return index.select(content_theme, script, max_offers)
     
+    async def _read_catalog_state(self, db) -> tuple:
+        """(catalog version, offer count): the version catches edits, the count direct inserts/deletes"""
+        counter = await db.counters.find_one({'name': CATALOG_COUNTER}, {'_id': 0, 'version': 1})
+        count = await db.affiliate_offers.estimated_document_count()
+        return (counter or {}).get('version', 0), count
+
+    async def load_offers(self, db):
+        """(Re)build the offer index from the affiliate_offers collection"""
+        # Read the state first: a write landing during the load is picked up next time
+        state = await self._read_catalog_state(db)
+        offers = await db.affiliate_offers.find({}, {"_id": 0}).to_list(None)
+        self.offer_index = OfferIndex(offers)
+        self._catalog_state = state
+        self._loaded_at = time.monotonic()
+
+    async def ensure_fresh(self, db):
+        """Pick up offers created, edited or removed by other workers"""
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        if await self._read_catalog_state(db) != self._catalog_state:
+            await self.load_offers(db)
+        else:
+            self._loaded_at = time.monotonic()
+
+    async def catalog_changed(self, db):
+        """Record a catalog write so every worker rebuilds its index on its next ensure_fresh"""
+        await db.counters.update_one({'name': CATALOG_COUNTER}, {'$inc': {'version': 1}}, upsert=True)
+        self._loaded_at = 0.0
+        self._catalog_state = None
+
     def _calculate_offer_score(self, offer: Dict, content_theme: str, script: str) -> float:
         """Calculate relevance score for an offer"""
         score = 0.0
@@ -82,60 +235,42 @@ class AffiliateEngine:
         return round(score, 2)
     
     def _is_related_category(self, category: str, theme: str) -> bool:
-        """Check if category is related to content theme"""
-        related_categories = {
-            'automation': ['software', 'tools', 'saas', 'productivity'],
-            'business': ['entrepreneur', 'startup', 'marketing', 'sales'],
-            'ai': ['machine learning', 'software', 'automation', 'technology'],
-            'productivity': ['software', 'tools', 'business', 'organization']
-        }
-        
-        theme_lower = theme.lower()
-        for key, related in related_categories.items():
-            if key in theme_lower:
-                return category.lower() in related
-        
-        return False
+        return _is_related_category(category, theme)
     
     def _parse_commission(self, commission: str) -> float:
-        """Parse commission string to numeric value"""
-        if not commission:
-            return 0.0
-        
-        # Extract percentage (e.g., "15%" -> 15.0)
-        match = re.search(r'(\d+(?:\.\d+)?)%?', commission)
-        if match:
-            return float(match.group(1))
-        
-        return 0.0
+        return _parse_commission(commission)
     
-    def generate_tracking_link(self, 
-                              offer_id: str, 
-                              video_id: str,
-                              platform: str,
-                              base_url: str) -> Dict[str, str]:
+    async def generate_tracking_link(self, 
+                                     db,
+                                     offer_id: str, 
+                                     video_id: str,
+                                     platform: str,
+                                     base_url: str) -> Dict[str, str]:
         """Generate unique tracking link with analytics"""
-        
-        # Create unique tracking ID
-        tracking_data = f"{offer_id}:{video_id}:{platform}:{datetime.now().isoformat()}"
-        tracking_id = hashlib.md5(tracking_data.encode()).hexdigest()[:8]
-        
-        # Generate short link
-        short_code = self._generate_short_code(tracking_id)
-        short_url = f"{self.base_url}/{short_code}"
-        
-        return {
-            'tracking_id': tracking_id,
-            'short_code': short_code,
-            'short_url': short_url,
-            'original_url': base_url,
-            'created_at': datetime.now(timezone.utc).isoformat()
-        }
+        return (await self.generate_tracking_links(
+            db, [{'id': offer_id, 'url': base_url}], [video_id], [platform]
+        ))[0]
     
-    def _generate_short_code(self, tracking_id: str) -> str:
-        """Generate readable short code"""
-        # Use first 6 chars of tracking_id
-        return tracking_id[:6].upper()
+    async def generate_tracking_links(self,
+                                      db,
+                                      offers: List[Dict],
+                                      video_ids: List[str],
+                                      platforms: List[str]) -> List[Dict[str, str]]:
+        """Tracking links for every offer x video x platform, with codes allocated in one call"""
+        combos = list(itertools.product(offers, video_ids, platforms))
+        codes = await self.short_codes.allocate(db, len(combos))
+        created_at = datetime.now(timezone.utc).isoformat()
+        
+        return [{
+            'tracking_id': code,
+            'short_code': code,
+            'short_url': f"{self.base_url}/{code}",
+            'original_url': offer.get('url', ''),
+            'offer_id': offer.get('id'),
+            'video_id': video_id,
+            'platform': platform,
+            'created_at': created_at
+        } for code, (offer, video_id, platform) in zip(codes, combos)]
     
     async def generate_disclosure(self, 
                                   offers: List[Dict],
@@ -270,4 +405,4 @@ class AffiliateEngine:
         }
 
 # Singleton instance
-affiliate_engine = AffiliateEngine()
\ No newline at end of file
+affiliate_engine = AffiliateEngine(refresh_seconds=float(os.environ.get('AFFILIATE_INDEX_REFRESH_SECONDS', '60')))
\ No newline at end of file
@@ -0,0 +1,201 @@
+from typing import Dict, List, Optional, Tuple
+import bisect
+import heapq
+import html
+import math
+import re
+import time
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in TOKEN_RE.findall(text or '')]
+
+
+class CapabilitySearchIndex:
+    """In-process inverted index over the capability catalog with BM25 ranking"""
+
+    # Field boosts (BM25F-style weighted term frequency)
+    FIELD_WEIGHTS = {
+        'name': 3.0,
+        'tags': 2.0,
+        'problem_solved': 1.0,
+        'use_cases': 0.5
+    }
+    K1 = 1.2
+    B = 0.75
+    PREFIX_WEIGHT = 0.7      # prefix expansions count a little less than exact terms
+    MAX_PREFIX_EXPANSIONS = 64
+    SNIPPET_CHARS = 160
+
+    def __init__(self, refresh_seconds: float = 60.0):
+        self.refresh_seconds = refresh_seconds
+        self._clear()
+
+    def _clear(self):
+        self.docs: List[Dict] = []
+        self.doc_lengths: List[float] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.vocabulary: List[str] = []   # sorted, for prefix lookups
+        self.total_length = 0.0
+        self.loaded_at = 0.0
+        self._norms: Optional[List[float]] = None
+
+    # ----- building -----
+
+    async def load(self, db):
+        """(Re)build the index from the capabilities collection"""
+        docs = await db.capabilities.find({}, {"_id": 0}).to_list(None)
+        self.build(docs)
+
+    def build(self, docs: List[Dict]):
+        self._clear()
+        for doc in docs:
+            self._index(doc)
+        self.vocabulary = sorted(self.postings)
+        self.loaded_at = time.monotonic()
+
+    def add(self, doc: Dict):
+        """Index a newly created capability without a full rebuild"""
+        new_terms = self._index(doc)
+        for term in new_terms:
+            bisect.insort(self.vocabulary, term)
+
+    def _index(self, doc: Dict) -> List[str]:
+        doc_idx = len(self.docs)
+        self.docs.append(doc)
+
+        weighted_tf: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in self.FIELD_WEIGHTS.items():
+            for token in tokenize(self._field_text(doc, field)):
+                weighted_tf[token] = weighted_tf.get(token, 0.0) + weight
+                length += weight
+
+        new_terms = []
+        for term, tf in weighted_tf.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                new_terms.append(term)
+            posting[doc_idx] = tf
+
+        self.doc_lengths.append(length)
+        self.total_length += length
+        self._norms = None
+        return new_terms
+
+    def _field_text(self, doc: Dict, field: str) -> str:
+        value = doc.get(field) or ''
+        if isinstance(value, list):
+            return ' '.join(str(v) for v in value)
+        return str(value)
+
+    async def ensure_fresh(self, db):
+        """Pick up capabilities written by other workers"""
+        if time.monotonic() - self.loaded_at < self.refresh_seconds:
+            return
+        if await db.capabilities.estimated_document_count() != len(self.docs):
+            await self.load(db)
+        else:
+            self.loaded_at = time.monotonic()
+
+    # ----- querying -----
+
+    def _length_norms(self) -> List[float]:
+        """BM25 length normalisation per document, recomputed only after the index changes"""
+        if self._norms is None:
+            avg_length = (self.total_length / len(self.docs)) or 1.0
+            self._norms = [self.K1 * (1 - self.B + self.B * length / avg_length) for length in self.doc_lengths]
+        return self._norms
+
+    def _expand(self, token: str, prefix: bool) -> List[Tuple[str, float]]:
+        """Exact term plus, when prefix is set, vocabulary terms starting with it"""
+        expansions = []
+        if token in self.postings:
+            expansions.append((token, 1.0))
+        if not prefix:
+            return expansions
+
+        start = bisect.bisect_left(self.vocabulary, token)
+        for term in self.vocabulary[start:start + self.MAX_PREFIX_EXPANSIONS + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                expansions.append((term, self.PREFIX_WEIGHT))
+        return expansions
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> Tuple[List[Dict], bool]:
+        """Return relevance-ordered hits and whether more remain"""
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens or not self.docs:
+            return [], False
+
+        n_docs = len(self.docs)
+        norms = self._length_norms()
+        scores: Dict[int, float] = {}
+        expanded_terms: List[str] = []
+
+        for position, token in enumerate(query_tokens):
+            # Only the last token is treated as a prefix (search-as-you-type)
+            for term, term_weight in self._expand(token, prefix=position == len(query_tokens) - 1):
+                expanded_terms.append(term)
+                posting = self.postings[term]
+                boost = term_weight * math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5)) * (self.K1 + 1)
+                for doc_idx, tf in posting.items():
+                    scores[doc_idx] = scores.get(doc_idx, 0.0) + boost * tf / (tf + norms[doc_idx])
+
+        wanted = offset + limit
+        top = heapq.nlargest(wanted + 1, scores.items(), key=lambda x: x[1])
+        has_more = len(top) > wanted
+
+        hits = []
+        for doc_idx, score in top[offset:wanted]:
+            doc = self.docs[doc_idx]
+            matched = {term for term in expanded_terms if doc_idx in self.postings[term]}
+            hits.append({
+                **doc,
+                'score': round(score, 4),
+                'highlights': self._highlights(doc, matched)
+            })
+        return hits, has_more
+
+    def _highlights(self, doc: Dict, terms: set) -> Dict[str, str]:
+        highlights = {}
+        for field in ('name', 'problem_solved'):
+            text = self._field_text(doc, field)
+            snippet = self._snippet(text, terms, full=(field == 'name'))
+            if snippet:
+                highlights[field] = snippet
+
+        matched_tags = [t for t in doc.get('tags', []) if set(tokenize(t)) & terms]
+        if matched_tags:
+            highlights['tags'] = ', '.join(f"<mark>{html.escape(t)}</mark>" for t in matched_tags)
+        return highlights
+
+    def _snippet(self, text: str, terms: set, full: bool = False) -> Optional[str]:
+        """Wrap matched tokens in <mark> and window long text around the first match; all text is HTML-escaped"""
+        spans = [m.span() for m in TOKEN_RE.finditer(text) if m.group().lower() in terms]
+        if not spans:
+            return None
+
+        start, end = 0, len(text)
+        if not full and len(text) > self.SNIPPET_CHARS:
+            start = max(0, spans[0][0] - self.SNIPPET_CHARS // 4)
+            end = min(len(text), start + self.SNIPPET_CHARS)
+
+        parts = ['…' if start > 0 else '']
+        cursor = start
+        for span_start, span_end in spans:
+            if span_start < start or span_end > end:
+                continue
+            parts.append(html.escape(text[cursor:span_start]))
+            parts.append(f"<mark>{html.escape(text[span_start:span_end])}</mark>")
+            cursor = span_end
+        parts.append(html.escape(text[cursor:end]))
+        parts.append('…' if end < len(text) else '')
+        return ''.join(parts)
+
+# Singleton instance
+capability_search = CapabilitySearchIndex()
@@ -1,64 +1,80 @@
-from typing import Dict, List, Any
-import re
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import os
+
+from services.rule_packs import RulePackStore, RULES_DIR
+from services.tokenizer import word_count
+from services.verdict_cache import VerdictCache, safety_verdicts
+
+# Bump when check_script's scoring logic changes, so cached verdicts are invalidated
+SCORING_VERSION = 1
 
 class ContentSafetyChecker:
     """AI-powered content safety and compliance checker"""
     
-    def __init__(self):
-        self.profanity_patterns = self._load_profanity_patterns()
-        self.sensitive_topics = ['politics', 'religion', 'medical_claims', 'financial_advice']
-        
-    def _load_profanity_patterns(self) -> List[str]:
-        # Basic profanity patterns (expand with comprehensive list)
-        return [
-            r'\b(fuck|shit|damn|hell|crap|ass)\b',
-            r'\b(explicit|nsfw|18\+)\b'
-        ]
+    def __init__(self, rules_dir: Optional[Path] = None):
+        # Rule packs live in rules/safety/*.yaml and are recompiled when those files change
+        self.rule_packs = RulePackStore(rules_dir or RULES_DIR,
+                                        float(os.environ.get('SAFETY_RULES_CHECK_INTERVAL', '2')))
+
+    @property
+    def ruleset_version(self) -> str:
+        return f"{SCORING_VERSION}-{self.rule_packs.current.matcher.version}"
     
     async def check_script(self, script: str) -> Dict[str, Any]:
         """Comprehensive script safety check"""
+        return self._check_script(script)
+
+    def _check_script(self, script: str) -> Dict[str, Any]:
+        # One pack for the whole check, even if a reload swaps it meanwhile
+        pack = self.rule_packs.current
+        matches = pack.matcher.scan(script)
+        verdict = self._score(pack, {match['rule_id'] for match in matches}, word_count(script))
+        verdict['matches'] = matches
+        verdict['timestamp'] = datetime.now(timezone.utc).isoformat()
+        return verdict
+
+    def _score(self, pack, hit_rule_ids, word_count: Optional[int]) -> Dict[str, Any]:
+        """Deductions for the rules that matched; word_count=None skips the short-form length check"""
         score = 10.0
         flags = []
         warnings = []
+        hit_rules = pack.hit_rules(hit_rule_ids)
+        hits = {rule['id'] for rule in hit_rules}
         
         # 1. Profanity detection
-        for pattern in self.profanity_patterns:
-            if re.search(pattern, script, re.IGNORECASE):
+        for rule in hit_rules:
+            if rule['family'] == 'profanity':
                 score -= 2.0
                 flags.append('profanity_detected')
-                warnings.append(f'Profanity pattern matched: {pattern}')
+                warnings.append(f"Profanity pattern matched: {rule['label']}")
         
         # 2. Sensitive topic detection
-        script_lower = script.lower()
-        for topic in self.sensitive_topics:
-            if topic in script_lower:
+        for rule in hit_rules:
+            if rule['family'] == 'sensitive_topic':
                 score -= 1.0
-                warnings.append(f'Sensitive topic detected: {topic}')
+                warnings.append(f"Sensitive topic detected: {rule['label']}")
         
         # 3. FTC disclosure check (if affiliate content)
-        if 'link' in script_lower or 'commission' in script_lower:
-            if 'disclosure' not in script_lower:
-                score -= 3.0
-                flags.append('missing_ftc_disclosure')
-                warnings.append('Affiliate content missing FTC disclosure')
+        if 'affiliate.mention' in hits and 'affiliate.disclosure' not in hits:
+            score -= 3.0
+            flags.append('missing_ftc_disclosure')
+            warnings.append('Affiliate content missing FTC disclosure')
         
         # 4. Length check (20-40 seconds at ~150 words/min = 50-100 words)
-        word_count = len(script.split())
-        if word_count < 40 or word_count > 120:
+        if word_count is not None and (word_count < 40 or word_count > 120):
             score -= 1.0
             warnings.append(f'Word count outside optimal range: {word_count}')
         
         # 5. Claim detection (avoid guarantees)
-        guarantee_patterns = [
-            r'\bguarantee\b', r'\bpromise\b', r'\bguaranteed\b',
-            r'\bcure\b', r'\bmake\s+\$\d+\b'
-        ]
-        for pattern in guarantee_patterns:
-            if re.search(pattern, script, re.IGNORECASE):
+        for rule in hit_rules:
+            if rule['family'] == 'claim':
                 score -= 2.0
                 flags.append('unrealistic_claim')
-                warnings.append(f'Potential unrealistic claim: {pattern}')
+                warnings.append(f"Potential unrealistic claim: {rule['label']}")
         
         # Determine status
         if score >= 9.0:
@@ -73,40 +89,69 @@ class ContentSafetyChecker:
             'status': status,
             'flags': flags,
             'warnings': warnings,
-            'timestamp': datetime.now(timezone.utc).isoformat()
+            'ruleset_version': f"{SCORING_VERSION}-{pack.matcher.version}"
         }
+
+    async def scan_stream(self, chunks: AsyncIterator[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Long-form check_script: match events stream out with absolute offsets, then one summary.
+
+        Memory stays bounded by the chunk size plus the matcher's overlap window. The
+        40-120 word length check is for short scripts and is skipped here.
+        """
+        pack = self.rule_packs.current
+        counts = {'words': 0, 'characters': 0}
+
+        async def counted(source: AsyncIterator[str]) -> AsyncIterator[str]:
+            in_word = False
+            async for chunk in source:
+                counts['characters'] += len(chunk)
+                for ch in chunk:
+                    if ch.isspace():
+                        in_word = False
+                    elif not in_word:
+                        in_word = True
+                        counts['words'] += 1
+                yield chunk
+
+        hit_rule_ids = set()
+        async for match in pack.matcher.scan_stream(counted(chunks)):
+            hit_rule_ids.add(match['rule_id'])
+            rule = pack.rules[pack.positions[match['rule_id']]]
+            yield {'type': 'match', 'family': rule['family'], 'label': rule['label'], **match}
+
+        summary = self._score(pack, hit_rule_ids, None)
+        yield {'type': 'summary', **summary, 'word_count': counts['words'],
+               'characters': counts['characters'], 'timestamp': datetime.now(timezone.utc).isoformat()}
     
     async def check_platform_compliance(self, platform: str, content: Dict) -> Dict[str, Any]:
         """Check platform-specific TOS compliance"""
+        return self._check_platform_compliance(platform, content)
+
+    def _check_platform_compliance(self, platform: str, content: Dict) -> Dict[str, Any]:
         compliance = {
             'platform': platform,
             'compliant': True,
             'violations': []
         }
+        limits = self.rule_packs.current.platform_limits.get(platform, {})
+        title = content.get('title', '')
+        caption = content.get('caption', '')
+        
+        if any(term in title.lower() for term in limits.get('title_banned_terms', [])):
+            compliance['violations'].append('Misleading title')
+        
+        if 'title_max_length' in limits and len(title) > limits['title_max_length']:
+            compliance['violations'].append('Title too long')
         
-        # YouTube compliance
-        if platform == 'youtube':
-            if 'clickbait' in content.get('title', '').lower():
-                compliance['compliant'] = False
-                compliance['violations'].append('Misleading title')
-            
-            if len(content.get('title', '')) > 100:
-                compliance['compliant'] = False
-                compliance['violations'].append('Title too long')
-        
-        # TikTok compliance
-        elif platform == 'tiktok':
-            if len(content.get('caption', '')) > 150:
-                compliance['compliant'] = False
-                compliance['violations'].append('Caption too long')
-        
-        # Instagram compliance
-        elif platform == 'instagram':
-            hashtag_count = len([w for w in content.get('caption', '').split() if w.startswith('#')])
-            if hashtag_count > 30:
-                compliance['compliant'] = False
-                compliance['violations'].append('Too many hashtags (max 30)')
+        if 'caption_max_length' in limits and len(caption) > limits['caption_max_length']:
+            compliance['violations'].append('Caption too long')
         
+        if 'max_hashtags' in limits:
+            hashtag_count = len([w for w in caption.split() if w.startswith('#')])
+            if hashtag_count > limits['max_hashtags']:
+                compliance['violations'].append(f"Too many hashtags (max {limits['max_hashtags']})")
+        
+        compliance['compliant'] = not compliance['violations']
         return compliance
     
     async def generate_disclosure(self, affiliate_offers: List[str]) -> str:
@@ -132,5 +177,119 @@ class ContentSafetyChecker:
         
         return min(10.0, max(0.0, final_score))
 
+    def verdict(self, script: str) -> Dict[str, Any]:
+        """check_script result plus brand safety score; the unit the verdict cache stores"""
+        verdict = self._check_script(script)
+        verdict['brand_safety_score'] = self.calculate_brand_safety_score({
+            'script_safety_score': verdict['score']
+        })
+        return verdict
+
+    def check_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Script safety and/or platform compliance for one batch item"""
+        result = {'id': item.get('id')}
+        script = item.get('script')
+        if item.get('safety'):
+            # Verdict already resolved by the caller (cache hit or pool result)
+            result['safety'] = item['safety']
+        elif script:
+            result['safety'] = self.verdict(script)
+        if item.get('platform'):
+            content = item.get('content') or {'caption': script or ''}
+            result['compliance'] = self._check_platform_compliance(item['platform'], content)
+        return result
+
+# Singleton instance
+content_safety = ContentSafetyChecker()
+
+
+def check_scripts(scripts: List[str]) -> List[Dict[str, Any]]:
+    """Verdicts for a chunk of scripts (runs in a worker process)"""
+    return [content_safety.verdict(script) for script in scripts]
+
+
+class SafetyBatchChecker:
+    """Serves safety verdicts from the verdict cache, computing misses in a process pool off the event loop"""
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 25,
+                 cache: VerdictCache = safety_verdicts):
+        self.max_workers = max_workers or int(os.environ.get('SAFETY_WORKERS', os.cpu_count() or 1))
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    async def check_script(self, db, script: str) -> Dict[str, Any]:
+        """One verdict; a miss is computed inline since a single short script costs microseconds"""
+        version = content_safety.ruleset_version
+        key = self.cache.key(script, version)
+        cached = await self.cache.get_many(db, [key])
+        if key in cached:
+            return cached[key]
+        verdict = content_safety.verdict(script)
+        if verdict['ruleset_version'] == version:
+            await self.cache.put_many(db, {key: verdict}, version)
+        return verdict
+
+    async def _check_chunk(self, work: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        verdicts = await asyncio.get_running_loop().run_in_executor(
+            self.pool, check_scripts, [script for _, script in work]
+        )
+        return {key: verdict for (key, _), verdict in zip(work, verdicts)}
+
+    def _finish(self, index: int, item: Dict[str, Any], verdict: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {'index': index, **content_safety.check_item({**item, 'safety': verdict})}
+
+    async def _result_groups(self, db, items: List[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Cache hits (and script-less items) first, then each pool chunk as it completes"""
+        version = content_safety.ruleset_version
+        keys = {i: self.cache.key(item['script'], version) for i, item in enumerate(items) if item.get('script')}
+        cached = await self.cache.get_many(db, list(keys.values()))
+
+        ready = []
+        pending: Dict[str, List[int]] = {}
+        for i, item in enumerate(items):
+            key = keys.get(i)
+            if key is None or key in cached:
+                ready.append(self._finish(i, item, cached.get(key)))
+            else:
+                # Repeated scripts within the batch are checked once
+                pending.setdefault(key, []).append(i)
+        if ready:
+            yield ready
+
+        # Chunked so pickling/IPC overhead is paid per chunk rather than per script
+        work = [(key, items[indices[0]]['script']) for key, indices in pending.items()]
+        chunks = [self._check_chunk(work[start:start + self.chunk_size])
+                  for start in range(0, len(work), self.chunk_size)]
+        for chunk in asyncio.as_completed(chunks):
+            verdicts = await chunk
+            # A pool process may still be on the previous rule pack for a moment; don't cache those
+            await self.cache.put_many(db, {key: verdict for key, verdict in verdicts.items()
+                                           if verdict['ruleset_version'] == version}, version)
+            yield [self._finish(i, items[i], verdict)
+                   for key, verdict in verdicts.items() for i in pending[key]]
+
+    async def check_many(self, db, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Results in input order"""
+        results = [result async for group in self._result_groups(db, items) for result in group]
+        return sorted(results, key=lambda result: result['index'])
+
+    async def stream(self, db, items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Results as they complete; 'index' maps each back to its input"""
+        async for group in self._result_groups(db, items):
+            for result in group:
+                yield result
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
 # Singleton instance
-content_safety = ContentSafetyChecker()
\ No newline at end of file
+safety_batch_checker = SafetyBatchChecker()
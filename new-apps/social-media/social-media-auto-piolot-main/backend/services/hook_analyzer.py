@@ -0,0 +1,174 @@
+from typing import Dict, List, Any
+from itertools import islice, repeat
+from pathlib import Path
+import os
+import re
+
+import numpy as np
+import yaml
+
+from services.tokenizer import tokenize
+
+HOOK_RULES_PATH = Path(os.environ.get('HOOK_RULES_PATH', Path(__file__).parent.parent / 'rules' / 'viral' / 'hooks.yaml'))
+# score_many memo: distinct scripts kept, and the longest script worth keeping
+HOOK_CACHE_SIZE = int(os.environ.get('HOOK_CACHE_SIZE', '16384'))
+HOOK_CACHE_MAX_CHARS = int(os.environ.get('HOOK_CACHE_MAX_CHARS', '4000'))
+# score_many reads new scripts as byte arrays of this many leading characters
+HOOK_WINDOW_CHARS = int(os.environ.get('HOOK_WINDOW_CHARS', '96'))
+
+
+
+class HookAnalyzer:
+    """Scores a script's opening words with every hook pattern compiled into one regex pass.
+
+    The alternation is longest-first inside a lookahead, so each offset reports
+    its longest pattern; patterns contained in it ("you" in "your") are added
+    from a precomputed closure, giving the same hit set as one `in` per pattern.
+    """
+
+    def __init__(self, config: Dict[str, Any],
+                 cache_size: int = HOOK_CACHE_SIZE,
+                 cache_max_chars: int = HOOK_CACHE_MAX_CHARS,
+                 window_chars: int = HOOK_WINDOW_CHARS):
+        self.cache_size = cache_size
+        self.cache_max_chars = cache_max_chars
+        self.window_chars = window_chars
+        self._cache: Dict[str, float] = {}
+        self.version = config.get('version')
+        self.hook_words = int(config.get('hook_words', 10))
+        self.base = float(config.get('base', 5.0))
+        self.short_script = float(config.get('short_script', 5.0))
+        self.weights = {str(pattern).lower(): float(weight) for pattern, weight in config.get('patterns', {}).items()}
+        longest_first = sorted(self.weights, key=len, reverse=True)
+        self.regex = re.compile(f"(?=({'|'.join(map(re.escape, longest_first))}))") if longest_first else None
+        self.contained = {
+            pattern: frozenset(other for other in self.weights if other in pattern) for pattern in self.weights
+        }
+        # Byte form of the patterns for _score_window, grouped by first byte; an empty
+        # pattern always hits, one with non-ASCII or control characters never can
+        self._always = sum(weight for pattern, weight in self.weights.items() if not pattern)
+        self._by_first_byte: Dict[int, List[Any]] = {}
+        for pattern, weight in self.weights.items():
+            if pattern and pattern.isascii() and all(ch > ' ' or ch == ' ' for ch in pattern):
+                encoded = np.frombuffer(pattern.encode(), dtype=np.uint8)
+                self._by_first_byte.setdefault(int(encoded[0]), []).append((encoded, weight))
+
+    @classmethod
+    def from_file(cls, path: Path = HOOK_RULES_PATH) -> 'HookAnalyzer':
+        return cls(yaml.safe_load(Path(path).read_text()) or {})
+
+    def score(self, script: str) -> float:
+        """Hook quality 0-10 of the first hook_words words"""
+        if not script:
+            return 0.0
+
+        words = tokenize(script)
+        if len(words) < self.hook_words:
+            return self.short_script
+
+        hook = ' '.join(words[:self.hook_words]).lower()
+        hits = set()
+        if self.regex is not None:
+            for pattern in self.regex.findall(hook):
+                hits |= self.contained[pattern]
+        score = self.base + sum(self.weights[pattern] for pattern in hits)
+        return min(10.0, max(0.0, score))
+
+    def score_many(self, scripts: List[str]) -> np.ndarray:
+        """score() of each script; new scripts are scored together in whole-array passes, then memoized"""
+        cache = self._cache
+        # One C-level lookup per row; NaN marks scripts not seen before
+        scores = np.fromiter(map(cache.get, scripts, repeat(np.nan)), dtype=np.float64, count=len(scripts))
+        missing = np.flatnonzero(np.isnan(scores))
+        if not missing.size:
+            return scores
+
+        new = scripts if missing.size == len(scripts) else [scripts[i] for i in missing.tolist()]
+        values = self._score_new(new)
+        scores[missing] = values
+
+        keep = dict(zip(new, values.tolist()))
+        if any(not script or len(script) > self.cache_max_chars for script in keep):
+            keep = {script: value for script, value in keep.items()
+                    if not script or len(script) <= self.cache_max_chars}
+        if len(cache) + len(keep) > self.cache_size:
+            cache.clear()
+        cache.update(islice(keep.items(), self.cache_size))
+        return scores
+
+    def _score_new(self, scripts: List[str]) -> np.ndarray:
+        """score() of each script: plain-ASCII ones through _score_window, the rest one by one"""
+        try:
+            plain = all(map(str.isascii, scripts)) and '\x00' not in ''.join(scripts)
+        except TypeError:  # None among the scripts
+            plain = False
+        if plain:
+            values = self._score_window(scripts)
+        else:
+            rows = [i for i, script in enumerate(scripts)
+                    if isinstance(script, str) and script.isascii() and '\x00' not in script]
+            values = np.full(len(scripts), np.nan)
+            if rows:
+                values[rows] = self._score_window([scripts[i] for i in rows])
+
+        for i in np.flatnonzero(np.isnan(values)).tolist():
+            values[i] = self.score(scripts[i])
+        return values
+
+    def _score_window(self, scripts: List[str]) -> np.ndarray:
+        """score() of ASCII scripts from a (scripts x window_chars) byte matrix; NaN where the window can't tell.
+
+        A row's hook is its bytes up to the end of word hook_words. Rows whose
+        hook runs past the window, or has leading, repeated or control-character
+        whitespace (so differs from ' '.join(words)), are left to score().
+        Patterns are found at every start position by narrowing the positions of
+        their first byte one byte at a time.
+        """
+        n, width = len(scripts), self.window_chars
+        raw = np.array(scripts, dtype=f'S{width}').view(np.uint8).reshape(n, width)
+        # 0 is padding; bytes 1-31 are rare enough to leave their rows to score()
+        space = raw <= 32
+        full = raw[:, -1] != 0  # no padding: the script may go on past the window
+
+        # Word ends: a whitespace byte after a non-whitespace one, as flat (row, column - 1) indices
+        ends = np.flatnonzero(space[:, 1:] & ~space[:, :-1])
+        first = np.searchsorted(ends, np.arange(n + 1) * (width - 1))
+        hooked = np.diff(first) >= self.hook_words
+        hook_end = np.zeros(n, dtype=np.int64)
+        hook_end[hooked] = ends[first[:-1][hooked] + self.hook_words - 1] % (width - 1) + 1
+
+        repeated = space[:, 1:] & space[:, :-1]
+        first_repeat = repeated.argmax(axis=1)
+        messy = (space[:, 0] & (raw[:, 0] != 0)) | (repeated[np.arange(n), first_repeat] & (first_repeat < hook_end))
+        control = (raw - 1) < 31
+        if control.any():
+            messy |= control.any(axis=1)
+
+        values = np.full(n, np.nan)
+        values[~hooked & ~full] = self.short_script
+        values[raw[:, 0] == 0] = 0.0  # empty script
+        scored = hooked & ~messy
+        if not scored.any():
+            return values
+
+        hook = np.maximum(raw + ((raw - 65) < 26) * np.uint8(32), np.uint8(32)).ravel()  # A-Z -> a-z
+        last = hook.size - 1
+
+        total = np.full(n, self.base + self._always)
+        for byte, patterns in self._by_first_byte.items():
+            starts = np.flatnonzero(hook == byte)
+            for encoded, weight in patterns:
+                found = starts
+                for offset in range(1, len(encoded)):
+                    found = found[hook[np.minimum(found + offset, last)] == encoded[offset]]
+                rows = found // width
+                # Whole match inside its row's hook
+                rows = rows[found % width + len(encoded) <= hook_end[rows]]
+                hits = np.zeros(n, dtype=bool)
+                hits[rows] = True
+                total += hits * weight
+        values[scored] = np.clip(total[scored], 0.0, 10.0)
+        return values
+
+# Singleton instance
+hook_analyzer = HookAnalyzer.from_file()
@@ -0,0 +1,298 @@
+from typing import Dict, List, Any
+import logging
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Declarative index registry: collection -> list of index specs.
+# Names are explicit so reconciliation can detect drift by name.
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    'users': [
+        {'name': 'email_unique', 'keys': [('email', 1)], 'unique': True},
+    ],
+    'video_drafts': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+        {'name': 'status_created_at', 'keys': [('status', 1), ('created_at', -1), ('id', -1)]},
+        # Uniqueness index window loads
+        {'name': 'created_at', 'keys': [('created_at', 1)]},
+    ],
+    'post_plans': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+        {'name': 'status_scheduled_time', 'keys': [('status', 1), ('scheduled_time', 1)]},
+        {'name': 'status_posted_at', 'keys': [('status', 1), ('posted_at', -1)]},
+        {'name': 'video_draft_id_status', 'keys': [('video_draft_id', 1), ('status', 1)]},
+        {'name': 'scheduled_time', 'keys': [('scheduled_time', 1), ('id', 1)]},
+        # Publishing worker claims: due plans and expired leases per platform
+        {'name': 'platform_status_scheduled_time', 'keys': [('platform', 1), ('status', 1), ('scheduled_time', 1)]},
+        {'name': 'platform_status_lease_expires_at', 'keys': [('platform', 1), ('status', 1), ('lease_expires_at', 1)]},
+    ],
+    'trends': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+        {'name': 'date', 'keys': [('date', 1)]},
+        {'name': 'created_at', 'keys': [('created_at', 1)]},
+        # Scanner upsert key; trends saved before fingerprints existed are exempt
+        {'name': 'date_fingerprint_unique', 'keys': [('date', 1), ('fingerprint', 1)], 'unique': True,
+         'partial_filter': {'fingerprint': {'$exists': True}}},
+    ],
+    'affiliate_offers': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+    ],
+    'tracking_links': [
+        {'name': 'short_code_unique', 'keys': [('short_code', 1)], 'unique': True},
+        {'name': 'offer_video_platform', 'keys': [('offer_id', 1), ('video_id', 1), ('platform', 1)]},
+    ],
+    # Short-code block reservations and the affiliate catalog version
+    'counters': [
+        {'name': 'name_unique', 'keys': [('name', 1)], 'unique': True},
+    ],
+    'capabilities': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+    ],
+    'templates': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+    ],
+    'platform_credentials': [
+        {'name': 'platform', 'keys': [('platform', 1)]},
+    ],
+    'directives': [
+        {'name': 'date', 'keys': [('date', 1)]},
+    ],
+    'webhook_events': [
+        {'name': 'key_unique', 'keys': [('key', 1)], 'unique': True},
+        # Idempotency keys only need to outlive n8n's redelivery window
+        {'name': 'received_at_ttl', 'keys': [('received_at', 1)], 'expire_after_seconds': 7 * 24 * 3600},
+    ],
+    'safety_verdicts': [
+        {'name': 'key_unique', 'keys': [('key', 1)], 'unique': True},
+        # Verdicts for retired ruleset versions are never read again
+        {'name': 'created_at_ttl', 'keys': [('created_at', 1)], 'expire_after_seconds': 30 * 24 * 3600},
+    ],
+    'model_state': [
+        {'name': 'name_unique', 'keys': [('name', 1)], 'unique': True},
+    ],
+    'post_metrics': [
+        {'name': 'post_resolution_bucket', 'keys': [('post_id', 1), ('resolution', 1), ('bucket_start', 1)], 'unique': True},
+    ],
+    'platform_metrics': [
+        {'name': 'platform_resolution_bucket', 'keys': [('platform', 1), ('resolution', 1), ('bucket_start', 1)], 'unique': True},
+    ],
+    'jobs': [
+        {'name': 'id_unique', 'keys': [('id', 1)], 'unique': True},
+        # Identical queued/running jobs collapse into one
+        {'name': 'dedupe_key_active_unique', 'keys': [('dedupe_key', 1)], 'unique': True,
+         'partial_filter': {'active': True}},
+        {'name': 'status_run_at', 'keys': [('status', 1), ('run_at', 1)]},
+        {'name': 'status_lease_expires_at', 'keys': [('status', 1), ('lease_expires_at', 1)]},
+        {'name': 'created_at_id', 'keys': [('created_at', -1), ('id', -1)]},
+        {'name': 'status_created_at_id', 'keys': [('status', 1), ('created_at', -1), ('id', -1)]},
+    ],
+    'performance_rollups': [
+        # $merge on post_id requires a unique index on the target collection
+        {'name': 'post_id_unique', 'keys': [('post_id', 1)], 'unique': True},
+        {'name': 'eligible_views', 'keys': [('eligible', 1), ('views', -1)]},
+    ],
+}
+
+# Every query shape issued by the API routers. Values are placeholders;
+# only the filter/sort structure matters to the planner.
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {'name': 'auth.find_user', 'collection': 'users', 'filter': {'email': 'x'}},
+    {'name': 'dashboard.pending_videos', 'collection': 'video_drafts', 'filter': {'status': 'pending_approval'}, 'count': True},
+    {'name': 'dashboard.scheduled_posts', 'collection': 'post_plans', 'filter': {'status': 'scheduled'}, 'count': True},
+    {'name': 'dashboard.recent_posts', 'collection': 'post_plans', 'filter': {'status': 'published'}, 'sort': {'posted_at': -1}},
+    {'name': 'trends.daily', 'collection': 'trends', 'filter': {'date': '1970-01-01'}},
+    {'name': 'videos.queue', 'collection': 'video_drafts', 'filter': {'status': 'pending_approval'}, 'sort': {'created_at': -1, 'id': -1}},
+    {'name': 'videos.queue_after', 'collection': 'video_drafts',
+     'filter': {'$and': [{'status': 'pending_approval'}, {'$or': [{'created_at': {'$lt': 'x'}}, {'created_at': 'x', 'id': {'$lt': 'x'}}]}]},
+     'sort': {'created_at': -1, 'id': -1}},
+    {'name': 'uniqueness.recent_videos', 'collection': 'video_drafts', 'filter': {'created_at': {'$gt': 'x'}}},
+    {'name': 'uniqueness.recent_trends', 'collection': 'trends', 'filter': {'created_at': {'$gt': 'x'}}},
+    {'name': 'videos.by_id', 'collection': 'video_drafts', 'filter': {'id': 'x'}},
+    {'name': 'schedule.posts', 'collection': 'post_plans', 'filter': {}, 'sort': {'scheduled_time': 1, 'id': 1}},
+    {'name': 'schedule.posts_after', 'collection': 'post_plans',
+     'filter': {'$or': [{'scheduled_time': {'$gt': 'x'}}, {'scheduled_time': 'x', 'id': {'$gt': 'x'}}]},
+     'sort': {'scheduled_time': 1, 'id': 1}},
+    {'name': 'schedule.by_id', 'collection': 'post_plans', 'filter': {'id': 'x'}},
+    {'name': 'schedule.by_video', 'collection': 'post_plans', 'filter': {'video_draft_id': 'x', 'status': 'published'}},
+    {'name': 'publishing.claim', 'collection': 'post_plans',
+     'filter': {'platform': 'x', '$or': [
+         {'status': 'scheduled', 'scheduled_time': {'$lte': 'x'}},
+         {'status': 'publishing', 'lease_expires_at': {'$lt': 'x'}}
+     ]},
+     'sort': {'scheduled_time': 1}},
+    {'name': 'affiliates.by_id', 'collection': 'affiliate_offers', 'filter': {'id': 'x'}},
+    {'name': 'affiliates.by_ids', 'collection': 'affiliate_offers', 'filter': {'id': {'$in': ['x', 'y']}}},
+    {'name': 'tracking_links.by_code', 'collection': 'tracking_links', 'filter': {'short_code': 'x'}},
+    {'name': 'counters.by_name', 'collection': 'counters', 'filter': {'name': 'x'}},
+    {'name': 'affiliates.page', 'collection': 'affiliate_offers', 'filter': {'id': {'$gt': 'x'}}, 'sort': {'id': 1}},
+    {'name': 'capabilities.page', 'collection': 'capabilities', 'filter': {'id': {'$gt': 'x'}}, 'sort': {'id': 1}},
+    {'name': 'templates.page', 'collection': 'templates', 'filter': {'id': {'$gt': 'x'}}, 'sort': {'id': 1}},
+    {'name': 'credentials.by_platform', 'collection': 'platform_credentials', 'filter': {'platform': 'x'}},
+    {'name': 'directive.by_date', 'collection': 'directives', 'filter': {'date': '1970-01-01'}},
+    {'name': 'safety.verdicts', 'collection': 'safety_verdicts', 'filter': {'key': {'$in': ['x', 'y']}}},
+    {'name': 'metrics.post_series', 'collection': 'post_metrics',
+     'filter': {'post_id': 'x', 'resolution': 'day', 'bucket_start': {'$gte': 'x', '$lte': 'x'}}, 'sort': {'bucket_start': 1}},
+    {'name': 'metrics.platform_series', 'collection': 'platform_metrics',
+     'filter': {'platform': 'x', 'resolution': 'day', 'bucket_start': {'$gte': 'x', '$lte': 'x'}}, 'sort': {'bucket_start': 1}},
+    {'name': 'jobs.claim', 'collection': 'jobs',
+     'filter': {'type': {'$in': ['x']}, '$or': [
+         {'status': 'queued', 'run_at': {'$lte': 'x'}},
+         {'status': 'running', 'lease_expires_at': {'$lt': 'x'}, '$expr': {'$lt': ['$attempts', '$max_attempts']}}
+     ]},
+     'sort': {'run_at': 1}},
+    {'name': 'jobs.expired', 'collection': 'jobs',
+     'filter': {'type': {'$in': ['x']}, 'status': 'running', 'lease_expires_at': {'$lt': 'x'},
+                '$expr': {'$gte': ['$attempts', '$max_attempts']}}},
+    {'name': 'jobs.by_id', 'collection': 'jobs', 'filter': {'id': 'x'}},
+    {'name': 'jobs.list', 'collection': 'jobs', 'filter': {}, 'sort': {'created_at': -1, 'id': -1}},
+    {'name': 'analytics.rollup_summary', 'collection': 'performance_rollups', 'filter': {'eligible': True}, 'sort': {'views': -1}},
+    {'name': 'analytics.rollup_by_post', 'collection': 'performance_rollups', 'filter': {'post_id': 'x'}},
+]
+
+
+DUPLICATE_KEY = 11000
+
+
+class IndexVerificationError(Exception):
+    """Raised when a registered query shape is not served by an index"""
+
+
+class IndexManager:
+    """Reconciles declared MongoDB indexes and verifies query plans"""
+
+    def __init__(self, registry: Dict[str, List[Dict[str, Any]]] = None,
+                 query_shapes: List[Dict[str, Any]] = None):
+        self.registry = registry or INDEX_REGISTRY
+        self.query_shapes = query_shapes or QUERY_SHAPES
+
+    async def reconcile(self, db, drop_unknown: bool = False) -> Dict[str, Any]:
+        """Create missing indexes, rebuild changed ones and report drift"""
+        report = {'created': [], 'rebuilt': [], 'unknown': [], 'dropped': [], 'failed': []}
+
+        for collection, specs in self.registry.items():
+            existing = await db[collection].index_information()
+            declared = {spec['name'] for spec in specs}
+
+            for spec in specs:
+                current = existing.get(spec['name'])
+                if current is None:
+                    if await self._create(db, collection, spec, report):
+                        report['created'].append(f"{collection}.{spec['name']}")
+                elif not self._matches(current, spec):
+                    await db[collection].drop_index(spec['name'])
+                    if await self._create(db, collection, spec, report):
+                        report['rebuilt'].append(f"{collection}.{spec['name']}")
+
+            for name in existing:
+                if name == '_id_' or name in declared:
+                    continue
+                if drop_unknown:
+                    await db[collection].drop_index(name)
+                    report['dropped'].append(f"{collection}.{name}")
+                else:
+                    report['unknown'].append(f"{collection}.{name}")
+
+        return report
+
+    async def _create(self, db, collection: str, spec: Dict[str, Any], report: Dict[str, Any]) -> bool:
+        options = {'name': spec['name'], 'unique': spec.get('unique', False)}
+        if 'expire_after_seconds' in spec:
+            options['expireAfterSeconds'] = spec['expire_after_seconds']
+        if 'partial_filter' in spec:
+            options['partialFilterExpression'] = spec['partial_filter']
+        try:
+            await db[collection].create_index(spec['keys'], **options)
+        except OperationFailure as e:
+            if e.code != DUPLICATE_KEY:
+                raise
+            # Existing rows violate a unique index; the data needs cleaning, the app can still start
+            logger.error(f"Index {collection}.{spec['name']} not built, duplicate keys in existing data: {str(e)}")
+            report['failed'].append(f"{collection}.{spec['name']}")
+            return False
+        return True
+
+    def _matches(self, current: Dict[str, Any], spec: Dict[str, Any]) -> bool:
+        """Compare index_information() output with a declared spec"""
+        current_keys = [(field, int(direction)) for field, direction in current.get('key', [])]
+        return (current_keys == list(spec['keys'])
+                and bool(current.get('unique', False)) == spec.get('unique', False)
+                and current.get('expireAfterSeconds') == spec.get('expire_after_seconds')
+                and current.get('partialFilterExpression') == spec.get('partial_filter'))
+
+    async def verify(self, db) -> List[Dict[str, Any]]:
+        """Explain every registered query shape and fail on collection scans"""
+        results = []
+        for shape in self.query_shapes:
+            plan = await db.command(self._explain_command(shape))
+            stages = self._winning_stages(plan)
+            results.append({
+                'name': shape['name'],
+                'collection': shape['collection'],
+                'stages': stages,
+                'collscan': 'COLLSCAN' in stages
+            })
+
+        offenders = [r['name'] for r in results if r['collscan']]
+        if offenders:
+            raise IndexVerificationError(f"Query shapes doing COLLSCAN: {', '.join(offenders)}")
+        return results
+
+    def _explain_command(self, shape: Dict[str, Any]) -> Dict[str, Any]:
+        if shape.get('count'):
+            return {'explain': {'count': shape['collection'], 'query': shape['filter']},
+                    'verbosity': 'queryPlanner'}
+
+        command = {'find': shape['collection'], 'filter': shape['filter']}
+        if shape.get('sort'):
+            command['sort'] = shape['sort']
+        return {'explain': command, 'verbosity': 'queryPlanner'}
+
+    def _winning_stages(self, node: Any, in_winning_plan: bool = False) -> List[str]:
+        """Collect stage names from every winningPlan subtree of an explain document"""
+        stages = []
+        if isinstance(node, dict):
+            if in_winning_plan and 'stage' in node:
+                stages.append(node['stage'])
+            for key, value in node.items():
+                if key == 'rejectedPlans':
+                    continue
+                stages.extend(self._winning_stages(value, in_winning_plan or key == 'winningPlan'))
+        elif isinstance(node, list):
+            for item in node:
+                stages.extend(self._winning_stages(item, in_winning_plan))
+        return stages
+
+# Singleton instance
+index_manager = IndexManager()
+
+
+if __name__ == '__main__':
+    # Verification mode: python -m services.index_manager [--verify] [--drop-unknown]
+    import asyncio
+    import os
+    import sys
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    logging.basicConfig(level=logging.INFO)
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        db = client[os.environ['DB_NAME']]
+        try:
+            report = await index_manager.reconcile(db, drop_unknown='--drop-unknown' in sys.argv)
+            logger.info(f"Index reconcile: {report}")
+            if '--verify' in sys.argv:
+                for result in await index_manager.verify(db):
+                    logger.info(f"{result['name']}: {' > '.join(result['stages'])}")
+            return 0
+        except IndexVerificationError as e:
+            logger.error(str(e))
+            return 1
+        finally:
+            client.close()
+
+    sys.exit(asyncio.run(main()))
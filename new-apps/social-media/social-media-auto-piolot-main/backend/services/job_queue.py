@@ -0,0 +1,247 @@
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from datetime import datetime, timezone, timedelta
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = 'jobs'
+
+# queued -> running -> succeeded | failed (running -> queued again on a retryable error)
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Durable job queue stored in the `jobs` collection"""
+
+    def dedupe_key(self, job_type: str, params: Dict[str, Any]) -> str:
+        body = json.dumps(params, sort_keys=True, default=str)
+        return f"{job_type}:{hashlib.sha256(body.encode()).hexdigest()[:16]}"
+
+    async def enqueue(self, db, job_type: str, params: Optional[Dict[str, Any]] = None,
+                      max_attempts: int = 3, dedupe: bool = True) -> Dict[str, Any]:
+        """Insert a job; an identical queued/running job is returned instead of a new one"""
+        params = params or {}
+        now = _now().isoformat()
+        job = {
+            'id': str(uuid.uuid4()),
+            'type': job_type,
+            'params': params,
+            'status': 'queued',
+            'active': True,
+            'progress': {'percent': 0, 'message': None},
+            'attempts': 0,
+            'max_attempts': max_attempts,
+            'run_at': now,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        if dedupe:
+            # Unique among active jobs only (partial index on active: true)
+            job['dedupe_key'] = self.dedupe_key(job_type, params)
+
+        try:
+            await db[JOBS_COLLECTION].insert_one(job)
+        except DuplicateKeyError:
+            existing = await db[JOBS_COLLECTION].find_one(
+                {'dedupe_key': job['dedupe_key'], 'active': True}, {'_id': 0}
+            )
+            if existing:
+                return {**existing, 'deduplicated': True}
+            # The duplicate finished between insert and lookup; enqueue afresh
+            return await self.enqueue(db, job_type, params, max_attempts, dedupe)
+
+        job.pop('_id', None)
+        return {**job, 'deduplicated': False}
+
+    async def get(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        return await db[JOBS_COLLECTION].find_one({'id': job_id}, {'_id': 0})
+
+
+class JobContext:
+    """Handed to job handlers for database access and progress reporting"""
+
+    def __init__(self, db, job: Dict[str, Any], worker: 'JobWorker'):
+        self.db = db
+        self.job = job
+        self.worker = worker
+
+    async def progress(self, percent: float, message: Optional[str] = None):
+        await self.db[JOBS_COLLECTION].update_one(
+            {'id': self.job['id'], 'lease_owner': self.worker.owner},
+            {'$set': {'progress': {'percent': round(percent, 1), 'message': message},
+                      'updated_at': _now().isoformat()}}
+        )
+
+
+JobHandler = Callable[[JobContext, Dict[str, Any]], Awaitable[Any]]
+
+
+class JobWorker:
+    """Claims and runs jobs with leases, heartbeats and retry backoff"""
+
+    def __init__(self,
+                 db,
+                 concurrency: int = 2,
+                 lease_seconds: float = 60.0,
+                 poll_interval: float = 2.0,
+                 retry_backoff_seconds: float = 10.0,
+                 owner: Optional[str] = None):
+        self.db = db
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    def register(self, job_type: str, handler: JobHandler):
+        self.handlers[job_type] = handler
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Lease the oldest due job of a type this worker handles, or one whose lease expired"""
+        now = _now()
+        now_iso = now.isoformat()
+        return await self.db[JOBS_COLLECTION].find_one_and_update(
+            {'type': {'$in': list(self.handlers)}, '$or': [
+                {'status': 'queued', 'run_at': {'$lte': now_iso}},
+                # A crashed worker's attempt counts: exhausted jobs are left to fail_expired
+                {'status': 'running', 'lease_expires_at': {'$lt': now_iso},
+                 '$expr': {'$lt': ['$attempts', '$max_attempts']}}
+            ]},
+            {'$set': {
+                'status': 'running',
+                'lease_owner': self.owner,
+                'lease_expires_at': (now + timedelta(seconds=self.lease_seconds)).isoformat(),
+                'started_at': now_iso,
+                'updated_at': now_iso
+            }, '$inc': {'attempts': 1}},
+            sort=[('run_at', 1)],
+            projection={'_id': 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def fail_expired(self) -> int:
+        """Fail jobs whose lease expired on their last attempt (the worker died mid-run)"""
+        now_iso = _now().isoformat()
+        result = await self.db[JOBS_COLLECTION].update_many(
+            {'type': {'$in': list(self.handlers)}, 'status': 'running', 'lease_expires_at': {'$lt': now_iso},
+             '$expr': {'$gte': ['$attempts', '$max_attempts']}},
+            {'$set': {'status': 'failed', 'active': False, 'error': 'Lease expired on the final attempt',
+                      'finished_at': now_iso, 'updated_at': now_iso},
+             '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+        )
+        if result.modified_count:
+            logger.warning(f"Failed {result.modified_count} job(s) whose final attempt lost its worker")
+        return result.modified_count
+
+    async def _heartbeat(self, job_id: str, handler: asyncio.Task):
+        """Extend the lease while the handler runs; cancel the handler if the lease was lost"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await self.db[JOBS_COLLECTION].update_one(
+                    {'id': job_id, 'lease_owner': self.owner},
+                    {'$set': {'lease_expires_at': (_now() + timedelta(seconds=self.lease_seconds)).isoformat()}}
+                )
+            except Exception as e:
+                # Transient: the lease outlives a couple of missed beats
+                logger.warning(f"Job {job_id} heartbeat failed: {str(e)}")
+                continue
+            if result.matched_count == 0:
+                # Reclaimed by another worker after missed beats; stop duplicating its work
+                logger.error(f"Job {job_id} lost its lease; cancelling the handler")
+                handler.cancel()
+                return
+
+    async def _finish(self, job: Dict[str, Any], update: Dict[str, Any]):
+        update['$set']['updated_at'] = _now().isoformat()
+        update.setdefault('$unset', {}).update({'lease_owner': '', 'lease_expires_at': ''})
+        await self.db[JOBS_COLLECTION].update_one(
+            {'id': job['id'], 'status': 'running', 'lease_owner': self.owner}, update
+        )
+
+    async def run_job(self, job: Dict[str, Any]):
+        handler = asyncio.ensure_future(
+            self.handlers[job['type']](JobContext(self.db, job, self), job.get('params', {}))
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job['id'], handler))
+        try:
+            result = await handler
+            await self._finish(job, {'$set': {
+                'status': 'succeeded', 'active': False, 'result': result, 'error': None,
+                'progress': {'percent': 100, 'message': 'done'},
+                'finished_at': _now().isoformat()
+            }})
+            logger.info(f"Job {job['id']} ({job['type']}) succeeded")
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise
+            # Lease lost: the job now belongs to whichever worker reclaimed it
+            logger.warning(f"Job {job['id']} ({job['type']}) abandoned after losing its lease")
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['type']}) failed: {str(e)}")
+            if job['attempts'] >= job.get('max_attempts', 1):
+                await self._finish(job, {'$set': {
+                    'status': 'failed', 'active': False, 'error': str(e),
+                    'finished_at': _now().isoformat()
+                }})
+            else:
+                delay = self.retry_backoff_seconds * 2 ** (job['attempts'] - 1)
+                await self._finish(job, {'$set': {
+                    'status': 'queued', 'error': str(e),
+                    'run_at': (_now() + timedelta(seconds=delay)).isoformat()
+                }})
+        finally:
+            heartbeat.cancel()
+            handler.cancel()
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logger.error(f"Job claim error: {str(e)}")
+                job = None
+
+            if job is None:
+                try:
+                    await self.fail_expired()
+                except Exception as e:
+                    logger.error(f"Job sweep error: {str(e)}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.run_job(job)
+
+    def start(self):
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        logger.info(f"Job worker {self.owner} started ({self.concurrency} slots: {', '.join(self.handlers)})")
+
+    async def stop(self):
+        """Stop claiming; running jobs finish their current attempt"""
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+# Singleton instance
+job_queue = JobQueue()
@@ -0,0 +1,168 @@
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+POST_METRICS = 'post_metrics'
+PLATFORM_METRICS = 'platform_metrics'
+
+# Downsampled resolutions kept for every sample; raw readings live inside the hourly buckets
+RESOLUTIONS = ('hour', 'day')
+MAX_RAW_SAMPLES_PER_HOUR = 360
+DUPLICATE_KEY = 11000
+
+
+def bucket_start(ts: datetime, resolution: str) -> str:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    ts = ts.astimezone(timezone.utc)
+    if resolution == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0).isoformat()
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+
+
+class MetricsStore:
+    """Bucketed time-series of post performance snapshots with hourly/daily rollups"""
+
+    def _sample_writes(self, sample: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """(collection, bucket filter, update) for one reading into every per-post and per-platform bucket"""
+        ts: datetime = sample['ts']
+        views = sample.get('views', 0) or 0
+        engagement_rate = sample.get('engagement_rate', 0) or 0
+        watch_time = sample.get('watch_time', 0) or 0
+        # Growth since the previous reading; feeds platform-level totals without re-reading posts
+        views_delta = max(0, views - (sample.get('previous_views') or 0))
+
+        writes = []
+        for resolution in RESOLUTIONS:
+            update = {
+                '$setOnInsert': {'first_views': views},
+                '$set': {
+                    'platform': sample.get('platform'),
+                    'last_ts': ts.isoformat(),
+                    'last_views': views,
+                    'last_engagement_rate': engagement_rate,
+                    'last_watch_time': watch_time
+                },
+                '$max': {'max_views': views},
+                '$inc': {'count': 1, 'engagement_sum': engagement_rate, 'views_delta': views_delta}
+            }
+            if resolution == 'hour':
+                update['$push'] = {'samples': {
+                    '$each': [{'ts': ts.isoformat(), 'views': views,
+                               'engagement_rate': engagement_rate, 'watch_time': watch_time}],
+                    '$slice': -MAX_RAW_SAMPLES_PER_HOUR
+                }}
+
+            writes.append((
+                POST_METRICS,
+                {'post_id': sample['post_id'], 'resolution': resolution, 'bucket_start': bucket_start(ts, resolution)},
+                update
+            ))
+
+            if sample.get('platform'):
+                writes.append((
+                    PLATFORM_METRICS,
+                    {'platform': sample['platform'], 'resolution': resolution,
+                     'bucket_start': bucket_start(ts, resolution)},
+                    {'$inc': {'count': 1, 'engagement_sum': engagement_rate, 'views_delta': views_delta}}
+                ))
+        return writes
+
+    def _merge(self, update: Dict[str, Any], later: Dict[str, Any]):
+        """Fold a later reading's update for the same bucket into an earlier one, as if applied in order"""
+        if '$set' in later:
+            update['$set'] = later['$set']
+        for field, value in later.get('$inc', {}).items():
+            update['$inc'][field] = update['$inc'].get(field, 0) + value
+        for field, value in later.get('$max', {}).items():
+            update['$max'][field] = max(update['$max'][field], value)
+        if '$push' in later:
+            update['$push']['samples']['$each'].extend(later['$push']['samples']['$each'])
+
+    async def _bulk_upsert(self, collection, writes: List[UpdateOne]):
+        try:
+            await collection.bulk_write(writes, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if not errors or any(err.get('code') != DUPLICATE_KEY for err in errors):
+                raise
+            # Another worker created the same new bucket first; the retried upsert now updates it
+            await collection.bulk_write([writes[err['index']] for err in errors], ordered=False)
+
+    async def record_many(self, db, samples: List[Dict[str, Any]]):
+        """Write a batch of readings with one unordered bulk_write per collection.
+
+        Readings for the same bucket are merged into one update first, so no two
+        writes in a batch touch the same document and their order can't matter.
+        """
+        buckets: Dict[Tuple[str, Tuple], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        for sample in samples:
+            for collection, query, update in self._sample_writes(sample):
+                key = (collection, tuple(query.items()))
+                if key in buckets:
+                    self._merge(buckets[key][1], update)
+                else:
+                    buckets[key] = (query, update)
+
+        grouped: Dict[str, List[UpdateOne]] = {POST_METRICS: [], PLATFORM_METRICS: []}
+        for (collection, _), (query, update) in buckets.items():
+            grouped[collection].append(UpdateOne(query, update, upsert=True))
+
+        for collection, writes in grouped.items():
+            if writes:
+                await self._bulk_upsert(db[collection], writes)
+
+    async def record(self, db, sample: Dict[str, Any]):
+        await self.record_many(db, [sample])
+
+    def _range_filter(self, resolution: str, start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+        """Bound on bucket_start; the start is aligned down so its partial bucket is included"""
+        bounds = {}
+        if start:
+            bounds['$gte'] = bucket_start(start, resolution)
+        if end:
+            bounds['$lte'] = bucket_start(end, resolution)
+        return {'bucket_start': bounds} if bounds else {}
+
+    async def post_series(self, db, post_id: str, resolution: str = 'day',
+                          start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Per-post series; 'raw' flattens the readings kept in hourly buckets"""
+        bucket_resolution = 'hour' if resolution == 'raw' else resolution
+        query = {'post_id': post_id, 'resolution': bucket_resolution,
+                 **self._range_filter(bucket_resolution, start, end)}
+        projection = {'_id': 0, 'post_id': 0, 'resolution': 0}
+        if resolution != 'raw':
+            projection['samples'] = 0
+
+        buckets = await db[POST_METRICS].find(query, projection).sort('bucket_start', 1).to_list(None)
+
+        if resolution == 'raw':
+            return [sample for bucket in buckets for sample in bucket.get('samples', [])]
+
+        return [{
+            'bucket_start': b['bucket_start'],
+            'views': b.get('last_views', 0),
+            'views_gained': b.get('views_delta', 0),
+            'max_views': b.get('max_views', 0),
+            'avg_engagement_rate': round(b.get('engagement_sum', 0) / max(1, b.get('count', 0)), 4),
+            'watch_time': b.get('last_watch_time', 0),
+            'samples': b.get('count', 0)
+        } for b in buckets]
+
+    async def platform_series(self, db, platform: str, resolution: str = 'day',
+                              start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Per-platform series of views gained and mean engagement per bucket"""
+        query = {'platform': platform, 'resolution': resolution, **self._range_filter(resolution, start, end)}
+        buckets = await db[PLATFORM_METRICS].find(query, {'_id': 0}).sort('bucket_start', 1).to_list(None)
+
+        return [{
+            'bucket_start': b['bucket_start'],
+            'views_gained': b.get('views_delta', 0),
+            'avg_engagement_rate': round(b.get('engagement_sum', 0) / max(1, b.get('count', 0)), 4),
+            'samples': b.get('count', 0)
+        } for b in buckets]
+
+# Singleton instance
+metrics_store = MetricsStore()
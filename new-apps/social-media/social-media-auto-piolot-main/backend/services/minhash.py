@@ -0,0 +1,129 @@
+from typing import Iterable, List, Set, Tuple
+import hashlib
+import random
+import re
+
+import numpy as np
+
+# Smallest prime above 2^32: with 32-bit hashes and coefficients, a*h + b stays below 2^64,
+# so the universal hash (a*h + b) mod p is exact in uint64 arithmetic.
+PRIME = 4294967311
+MAX_HASH = (1 << 32) - 1
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace so trivial edits don't change shingles"""
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def shingles(text: str, size: int = 5) -> Set[str]:
+    """Character shingles of the normalized text (whole text if shorter than one shingle)"""
+    normalized = normalize(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def _item_value(item: str) -> int:
+    """Items of up to 8 bytes map to their big-endian bytes (collision-free); longer ones are hashed"""
+    data = item.encode()
+    if len(data) > 8:
+        data = hashlib.blake2b(data, digest_size=8).digest()
+    return int.from_bytes(data, 'big')
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """64-bit values to well-spread 32-bit hashes (Fibonacci hashing, top half of the product)"""
+    return (values * _MIX) >> np.uint64(32)
+
+
+class MinHasher:
+    """MinHash signatures via universal hashing (a*h + b) mod p, vectorized over all shingles and permutations"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._a = np.array([rng.randrange(1, 1 << 32) for _ in range(num_perm)], dtype=np.uint64)[:, None]
+        self._b = np.array([rng.randrange(0, 1 << 32) for _ in range(num_perm)], dtype=np.uint64)[:, None]
+
+    def _signature(self, hashes: np.ndarray) -> Tuple[int, ...]:
+        if not hashes.size:
+            return tuple([MAX_HASH] * self.num_perm)
+        permuted = (self._a * hashes[None, :] + self._b) % np.uint64(PRIME) & np.uint64(MAX_HASH)
+        return tuple(permuted.min(axis=1).tolist())
+
+    def signature(self, items: Iterable[str]) -> Tuple[int, ...]:
+        values = np.fromiter((_item_value(item) for item in set(items)), dtype=np.uint64)
+        return self._signature(_mix(values))
+
+    def text_signature(self, text: str, shingle_size: int = 5) -> Tuple[int, ...]:
+        """Same as signature(shingles(text)), packing each ASCII shingle into an integer with NumPy"""
+        data = normalize(text).encode()
+        count = len(data) - shingle_size + 1
+        if count <= 1 or shingle_size > 8:
+            return self.signature(shingles(text, shingle_size))
+        chars = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+        packed = np.zeros(count, dtype=np.uint64)
+        for offset in range(shingle_size):
+            packed = (packed << np.uint64(8)) | chars[offset:offset + count]
+        return self._signature(_mix(np.unique(packed)))
+
+    @staticmethod
+    def jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity: fraction of matching minima"""
+        if not sig_a:
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: List[dict] = [{} for _ in range(bands)]
+        self.signatures: dict = {}
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def insert(self, key, signature: Tuple[int, ...]):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            band.setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            members = band.get(band_key)
+            if members:
+                members.discard(key)
+                if not members:
+                    del band[band_key]
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set:
+        found = set()
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            found |= band.get(band_key, set())
+        return found
+
+    def query(self, signature: Tuple[int, ...], threshold: float = 0.0) -> List[Tuple[object, float]]:
+        """Candidates with their estimated Jaccard similarity, most similar first"""
+        scored = [
+            (key, MinHasher.jaccard(signature, self.signatures[key]))
+            for key in self.candidates(signature)
+        ]
+        return sorted([s for s in scored if s[1] >= threshold], key=lambda x: x[1], reverse=True)
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,321 @@
+from typing import Dict, List, Any, Optional, Tuple, Union
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+
+from services.timing_tables import SLOTS, TimingTables, timing_tables
+from services.viral_predictor import CALIBRATION, FEATURES, RECOMMENDATIONS, ViralPredictor, viral_predictor
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(os.environ.get('VIRAL_MODEL_DIR', Path(__file__).parent.parent / 'models' / 'viral'))
+
+# File layout: MAGIC | uint32 header length | JSON header | padding | float64 arrays.
+# The header records each array's element offset and shape; the arrays are
+# memory-mapped read-only, so loading costs one header read however large the
+# timing tables get.
+MAGIC = b'SFMODEL1'
+ALIGN = 64
+ARTIFACT_NAME = re.compile(r'^viral-(\d+)\.model$')
+
+
+def artifact_path(model_dir: Path, version: int) -> Path:
+    return Path(model_dir) / f"viral-{version:06d}.model"
+
+
+def write_artifact(path: Path, version: int, weights: Dict[str, float], calibration: Dict[str, float],
+                   timing: Dict[str, np.ndarray], metadata: Optional[Dict[str, Any]] = None,
+                   exclusive: bool = False) -> Path:
+    """Write a model artifact atomically (temp file + rename).
+
+    exclusive claims the name first with O_CREAT|O_EXCL and raises
+    FileExistsError if another writer already holds it.
+    """
+    platforms = sorted(timing)
+    arrays = {
+        'weights': np.array([weights[name] for name in FEATURES], dtype='<f8'),
+        'timing': (np.array([timing[p] for p in platforms], dtype='<f8') if platforms
+                   else np.zeros((0, SLOTS), dtype='<f8'))
+    }
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'offset': offset, 'shape': list(array.shape)}
+        offset += array.size
+
+    header = json.dumps({
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'features': list(FEATURES),
+        'calibration': calibration,
+        'platforms': platforms,
+        'arrays': layout,
+        'metadata': metadata or {}
+    }, sort_keys=True).encode()
+    data_start = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if exclusive:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            f.write(b'\0' * (data_start - len(MAGIC) - 4 - len(header)))
+            for array in arrays.values():
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        if exclusive:
+            # Release the claimed name; a later publish can take the version
+            path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+class ModelArtifact:
+    """A loaded, read-only model version; the arrays are views into the memory map"""
+
+    __slots__ = ('path', 'version', 'created_at', 'weights', 'calibration', 'timing', 'metadata')
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a viral model artifact")
+            (header_length,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length))
+        if header['features'] != list(FEATURES):
+            raise ValueError(f"{self.path}: feature set {header['features']} does not match this predictor")
+
+        data_start = -(-(len(MAGIC) + 4 + header_length) // ALIGN) * ALIGN
+        total = sum(int(np.prod(spec['shape'])) for spec in header['arrays'].values())
+        data = np.memmap(self.path, dtype='<f8', mode='r', offset=data_start, shape=(total,))
+
+        def array(name: str) -> np.ndarray:
+            spec = header['arrays'][name]
+            return data[spec['offset']:spec['offset'] + int(np.prod(spec['shape']))].reshape(spec['shape'])
+
+        self.version = header['version']
+        self.created_at = header['created_at']
+        self.weights = dict(zip(FEATURES, array('weights').tolist()))
+        self.calibration = dict(header['calibration'])
+        timing = array('timing')
+        self.timing = TimingTables.frozen({platform: timing[i] for i, platform in enumerate(header['platforms'])})
+        self.metadata = header.get('metadata', {})
+
+    def apply_to(self, predictor: ViralPredictor):
+        """Serve this artifact from predictor (weights, calibration and timing swap together)"""
+        predictor.weights = dict(self.weights)
+        predictor.calibration = dict(self.calibration)
+        predictor.timing_tables = self.timing
+        predictor.model_version = self.version
+
+    def describe(self) -> Dict[str, Any]:
+        return {'version': self.version, 'created_at': self.created_at, 'weights': self.weights,
+                'calibration': self.calibration, 'platforms': sorted(self.timing.scores),
+                'metadata': self.metadata}
+
+
+class ShadowStats:
+    """Running comparison of shadow vs live viral scores"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.abs_delta_sum = 0.0
+        self.delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.recommendation_changes = 0
+
+    def record(self, live: np.ndarray, shadow: np.ndarray) -> Dict[str, Any]:
+        delta = shadow - live
+        thresholds = np.array([threshold for threshold, _ in RECOMMENDATIONS[:-1]])
+        changes = int(((live[:, None] < thresholds).sum(axis=1) != (shadow[:, None] < thresholds).sum(axis=1)).sum())
+        self.count += len(delta)
+        self.abs_delta_sum += float(np.abs(delta).sum())
+        self.delta_sum += float(delta.sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(np.abs(delta).max(initial=0.0)))
+        self.recommendation_changes += changes
+        return {'scored': len(delta), 'mean_delta': float(delta.mean()) if len(delta) else 0.0,
+                'max_abs_delta': float(np.abs(delta).max(initial=0.0)), 'recommendation_changes': changes}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'scored': self.count,
+            'mean_delta': round(self.delta_sum / self.count, 4) if self.count else 0.0,
+            'mean_abs_delta': round(self.abs_delta_sum / self.count, 4) if self.count else 0.0,
+            'max_abs_delta': round(self.max_abs_delta, 4),
+            'recommendation_changes': self.recommendation_changes
+        }
+
+
+class ModelRegistry:
+    """Versioned viral model artifacts on disk, with a live and an optional shadow version.
+
+    The LIVE and SHADOW files in the model directory hold version numbers;
+    changing either (or publish/point with a role) hot-swaps the model on the
+    next check. Without a LIVE file the predictor serves its online-learned
+    weights and the live timing tables.
+    """
+
+    def __init__(self, model_dir: Path = MODEL_DIR, predictor: ViralPredictor = viral_predictor,
+                 check_interval: float = 5.0):
+        self.model_dir = Path(model_dir)
+        self.predictor = predictor
+        self.check_interval = check_interval
+        self.live: Optional[ModelArtifact] = None
+        self.shadow: Optional[ModelArtifact] = None
+        self.shadow_predictor: Optional[ViralPredictor] = None
+        self.shadow_stats = ShadowStats()
+        self._pointers: Tuple = ()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def versions(self) -> List[int]:
+        if not self.model_dir.exists():
+            return []
+        return sorted(int(m.group(1)) for m in (ARTIFACT_NAME.match(p.name) for p in self.model_dir.iterdir()) if m)
+
+    def _read_pointer(self, name: str) -> Optional[int]:
+        try:
+            return int((self.model_dir / name).read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_pointer(self, name: str, version: Optional[int]):
+        path = self.model_dir / name
+        if version is None:
+            path.unlink(missing_ok=True)
+            return
+        tmp_path = path.with_name(f"{name}.{os.getpid()}.tmp")
+        tmp_path.write_text(f"{version}\n")
+        os.replace(tmp_path, path)
+
+    def ensure_fresh(self):
+        """Check the pointers at most every check_interval"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Load whatever LIVE/SHADOW now point at; a broken artifact is logged and the current model kept.
+
+        Artifact files are immutable, so only a pointer change triggers a load.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            pointers = (self._read_pointer('LIVE'), self._read_pointer('SHADOW'))
+            if not force and pointers == self._pointers:
+                return False
+            self._pointers = pointers
+            live_version, shadow_version = pointers
+
+            if live_version is None:
+                if self.live is not None:
+                    self._unpin()
+            elif self.live is None or self.live.version != live_version:
+                try:
+                    self.live = ModelArtifact(artifact_path(self.model_dir, live_version))
+                    self.live.apply_to(self.predictor)
+                    logger.info(f"Viral model v{live_version} is live")
+                except Exception as e:
+                    logger.error(f"Viral model v{live_version} load error: {str(e)}")
+
+            if shadow_version is None or shadow_version == live_version:
+                self.shadow, self.shadow_predictor = None, None
+            elif self.shadow is None or self.shadow.version != shadow_version:
+                try:
+                    shadow = ModelArtifact(artifact_path(self.model_dir, shadow_version))
+                    shadow_predictor = ViralPredictor()
+                    shadow.apply_to(shadow_predictor)
+                    self.shadow, self.shadow_predictor = shadow, shadow_predictor
+                    self.shadow_stats.reset()
+                    logger.info(f"Viral model v{shadow_version} is shadowing {self._live_label()}")
+                except Exception as e:
+                    logger.error(f"Viral shadow model v{shadow_version} load error: {str(e)}")
+            return True
+        finally:
+            self._lock.release()
+
+    def publish(self, weights: Dict[str, float], timing: Dict[str, np.ndarray],
+                calibration: Optional[Dict[str, float]] = None, metadata: Optional[Dict[str, Any]] = None,
+                role: Optional[str] = None) -> int:
+        """Write the next artifact version; role 'live' or 'shadow' also points at it"""
+        versions = self.versions()
+        version = (versions[-1] if versions else 0) + 1
+        while True:
+            try:
+                write_artifact(artifact_path(self.model_dir, version), version, weights,
+                               calibration or self.predictor.calibration, timing, metadata, exclusive=True)
+                break
+            except FileExistsError:
+                # Another process published this version first; artifacts are never overwritten
+                version += 1
+        if role:
+            self.point(role, version)
+        return version
+
+    def point(self, role: str, version: Optional[int]):
+        """Make a version live or shadow (None clears the shadow / unpins live) and swap now"""
+        if role not in ('live', 'shadow'):
+            raise ValueError(f"Unknown model role: {role}")
+        if version is not None and not artifact_path(self.model_dir, version).exists():
+            raise FileNotFoundError(f"No viral model artifact v{version}")
+        self._write_pointer(role.upper(), version)
+        self.refresh(force=True)
+
+    def _live_label(self) -> str:
+        return f"v{self.live.version}" if self.live else 'online-learned weights'
+
+    def _unpin(self):
+        """Back to the live timing tables and online-learned weights (adopted on the trainer's next refresh)"""
+        logger.info(f"Viral model v{self.live.version} unpinned")
+        self.live = None
+        self.predictor.model_version = None
+        self.predictor.calibration = dict(CALIBRATION)
+        self.predictor.timing_tables = timing_tables
+
+    def shadow_score(self, candidates: Union[Dict[str, List[Any]], List[Dict[str, Any]]],
+                     live_scores: List[float], reused: Dict[str, List[float]]):
+        """Score candidates with the shadow model and log how far it lands from live.
+
+        Runs off the request path. Model-independent features the live pass
+        already computed (hook_quality, uniqueness) are passed in reused, so the
+        shadow pass neither repeats them nor touches the shared indexes.
+        """
+        shadow_predictor, shadow = self.shadow_predictor, self.shadow
+        if shadow_predictor is None or not live_scores:
+            return
+        try:
+            columns = {**self.predictor._to_columns(candidates), **reused}
+            result = shadow_predictor.predict_batch(columns)
+            deltas = self.shadow_stats.record(np.array(live_scores, dtype=np.float64), result['viral_score'])
+            logger.info(f"Viral shadow v{shadow.version} vs {self._live_label()}: {deltas}")
+        except Exception as e:
+            logger.error(f"Viral shadow scoring error: {str(e)}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'model_dir': str(self.model_dir),
+            'versions': self.versions(),
+            'live': self.live.describe() if self.live else None,
+            'shadow': self.shadow.describe() if self.shadow else None,
+            'shadow_stats': self.shadow_stats.summary()
+        }
+
+# Singleton instance
+model_registry = ModelRegistry(check_interval=float(os.environ.get('VIRAL_MODEL_CHECK_SECONDS', '5')))
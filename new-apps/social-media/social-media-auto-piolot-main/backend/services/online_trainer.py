@@ -0,0 +1,253 @@
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
+from datetime import datetime, timezone, timedelta
+import logging
+import math
+import os
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from services.viral_predictor import FEATURES, ViralPredictor, viral_predictor
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATE = 'model_state'
+
+# extract_features' constant placeholders: no sample says anything about their weights
+FIXED_FEATURES = ('visual_appeal', 'platform_algorithm')
+# Features that fall back to a constant when the candidate doesn't carry the input
+INPUT_FEATURES = {'trend_score': 'trend_score', 'audience_fit': 'audience_fit_score'}
+
+Sample = Tuple[Dict[str, float], float, Sequence[str]]  # (features, target viral score, features to learn)
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class OnlineWeightTrainer:
+    """Learns ViralPredictor.weights from real views with normalized LMS, one O(features) step per reading.
+
+    The weights live in one versioned `model_state` document. Updates are
+    compare-and-set on the version, so several processes can train without
+    losing each other's steps.
+    """
+
+    def __init__(self,
+                 predictor: ViralPredictor = viral_predictor,
+                 name: str = 'viral_predictor',
+                 learning_rate: float = 0.05,
+                 min_age_hours: float = 24.0,
+                 retrain_interval_hours: float = 24.0,
+                 refresh_seconds: float = 60.0):
+        self.predictor = predictor
+        self.weights = dict(predictor.weights)
+        self.name = name
+        self.learning_rate = learning_rate
+        self.min_age = timedelta(hours=min_age_hours)
+        self.retrain_interval = timedelta(hours=retrain_interval_hours)
+        self.refresh_seconds = refresh_seconds
+        self.version = 0
+        self.samples = 0
+        self._loaded_at = 0.0
+
+    def target(self, views: float) -> float:
+        """Viral score that predict_viral_score's projection maps to these views (inverse of its calibration)"""
+        calibration = self.predictor.calibration
+        score = calibration['center'] + calibration['scale'] * math.log(max(views, 1) / calibration['base_views'])
+        return min(10.0, max(0.0, score))
+
+    def observed(self, video_data: Dict[str, Any]) -> List[str]:
+        """Features of this candidate that come from real inputs rather than a default"""
+        return [name for name in FEATURES if name not in FIXED_FEATURES
+                and (name not in INPUT_FEATURES or video_data.get(INPUT_FEATURES[name]) is not None)]
+
+    def step(self, weights: Dict[str, float], features: Dict[str, float], target: float,
+             learned: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """One normalized-LMS update of the learned features' weights; step size is independent of the feature scale.
+
+        Features left out of learned (constants and defaulted inputs) still count
+        towards the prediction error but keep their weights: with no variance
+        they would only absorb the mean target like a bias term.
+        """
+        if learned is None:
+            learned = [name for name in FEATURES if name not in FIXED_FEATURES]
+        norm = sum(features[name] ** 2 for name in learned)
+        if norm == 0:
+            return weights
+        error = target - sum(features[name] * weights[name] for name in FEATURES)
+        scale = self.learning_rate * error / norm
+        updated = dict(weights)
+        for name in learned:
+            # Weights stay non-negative: every factor is meant to help, not hurt
+            updated[name] = max(0.0, weights[name] + scale * features[name])
+        return updated
+
+    def _adopt(self, state: Dict[str, Any]):
+        self.weights = {name: state['weights'].get(name, self.weights[name]) for name in FEATURES}
+        # A pinned model artifact is served as-is; learning continues for the next export
+        if self.predictor.model_version is None:
+            self.predictor.weights = dict(self.weights)
+        self.version = state['version']
+        self.samples = state.get('samples', 0)
+        self._loaded_at = time.monotonic()
+
+    async def load(self, db):
+        """Adopt the persisted weights, seeding the state document from the current ones if missing"""
+        state = await db[MODEL_STATE].find_one({'name': self.name}, {'_id': 0})
+        if state is None:
+            state = {'name': self.name, 'version': 0, 'samples': 0, 'weights': dict(self.weights),
+                     'updated_at': datetime.now(timezone.utc).isoformat()}
+            try:
+                await db[MODEL_STATE].insert_one(dict(state))
+            except DuplicateKeyError:
+                state = await db[MODEL_STATE].find_one({'name': self.name}, {'_id': 0})
+        self._adopt(state)
+
+    async def ensure_fresh(self, db):
+        """Pick up steps taken by other processes at most every refresh_seconds"""
+        if time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            await self.load(db)
+
+    async def apply(self, db, samples: List[Sample], attempts: int = 5) -> bool:
+        """Apply the steps on top of the latest persisted version (compare-and-set, re-read on conflict)"""
+        for _ in range(attempts):
+            weights = dict(self.weights)
+            for features, target, learned in samples:
+                weights = self.step(weights, features, target, learned)
+            result = await db[MODEL_STATE].update_one(
+                {'name': self.name, 'version': self.version},
+                {'$set': {'weights': weights, 'updated_at': datetime.now(timezone.utc).isoformat()},
+                 '$inc': {'version': 1, 'samples': len(samples)}}
+            )
+            if result.modified_count:
+                self._adopt({'weights': weights, 'version': self.version + 1, 'samples': self.samples + len(samples)})
+                return True
+            await self.load(db)
+        logger.warning(f"Model state {self.name}: gave up after {attempts} conflicting updates")
+        return False
+
+    async def record_features(self, db, video_data: Dict[str, Any]):
+        """Keep the feature vector a draft was scored with, so training sees its real trend and audience inputs"""
+        if not video_data.get('id'):
+            return
+        await db.video_drafts.update_one(
+            {'id': video_data['id']},
+            {'$set': {'viral_features': self.predictor.extract_features(video_data),
+                      'viral_observed': self.observed(video_data)}}
+        )
+
+    async def record_batch(self, db, candidates: Union[Dict[str, List[Any]], List[Dict[str, Any]]],
+                           factors) -> int:
+        """record_features for the drafts (candidates with an id) of a predict_batch call"""
+        columns = self.predictor._to_columns(candidates)
+        ids = columns.get('id') or []
+        writes = []
+        for i, draft_id in enumerate(ids):
+            if not draft_id:
+                continue
+            row = {name: values[i] for name, values in columns.items()}
+            writes.append(UpdateOne(
+                {'id': draft_id},
+                {'$set': {'viral_features': dict(zip(FEATURES, factors[i].tolist())),
+                          'viral_observed': self.observed(row)}}
+            ))
+        if writes:
+            await db.video_drafts.bulk_write(writes, ordered=False)
+        return len(writes)
+
+    async def observe(self, db, readings: List[Dict[str, Any]]) -> int:
+        """Train on performance readings ({'post_id', 'views'}); returns the number of steps taken.
+
+        Only published posts at least min_age old count, each at most once per
+        retrain_interval, so early view counts and chatty webhooks don't dominate.
+        """
+        latest = {r['post_id']: r.get('views', 0) or 0 for r in readings if r.get('post_id')}
+        if not latest:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        posts = await db.post_plans.find(
+            {'id': {'$in': list(latest)}, 'status': 'published'},
+            {'_id': 0, 'id': 1, 'video_draft_id': 1, 'platform': 1, 'posted_at': 1,
+             'viral_features': 1, 'viral_observed': 1, 'viral_trained_at': 1}
+        ).to_list(None)
+
+        due = []
+        for post in posts:
+            posted_at = _parse_time(post.get('posted_at'))
+            trained_at = _parse_time(post.get('viral_trained_at'))
+            if posted_at and now - posted_at >= self.min_age and (not trained_at or now - trained_at >= self.retrain_interval):
+                due.append(post)
+        if not due:
+            return 0
+
+        # Features come from the draft as it was scored; drafts never scored are
+        # re-derived, learning only the features that aren't defaults
+        missing = [post for post in due if not post.get('viral_features')]
+        if missing:
+            drafts = await db.video_drafts.find(
+                {'id': {'$in': [post['video_draft_id'] for post in missing]}},
+                {'_id': 0, 'id': 1, 'script': 1, 'viral_features': 1, 'viral_observed': 1}
+            ).to_list(None)
+            drafts = {draft['id']: draft for draft in drafts}
+            for post in missing:
+                draft = drafts.get(post['video_draft_id'], {})
+                if draft.get('viral_features'):
+                    post['viral_features'] = draft['viral_features']
+                    post['viral_observed'] = draft.get('viral_observed')
+                    continue
+                video_data = {
+                    'id': post['video_draft_id'],
+                    'script': draft.get('script', ''),
+                    'publish_time': post.get('posted_at'),
+                    'platform': post.get('platform')
+                }
+                post['viral_features'] = self.predictor.extract_features(video_data)
+                post['viral_observed'] = self.observed(video_data)
+
+        samples: List[Sample] = []
+        claimed_posts = []
+        for post in due:
+            # Features cached without a record of their inputs: trust only the computed ones
+            post['viral_observed'] = post.get('viral_observed') or self.observed({})
+            # Claim the post so concurrent webhooks/processes don't train on it twice
+            claimed = await db.post_plans.update_one(
+                {'id': post['id'], 'viral_trained_at': post.get('viral_trained_at')},
+                {'$set': {'viral_trained_at': now.isoformat(), 'viral_features': post['viral_features'],
+                          'viral_observed': post['viral_observed']}}
+            )
+            if claimed.modified_count:
+                claimed_posts.append(post)
+                samples.append((post['viral_features'], self.target(latest[post['id']]), post['viral_observed']))
+
+        if not samples:
+            return 0
+        if await self.apply(db, samples):
+            return len(samples)
+
+        # The steps were not persisted: release the claims so the next reading retries them
+        for post in claimed_posts:
+            previous = post.get('viral_trained_at')
+            await db.post_plans.update_one(
+                {'id': post['id'], 'viral_trained_at': now.isoformat()},
+                {'$set': {'viral_trained_at': previous}} if previous else {'$unset': {'viral_trained_at': ''}}
+            )
+        return 0
+
+# Singleton instance
+online_trainer = OnlineWeightTrainer(
+    learning_rate=float(os.environ.get('VIRAL_LEARNING_RATE', '0.05')),
+    min_age_hours=float(os.environ.get('VIRAL_LEARN_MIN_AGE_HOURS', '24')),
+    retrain_interval_hours=float(os.environ.get('VIRAL_RETRAIN_INTERVAL_HOURS', '24'))
+)
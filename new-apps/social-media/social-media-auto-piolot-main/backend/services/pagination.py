@@ -0,0 +1,71 @@
+from typing import Dict, List, Any, Optional, Tuple
+import base64
+import json
+import os
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('PAGE_SIZE_DEFAULT', '50'))
+MAX_PAGE_SIZE = int(os.environ.get('PAGE_SIZE_MAX', '500'))
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor this server did not issue"""
+
+
+def encode_cursor(sort_value: Any, doc_id: str) -> str:
+    """Opaque cursor holding the last row's sort value and id"""
+    raw = json.dumps([sort_value, doc_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+    if not isinstance(doc_id, str):
+        raise InvalidCursorError('Invalid cursor')
+    return sort_value, doc_id
+
+
+def keyset_filter(sort_field: str, direction: int, cursor: str) -> Dict[str, Any]:
+    """Filter selecting rows strictly after the cursor in (sort_field, id) order"""
+    sort_value, doc_id = decode_cursor(cursor)
+    op = '$gt' if direction == 1 else '$lt'
+
+    if sort_field == 'id':
+        return {'id': {op: doc_id}}
+
+    return {'$or': [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, 'id': {op: doc_id}}
+    ]}
+
+
+async def paginate(collection,
+                   query: Dict[str, Any],
+                   sort_field: str,
+                   direction: int = 1,
+                   cursor: Optional[str] = None,
+                   limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """Fetch one keyset page; page N costs the same index seek as page 1"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if cursor:
+        after = keyset_filter(sort_field, direction, cursor)
+        query = {'$and': [query, after]} if query else after
+
+    sort = [(sort_field, direction)]
+    if sort_field != 'id':
+        sort.append(('id', direction))
+
+    # One extra row tells us whether another page exists
+    rows: List[Dict] = await collection.find(query, {'_id': 0}).sort(sort).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['id'])
+
+    return {'items': rows, 'next_cursor': next_cursor}
@@ -0,0 +1,213 @@
+from typing import Dict, List, Any, Optional
+from datetime import datetime, timezone
+import os
+import time
+
+from pymongo import ReturnDocument
+
+ROLLUP_COLLECTION = 'performance_rollups'
+ROLLUP_BATCH_SIZE = 5000
+SUMMARY_COLLECTION = 'performance_summaries'
+SUMMARY_ID = 'trends'
+# The top-decile themes are re-ranked at most this often; the totals are always current
+SUMMARY_RANK_SECONDS = float(os.environ.get('PERFORMANCE_SUMMARY_RANK_SECONDS', '60'))
+
+# What a row adds to the summary totals; stored on the row as 'counted' once added
+CONTRIBUTION = {'$cond': [
+    '$eligible',
+    {'total': {'$literal': 1}, 'views_sum': '$views', 'engagement_sum': '$engagement_rate'},
+    {'$literal': {'total': 0, 'views_sum': 0, 'engagement_sum': 0}}
+]}
+ZERO = {'total': 0, 'views_sum': 0, 'engagement_sum': 0}
+
+
+def contribution(row: Dict[str, Any]) -> Dict[str, Any]:
+    """CONTRIBUTION evaluated in Python"""
+    if not row.get('eligible'):
+        return dict(ZERO)
+    return {'total': 1, 'views_sum': row.get('views', 0), 'engagement_sum': row.get('engagement_rate', 0)}
+
+
+class PerformanceRollups:
+    """Pre-joined per-post performance rows for analytics queries"""
+
+    def __init__(self, rank_seconds: float = SUMMARY_RANK_SECONDS):
+        self.rank_seconds = rank_seconds
+        self._ranked_at = 0.0
+
+    def _rollup_pipeline(self, post_filter: Optional[Dict] = None) -> List[Dict]:
+        """Join post_plans with their video draft and merge the result into the rollup collection"""
+        pipeline = []
+        if post_filter:
+            pipeline.append({'$match': post_filter})
+
+        pipeline.extend([
+            {'$lookup': {
+                'from': 'video_drafts',
+                'localField': 'video_draft_id',
+                'foreignField': 'id',
+                'as': 'video'
+            }},
+            {'$unwind': {'path': '$video', 'preserveNullAndEmptyArrays': True}},
+            {'$project': {
+                '_id': 0,
+                'post_id': '$id',
+                'video_id': '$video_draft_id',
+                'platform': 1,
+                'views': {'$ifNull': ['$views', 0]},
+                'engagement_rate': {'$ifNull': ['$engagement_rate', 0]},
+                'theme': {'$ifNull': ['$video.theme', 'general']},
+                # Only posts of published videos count towards performance trends
+                'eligible': {'$and': [
+                    {'$eq': ['$status', 'published']},
+                    {'$eq': ['$video.status', 'published']}
+                ]},
+                'updated_at': {'$literal': datetime.now(timezone.utc).isoformat()}
+            }},
+            {'$merge': {
+                'into': ROLLUP_COLLECTION,
+                'on': 'post_id',
+                # merge, not replace: the row keeps what it last added to the summary
+                'whenMatched': 'merge',
+                'whenNotMatched': 'insert'
+            }}
+        ])
+        return pipeline
+
+    async def rebuild(self, db):
+        """Backfill the rollup collection from every post plan (server-side, one round trip)"""
+        await db.post_plans.aggregate(self._rollup_pipeline()).to_list(None)
+        await self.recount(db)
+
+    async def backfill_if_empty(self, db):
+        """Seed the rollups on first start so existing history is not lost"""
+        if await db[ROLLUP_COLLECTION].estimated_document_count() == 0:
+            await self.rebuild(db)
+        elif 'views_sum' not in (await db[SUMMARY_COLLECTION].find_one({'_id': SUMMARY_ID}) or {}):
+            # No running totals yet (first start with this summary): count the existing rows once
+            await self.recount(db)
+
+    async def refresh_post(self, db, post_id: str):
+        """Re-derive the rollup row for a single post after its status or metrics change"""
+        if not post_id:
+            return
+        await db.post_plans.aggregate(self._rollup_pipeline({'id': post_id})).to_list(None)
+        await self._count(db, [post_id])
+
+    async def refresh_posts(self, db, post_ids: List[str]):
+        """Batch form of refresh_post: one aggregation for many posts"""
+        if not post_ids:
+            return
+        await db.post_plans.aggregate(self._rollup_pipeline({'id': {'$in': post_ids}})).to_list(None)
+        await self._count(db, post_ids)
+
+    async def _count(self, db, post_ids: List[str]):
+        """Move the summary totals by what the refreshed rows changed, then re-rank if due"""
+        delta = dict(ZERO)
+        for post_id in dict.fromkeys(post_ids):
+            # Atomic per row: concurrent refreshes of one post each add only their own change
+            row = await db[ROLLUP_COLLECTION].find_one_and_update(
+                {'post_id': post_id},
+                [{'$set': {'counted': CONTRIBUTION}}],
+                projection={'_id': 0, 'eligible': 1, 'views': 1, 'engagement_rate': 1, 'counted': 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if row is None:
+                continue
+            now, before = contribution(row), row.get('counted') or ZERO
+            for field in delta:
+                delta[field] += now[field] - before.get(field, 0)
+
+        if any(delta.values()):
+            await db[SUMMARY_COLLECTION].update_one({'_id': SUMMARY_ID}, {'$inc': delta}, upsert=True)
+        await self.ensure_ranked(db)
+
+    async def recount(self, db):
+        """Count every row afresh and reset the summary totals to match (startup and backfills)"""
+        await db[ROLLUP_COLLECTION].update_many({}, [{'$set': {'counted': CONTRIBUTION}}])
+        totals = await db[ROLLUP_COLLECTION].aggregate([
+            {'$group': {
+                '_id': None,
+                'total': {'$sum': '$counted.total'},
+                'views_sum': {'$sum': '$counted.views_sum'},
+                'engagement_sum': {'$sum': '$counted.engagement_sum'}
+            }},
+            {'$project': {'_id': 0}}
+        ]).to_list(1)
+        await db[SUMMARY_COLLECTION].update_one(
+            {'_id': SUMMARY_ID}, {'$set': totals[0] if totals else dict(ZERO)}, upsert=True
+        )
+        self._ranked_at = time.monotonic()
+        await self.rank(db)
+
+    async def ensure_ranked(self, db):
+        """Re-rank the top-decile themes at most every rank_seconds"""
+        if time.monotonic() - self._ranked_at < self.rank_seconds:
+            return
+        # Stamp before awaiting so a burst of refreshes starts one ranking
+        self._ranked_at = time.monotonic()
+        await self.rank(db)
+
+    def _rank_pipeline(self, top_n: int) -> List[Dict]:
+        """Theme counts of the top_n rows by views, merged into the summary document"""
+        return [
+            {'$match': {'eligible': True}},
+            # Served by the eligible_views index as a top-k sort, never a sort of every row
+            {'$sort': {'views': -1}},
+            {'$limit': top_n},
+            {'$group': {
+                '_id': '$theme',
+                'count': {'$sum': 1},
+                'best_views': {'$max': '$views'}
+            }},
+            {'$sort': {'count': -1, 'best_views': -1}},
+            {'$group': {
+                '_id': SUMMARY_ID,
+                'theme_counts': {'$push': ['$_id', '$count']}
+            }},
+            {'$set': {
+                'top_n': {'$literal': top_n},
+                'ranked_at': {'$literal': datetime.now(timezone.utc).isoformat()}
+            }},
+            {'$merge': {
+                'into': SUMMARY_COLLECTION,
+                'on': '_id',
+                'whenMatched': 'merge',
+                'whenNotMatched': 'insert'
+            }}
+        ]
+
+    async def rank(self, db):
+        """Store the theme counts of the top 10% by views next to the running totals"""
+        summary = await db[SUMMARY_COLLECTION].find_one({'_id': SUMMARY_ID}) or {}
+        total = summary.get('total', 0)
+        if total <= 0:
+            await db[SUMMARY_COLLECTION].update_one(
+                {'_id': SUMMARY_ID}, {'$set': {'theme_counts': [], 'top_n': 0}}, upsert=True
+            )
+            return
+        await db[ROLLUP_COLLECTION].aggregate(self._rank_pipeline(max(1, total // 10))).to_list(None)
+
+    async def summarize(self, db) -> Dict[str, Any]:
+        """The inputs of the performance trend insights: running totals plus the last ranking"""
+        summary = await db[SUMMARY_COLLECTION].find_one({'_id': SUMMARY_ID}) or {}
+        total = summary.get('total', 0)
+        return {
+            'total': total,
+            'avg_views': summary.get('views_sum', 0) / total if total else 0,
+            'avg_engagement_rate': summary.get('engagement_sum', 0) / total if total else 0,
+            'top_n': summary.get('top_n', 0),
+            'theme_counts': [tuple(pair) for pair in summary.get('theme_counts', [])]
+        }
+
+    async def count_eligible(self, db) -> int:
+        return await db[ROLLUP_COLLECTION].count_documents({'eligible': True})
+
+    def eligible_rows(self, db):
+        """Async cursor over the eligible rows, projected to what the trend insights read"""
+        return db[ROLLUP_COLLECTION].find(
+            {'eligible': True}, {'_id': 0, 'views': 1, 'engagement_rate': 1, 'theme': 1}
+        ).batch_size(ROLLUP_BATCH_SIZE)
+
+# Singleton instance
+performance_rollups = PerformanceRollups()
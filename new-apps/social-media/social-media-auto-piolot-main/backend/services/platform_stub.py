@@ -0,0 +1,40 @@
+from fastapi import FastAPI, Header, HTTPException
+from typing import Dict, Optional
+import asyncio
+import os
+import random
+import uuid
+
+# Local stand-in for the platform upload APIs, used to exercise the publishing worker:
+#   uvicorn services.platform_stub:app --port 8010
+# STUB_FAILURE_RATE and STUB_LATENCY_MS simulate flaky, slow platforms.
+app = FastAPI(title="SYNDICA FORGE platform stub")
+
+published: Dict[str, Dict] = {}
+replies: Dict[str, str] = {}  # Idempotency-Key -> platform_post_id
+
+
+@app.post("/{platform}/publish")
+async def publish(platform: str, data: Dict, idempotency_key: Optional[str] = Header(None)):
+    await asyncio.sleep(float(os.environ.get('STUB_LATENCY_MS', '200')) / 1000)
+    if random.random() < float(os.environ.get('STUB_FAILURE_RATE', '0')):
+        raise HTTPException(status_code=503, detail="Simulated platform outage")
+
+    post_id = data.get('post_id')
+    if idempotency_key in replies:
+        # Replayed request (e.g. a retry after a client timeout): same result, no second post
+        return {"platform_post_id": replies[idempotency_key]}
+    if post_id in published:
+        # Double-post detector: a correct worker never publishes the same plan twice
+        raise HTTPException(status_code=409, detail=f"{post_id} already published")
+
+    platform_post_id = f"{platform}_{uuid.uuid4().hex[:12]}"
+    published[post_id] = {'platform': platform, 'platform_post_id': platform_post_id}
+    if idempotency_key:
+        replies[idempotency_key] = platform_post_id
+    return {"platform_post_id": platform_post_id}
+
+
+@app.get("/published")
+async def list_published():
+    return {"count": len(published), "posts": published}
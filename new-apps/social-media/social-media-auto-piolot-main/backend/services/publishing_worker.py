@@ -0,0 +1,236 @@
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+import httpx
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Per-platform publishing limits (concurrent uploads, posts per minute)
+PLATFORM_LIMITS = {
+    'youtube': {'concurrency': 2, 'rate_per_minute': 30},
+    'tiktok': {'concurrency': 2, 'rate_per_minute': 20},
+    'facebook': {'concurrency': 3, 'rate_per_minute': 60},
+    'instagram': {'concurrency': 2, 'rate_per_minute': 25},
+    'snapchat': {'concurrency': 1, 'rate_per_minute': 10}
+}
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def refund(self):
+        """Return an unused token (acquired for a claim that found nothing)"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class HttpPlatformPublisher:
+    """Publishes a post plan by POSTing it to {base_url}/{platform}/publish.
+
+    The plan id is sent as the Idempotency-Key, so a retry after a timeout
+    (when the platform may already have accepted the post) returns the
+    original post instead of publishing it twice.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    async def publish(self, plan: Dict[str, Any]) -> str:
+        async with httpx.AsyncClient(timeout=self.timeout) as http:
+            response = await http.post(f"{self.base_url}/{plan['platform']}/publish", json={
+                'post_id': plan['id'],
+                'caption': plan.get('caption'),
+                'media_url': plan.get('media_url')
+            }, headers={'Idempotency-Key': plan['id']})
+            response.raise_for_status()
+            return response.json()['platform_post_id']
+
+
+class PublishingWorker:
+    """Drains due post_plans using atomic leases so several processes can run in parallel"""
+
+    def __init__(self,
+                 db,
+                 publisher,
+                 owner: Optional[str] = None,
+                 lease_seconds: float = 120.0,
+                 publish_timeout_seconds: Optional[float] = None,
+                 poll_interval: float = 5.0,
+                 max_attempts: int = 5,
+                 retry_backoff_seconds: float = 30.0,
+                 platform_limits: Dict[str, Dict[str, float]] = None,
+                 on_published: Optional[Callable[[str], Awaitable[None]]] = None):
+        self.db = db
+        self.publisher = publisher
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        # A publish must give up well before its lease can be reclaimed by another worker
+        self.publish_timeout_seconds = publish_timeout_seconds or lease_seconds / 2
+        if self.publish_timeout_seconds >= lease_seconds:
+            raise ValueError('publish_timeout_seconds must be shorter than lease_seconds')
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.platform_limits = platform_limits or PLATFORM_LIMITS
+        self.on_published = on_published
+
+        self.semaphores = {p: asyncio.Semaphore(int(l['concurrency'])) for p, l in self.platform_limits.items()}
+        self.buckets = {
+            p: TokenBucket(rate=l['rate_per_minute'] / 60.0, capacity=max(1.0, l['concurrency']))
+            for p, l in self.platform_limits.items()
+        }
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: set = set()
+        self._stopping = asyncio.Event()
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def claim(self, platform: str) -> Optional[Dict[str, Any]]:
+        """Atomically lease the next due plan, reclaiming leases that have expired"""
+        now = self._now()
+        now_iso = now.isoformat()
+        return await self.db.post_plans.find_one_and_update(
+            {'platform': platform, '$or': [
+                {'status': 'scheduled', 'scheduled_time': {'$lte': now_iso}},
+                {'status': 'publishing', 'lease_expires_at': {'$lt': now_iso}}
+            ]},
+            {'$set': {
+                'status': 'publishing',
+                'lease_owner': self.owner,
+                'lease_expires_at': (now + timedelta(seconds=self.lease_seconds)).isoformat()
+            }, '$inc': {'publish_attempts': 1}},
+            sort=[('scheduled_time', 1)],
+            projection={'_id': 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _complete(self, plan: Dict[str, Any], platform_post_id: str) -> bool:
+        # Fenced on lease_owner: a worker whose lease was reclaimed cannot overwrite the new owner
+        result = await self.db.post_plans.update_one(
+            {'id': plan['id'], 'status': 'publishing', 'lease_owner': self.owner},
+            {'$set': {
+                'status': 'published',
+                'platform_post_id': platform_post_id,
+                'posted_at': self._now().isoformat()
+            }, '$unset': {'lease_owner': '', 'lease_expires_at': '', 'last_error': ''}}
+        )
+        return result.modified_count == 1
+
+    async def _fail(self, plan: Dict[str, Any], error: Exception):
+        attempts = plan.get('publish_attempts', 1)
+        if attempts >= self.max_attempts:
+            update = {'$set': {'status': 'failed', 'last_error': str(error)},
+                      '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+        else:
+            # Leave the lease in place with an expiry at the retry time; the reclaim path retries it
+            retry_at = self._now() + timedelta(seconds=self.retry_backoff_seconds * 2 ** (attempts - 1))
+            update = {'$set': {'lease_owner': None, 'lease_expires_at': retry_at.isoformat(),
+                               'last_error': str(error)}}
+        await self.db.post_plans.update_one(
+            {'id': plan['id'], 'status': 'publishing', 'lease_owner': self.owner}, update
+        )
+
+    async def _publish(self, platform: str, plan: Dict[str, Any]):
+        try:
+            platform_post_id = await asyncio.wait_for(self.publisher.publish(plan),
+                                                      timeout=self.publish_timeout_seconds)
+            if await self._complete(plan, platform_post_id):
+                logger.info(f"Published {plan['id']} to {platform}: {platform_post_id}")
+                if self.on_published:
+                    await self.on_published(plan['id'])
+            else:
+                logger.warning(f"Lease lost before completing {plan['id']} on {platform}")
+        except Exception as e:
+            logger.error(f"Publish error for {plan['id']} on {platform}: {str(e)}")
+            await self._fail(plan, e)
+        finally:
+            self.semaphores[platform].release()
+
+    async def _run_platform(self, platform: str):
+        while not self._stopping.is_set():
+            await self.semaphores[platform].acquire()
+            # Rate-limit before claiming so the lease clock only starts once the publish can go out
+            await self.buckets[platform].acquire()
+            try:
+                plan = await self.claim(platform)
+            except Exception as e:
+                logger.error(f"Claim error on {platform}: {str(e)}")
+                plan = None
+
+            if plan is None:
+                self.buckets[platform].refund()
+                self.semaphores[platform].release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._publish(platform, plan))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def start(self):
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._run_platform(p)) for p in self.platform_limits]
+        logger.info(f"Publishing worker {self.owner} started for {', '.join(self.platform_limits)}")
+
+    async def stop(self):
+        """Stop claiming and wait for in-flight publishes to settle"""
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+
+if __name__ == '__main__':
+    # Standalone worker: python -m services.publishing_worker
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from services.performance_rollups import performance_rollups
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        db = client[os.environ['DB_NAME']]
+        worker = PublishingWorker(
+            db,
+            HttpPlatformPublisher(os.environ.get('PUBLISHER_BASE_URL', 'http://localhost:8010')),
+            on_published=lambda post_id: performance_rollups.refresh_post(db, post_id)
+        )
+        worker.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await worker.stop()
+            client.close()
+
+    asyncio.run(main())
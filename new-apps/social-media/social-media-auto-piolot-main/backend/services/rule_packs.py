@@ -0,0 +1,116 @@
+from typing import Dict, List, Any, Tuple
+from pathlib import Path
+from types import MappingProxyType
+import logging
+import os
+import threading
+import time
+
+import yaml
+
+from services.safety_matcher import SafetyMatcher
+
+logger = logging.getLogger(__name__)
+
+RULES_DIR = Path(os.environ.get('SAFETY_RULES_DIR', Path(__file__).parent.parent / 'rules' / 'safety'))
+
+# Pack files are *.yaml with a `version` and either `rules` (matcher rules; a
+# top-level `family` applies to rules without one) or `platforms` (limits).
+
+
+class RulePack:
+    """Compiled, read-only rule set; a reload builds a new pack instead of mutating this one"""
+
+    __slots__ = ('rules', 'positions', 'matcher', 'platform_limits', 'versions', 'signature')
+
+    def __init__(self, rules: List[Dict[str, Any]], platform_limits: Dict[str, Dict[str, Any]],
+                 versions: Dict[str, Any], signature: Tuple = ()):
+        self.matcher = SafetyMatcher(rules)
+        self.rules = tuple(MappingProxyType(rule) for rule in self.matcher.rules)
+        self.positions = MappingProxyType({rule['id']: i for i, rule in enumerate(self.rules)})
+        self.platform_limits = MappingProxyType({
+            platform: MappingProxyType(dict(limits)) for platform, limits in platform_limits.items()
+        })
+        self.versions = MappingProxyType(dict(versions))
+        self.signature = signature
+
+    def hit_rules(self, rule_ids) -> List[Dict[str, Any]]:
+        """Rules for the given ids, in pack order"""
+        return [self.rules[i] for i in sorted(self.positions[rule_id] for rule_id in rule_ids)]
+
+
+def _signature(rules_dir: Path) -> Tuple:
+    """Cheap change detector: name, mtime and size of every pack file"""
+    return tuple(
+        (path.name, stat.st_mtime_ns, stat.st_size)
+        for path, stat in ((path, path.stat()) for path in sorted(rules_dir.glob('*.yaml')))
+    )
+
+
+def load_rule_pack(rules_dir: Path = RULES_DIR) -> RulePack:
+    signature = _signature(rules_dir)
+    if not signature:
+        raise FileNotFoundError(f"No safety rule packs in {rules_dir}")
+
+    rules: List[Dict[str, Any]] = []
+    platform_limits: Dict[str, Dict[str, Any]] = {}
+    versions: Dict[str, Any] = {}
+    for name, _, _ in signature:
+        pack = yaml.safe_load((rules_dir / name).read_text()) or {}
+        versions[Path(name).stem] = pack.get('version')
+        for rule in pack.get('rules', []):
+            rules.append({'family': pack.get('family'), **rule})
+        platform_limits.update(pack.get('platforms', {}))
+
+    return RulePack(rules, platform_limits, versions, signature)
+
+
+class RulePackStore:
+    """Holds the current RulePack and swaps in a recompiled one when the pack files change"""
+
+    def __init__(self, rules_dir: Path = RULES_DIR, check_interval: float = 2.0):
+        self.rules_dir = Path(rules_dir)
+        self.check_interval = check_interval
+        self._pack = load_rule_pack(self.rules_dir)
+        self._checked_at = time.monotonic()
+        self._rejected_signature: Tuple = ()
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> RulePack:
+        """The live pack; callers keep the reference for a whole check so a swap never splits one"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            self.reload_in_background()
+        return self._pack
+
+    def reload_in_background(self) -> bool:
+        """Stat and recompile on a daemon thread; callers keep the old pack until the swap"""
+        if self._lock.locked():
+            return False
+        threading.Thread(target=self.reload, name='rule-pack-reload', daemon=True).start()
+        return True
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile if any pack file changed; a broken pack is logged and the old one kept"""
+        # Non-blocking: at most one reload at a time; everyone else keeps using the old pack
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            signature: Tuple = ()
+            try:
+                signature = _signature(self.rules_dir)
+                if not force and signature in (self._pack.signature, self._rejected_signature):
+                    return False
+                pack = load_rule_pack(self.rules_dir)
+            except Exception as e:
+                # Not retried until the files change again
+                self._rejected_signature = signature
+                logger.error(f"Safety rule pack reload error: {str(e)}")
+                return False
+            self._pack = pack
+            logger.info(f"Safety rule packs reloaded: {dict(pack.versions)} ({pack.matcher.term_count} terms)")
+            return True
+        finally:
+            self._lock.release()
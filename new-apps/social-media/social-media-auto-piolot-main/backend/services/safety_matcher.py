@@ -0,0 +1,209 @@
+"""Single-pass matcher for content safety rules.
+
+Benchmark: python -m services.safety_matcher
+"""
+from typing import Dict, List, Any, AsyncIterator, Iterable, Iterator, Optional, Tuple
+import hashlib
+import json
+import re
+
+# A rule is a dict:
+#   {'id': 'profanity.0', 'family': 'profanity', 'terms': [...], 'match': 'word' | 'substring'}
+#   {'id': 'claims.4', 'family': 'claims', 'regex': r'\bmake\s+\$\d+\b'}
+# Optional 'label' is the text reported in warnings (defaults to the id).
+# Literal terms go into one Aho-Corasick automaton; the (few) regex rules into
+# one alternation of named groups. Matching is case-insensitive.
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+def _at_word_boundary(text: str, pos: int) -> bool:
+    """Same test as regex \\b: word-ness differs on either side of pos"""
+    before = pos > 0 and _is_word(text[pos - 1])
+    after = pos < len(text) and _is_word(text[pos])
+    return before != after
+
+
+def fold_case(text: str) -> str:
+    """Lowercase without shifting offsets (a few characters lowercase to two)"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(ch.lower()[:1] for ch in text)
+
+
+class AhoCorasick:
+    """Keyword automaton reporting every (possibly overlapping) occurrence in one pass"""
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[int, Any]]] = [[]]
+
+        for word, value in keywords:
+            state = 0
+            for ch in word:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append((len(word), value))
+
+        # Breadth-first failure links; outputs of the fallback state are inherited
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def __len__(self):
+        return len(self.goto)
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every keyword occurrence"""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for length, value in out[state]:
+                    yield i + 1 - length, i + 1, value
+
+
+class SafetyMatcher:
+    """Immutable compiled form of a rule list; scan() returns every hit with rule id and span"""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = [{'label': rule['id'], **rule} for rule in rules]
+        self.rules_by_id = {rule['id']: rule for rule in self.rules}
+        if len(self.rules_by_id) != len(self.rules):
+            raise ValueError('Duplicate safety rule id')
+        # Changes whenever any rule, term or label changes
+        self.version = hashlib.sha256(
+            json.dumps(self.rules, sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+        keywords = []
+        regex_parts = []
+        self._group_rules: Dict[str, str] = {}
+        for index, rule in enumerate(self.rules):
+            if rule.get('regex'):
+                group = f"r{index}"
+                self._group_rules[group] = rule['id']
+                regex_parts.append(f"(?P<{group}>{rule['regex']})")
+                continue
+            word_bounded = rule.get('match', 'word') == 'word'
+            for term in rule.get('terms', []):
+                keywords.append((fold_case(term), (rule['id'], word_bounded)))
+
+        self.automaton = AhoCorasick(keywords)
+        self.term_count = len(keywords)
+        self.max_term_length = max((len(term) for term, _ in keywords), default=0)
+        # Zero-width lookahead so a match is tried at every offset, not only after the previous one
+        self.regex = (re.compile(f"(?=(?:{'|'.join(regex_parts)}))", re.IGNORECASE)
+                      if regex_parts else None)
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
+        """All hits in text order: {'rule_id', 'start', 'end'}"""
+        hits = []
+        for start, end, (rule_id, word_bounded) in self.automaton.iter(fold_case(text)):
+            if word_bounded and not (_at_word_boundary(text, start) and _at_word_boundary(text, end)):
+                continue
+            hits.append({'rule_id': rule_id, 'start': start, 'end': end})
+
+        if self.regex is not None:
+            for match in self.regex.finditer(text):
+                group = match.lastgroup
+                hits.append({'rule_id': self._group_rules[group],
+                             'start': match.start(group), 'end': match.end(group)})
+
+        hits.sort(key=lambda hit: (hit['start'], hit['end']))
+        return hits
+
+    async def scan_stream(self, chunks: AsyncIterator[str],
+                          max_regex_match: int = 256) -> AsyncIterator[Dict[str, Any]]:
+        """scan() over a stream of text chunks, yielding hits with absolute offsets as they are found.
+
+        The buffer keeps an overlap window longer than any term (and than
+        max_regex_match for regex rules) so matches spanning a chunk boundary are
+        found; a hit is emitted once its start is out of the window, so it can no
+        longer be cut short or change its \\b context.
+        """
+        window = max(self.max_term_length, max_regex_match if self.regex is not None else 0) + 1
+        buffer = ''
+        base = 0  # absolute offset of buffer[0]
+        emit_from = 0  # hits starting before this offset were already emitted
+
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            buffer += chunk
+            safe_end = base + len(buffer) - window
+            if safe_end <= emit_from:
+                continue
+
+            for hit in self.scan(buffer):
+                start = base + hit['start']
+                if emit_from <= start < safe_end:
+                    yield {'rule_id': hit['rule_id'], 'start': start, 'end': base + hit['end']}
+            emit_from = safe_end
+
+            # Keep the window plus one character of lookbehind for the \b test at emit_from
+            keep_from = safe_end - 1 - base
+            buffer = buffer[keep_from:]
+            base += keep_from
+
+        for hit in self.scan(buffer):
+            start = base + hit['start']
+            if start >= emit_from:
+                yield {'rule_id': hit['rule_id'], 'start': start, 'end': base + hit['end']}
+
+
+def _benchmark(sizes: Optional[List[int]] = None, iterations: int = 200):
+    """Per-script cost of the compiled matcher vs one re.search per rule as the term list grows"""
+    import random
+    import string
+    import time
+
+    rng = random.Random(7)
+    script = ("Stop wasting hours on busywork. This one automation tool handles your inbox, "
+              "your calendar and your follow ups while you sleep. I promise it pays for itself; "
+              "the link is in my bio and I may earn a commission. Disclosure: affiliate link. "
+              "Set it up once and get your evenings back. No politics, no hype, just systems. ") * 2
+
+    print(f"{'terms':>7} {'compiled us/script':>19} {'per-rule us/script':>19}")
+    for size in sizes or [10, 100, 1000, 5000]:
+        terms = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+                 for _ in range(size)]
+        rules = [{'id': f"bench.{i}", 'family': 'bench', 'terms': [term]} for i, term in enumerate(terms)]
+        matcher = SafetyMatcher(rules)
+        patterns = [re.compile(rf"\b{re.escape(term)}\b", re.IGNORECASE) for term in terms]
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            matcher.scan(script)
+        compiled = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(max(1, iterations // 10)):
+            for pattern in patterns:
+                pattern.search(script)
+        per_rule = (time.perf_counter() - start) / max(1, iterations // 10) * 1e6
+
+        print(f"{size:>7} {compiled:>19.1f} {per_rule:>19.1f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,83 @@
+from typing import List
+import asyncio
+import os
+
+from pymongo import ReturnDocument
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+COUNTERS_COLLECTION = 'counters'
+
+
+def encode_base62(number: int, min_length: int = 0) -> str:
+    """Base62 digits of a non-negative integer, left-padded with '0' to min_length"""
+    digits = []
+    while True:
+        number, remainder = divmod(number, 62)
+        digits.append(ALPHABET[remainder])
+        if not number:
+            break
+    return ''.join(reversed(digits)).rjust(min_length, ALPHABET[0])
+
+
+def decode_base62(code: str) -> int:
+    number = 0
+    for ch in code:
+        number = number * 62 + ALPHABET.index(ch)
+    return number
+
+
+class ShortCodeAllocator:
+    """Collision-free base62 short codes from counter blocks reserved per process.
+
+    One atomic $inc on the shared counter reserves block_size numbers; codes are
+    then handed out from memory until the block runs out. Every number is issued
+    at most once across processes, so codes never collide; numbers left in a
+    block when a process exits are simply skipped.
+    """
+
+    def __init__(self, name: str = 'short_codes', block_size: int = 1000, min_length: int = 6):
+        self.name = name
+        self.block_size = block_size
+        self.min_length = min_length
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return self._end - self._next
+
+    async def _reserve(self, db, size: int):
+        counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+            {'name': self.name},
+            {'$inc': {'next': size}},
+            upsert=True,
+            projection={'_id': 0, 'next': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        self._next, self._end = counter['next'] - size, counter['next']
+
+    async def allocate(self, db, count: int = 1) -> List[str]:
+        """count fresh codes; at most one counter round trip per call"""
+        if count <= 0:
+            return []
+        async with self._lock:
+            numbers = list(range(self._next, self._next + min(count, self.remaining)))
+            self._next += len(numbers)
+            missing = count - len(numbers)
+            if missing:
+                # Large bulk requests reserve exactly what they need in one block
+                await self._reserve(db, max(self.block_size, missing))
+                numbers.extend(range(self._next, self._next + missing))
+                self._next += missing
+        return [encode_base62(number, self.min_length) for number in numbers]
+
+    async def next_code(self, db) -> str:
+        return (await self.allocate(db, 1))[0]
+
+# Singleton instance
+short_codes = ShortCodeAllocator(
+    name='tracking_links',
+    block_size=int(os.environ.get('SHORT_CODE_BLOCK_SIZE', '1000')),
+    min_length=int(os.environ.get('SHORT_CODE_MIN_LENGTH', '6'))
+)
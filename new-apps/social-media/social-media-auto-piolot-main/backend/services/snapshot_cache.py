@@ -0,0 +1,50 @@
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import time
+
+
+class SnapshotCache:
+    """Short-TTL in-process snapshot with write invalidation"""
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl_seconds: float = 5.0,
+                 version: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        # Optional stamp read on every get (e.g. a counters document other processes bump);
+        # a changed stamp drops the snapshot before its TTL runs out
+        self.version = version
+        self._value: Optional[Any] = None
+        self._value_version: Any = None
+        self._expires_at = 0.0
+        # Bumped on every invalidation so a load that raced a write is never stored
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, version: Any) -> bool:
+        return (self._value is not None and time.monotonic() < self._expires_at
+                and version == self._value_version)
+
+    async def get(self) -> Any:
+        """Return the cached snapshot, rebuilding it once for all concurrent callers"""
+        # Read the stamp before loading: a write landing during the load is picked up next time
+        version = await self.version() if self.version else None
+        if self._fresh(version):
+            return self._value
+
+        async with self._lock:
+            if self._fresh(version):
+                return self._value
+
+            generation = self._generation
+            value = await self.loader()
+            if generation == self._generation:
+                self._value = value
+                self._value_version = version
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return value
+
+    def invalidate(self):
+        """Drop the snapshot after a write to an underlying collection"""
+        self._generation += 1
+        self._value = None
+        self._expires_at = 0.0
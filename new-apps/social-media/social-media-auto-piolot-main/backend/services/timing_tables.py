@@ -0,0 +1,214 @@
+from typing import Dict, List, Any, Iterable, Optional
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from itertools import repeat
+import os
+import time
+
+import numpy as np
+
+SLOTS = 7 * 24  # hour of week: weekday * 24 + hour, Monday 00:00 first
+ALL_PLATFORMS = '*'
+
+
+def _band_score(weekday: int, hour: int) -> float:
+    """The original fixed timing bands, used as the prior for every slot"""
+    # Prime time: 6-10 PM
+    if 18 <= hour <= 22:
+        time_score = 9.0
+    # Good time: 12-2 PM, 5-6 PM
+    elif (12 <= hour <= 14) or (17 <= hour <= 18):
+        time_score = 7.0
+    # Decent time: Morning 7-9 AM
+    elif 7 <= hour <= 9:
+        time_score = 6.0
+    # Off-hours
+    else:
+        time_score = 4.0
+
+    # Weekday bonus
+    if weekday < 5:
+        time_score += 0.5
+    return min(10.0, time_score)
+
+
+PRIOR = np.array([_band_score(slot // 24, slot % 24) for slot in range(SLOTS)])
+
+
+@lru_cache(maxsize=4096)
+def _parse_slot(publish_time: str) -> Optional[int]:
+    try:
+        dt = datetime.fromisoformat(publish_time.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return dt.weekday() * 24 + dt.hour
+
+
+def hour_of_week(publish_time) -> Optional[int]:
+    """Slot of a datetime or ISO timestamp (in its own UTC offset), None if it can't be parsed"""
+    if isinstance(publish_time, datetime):
+        return publish_time.weekday() * 24 + publish_time.hour
+    if not publish_time or not isinstance(publish_time, str):
+        return None
+    # Parsed once per distinct string; batches repeat the same few publish times
+    return _parse_slot(publish_time)
+
+
+_SLOT_MEMO: Dict[str, int] = {}
+
+
+def hour_of_week_many(values: List[Any]) -> np.ndarray:
+    """hour_of_week of each value as an int array, -1 where it can't be parsed"""
+    # Only strings are memoized: equal datetimes in different offsets fall in different slots
+    slots = np.fromiter(map(_SLOT_MEMO.get, values, repeat(-2)), dtype=np.int64, count=len(values))
+    for i in np.flatnonzero(slots == -2).tolist():
+        found = hour_of_week(values[i])
+        slots[i] = -1 if found is None else found
+        if isinstance(values[i], str):
+            if len(_SLOT_MEMO) >= 4096:
+                _SLOT_MEMO.clear()
+            _SLOT_MEMO[values[i]] = int(slots[i])
+    return slots
+
+
+class TimingTables:
+    """Per-platform 7x24 timing scores learned from post engagement.
+
+    Each slot blends the fixed-band prior with the slot's mean engagement
+    relative to the platform mean (5 = average, 10 = twice average), weighted by
+    how many published posts landed there; with no data the table is the prior.
+    Counts and engagement sums are kept so readings update a slot in place.
+    """
+
+    def __init__(self, prior_weight: float = 20.0, refresh_seconds: float = 600.0):
+        self.prior_weight = prior_weight
+        self.refresh_seconds = refresh_seconds
+        self.counts: Dict[str, np.ndarray] = {}
+        self.sums: Dict[str, np.ndarray] = {}
+        self.scores: Dict[str, np.ndarray] = {}
+        self._loaded_at = 0.0
+
+    @classmethod
+    def frozen(cls, scores: Dict[str, np.ndarray]) -> 'TimingTables':
+        """Read-only tables, e.g. from a model artifact: no counts, never recounted"""
+        tables = cls(refresh_seconds=float('inf'))
+        tables.scores = dict(scores)
+        return tables
+
+    def _recompute(self, platform: str):
+        counts, sums = self.counts[platform], self.sums[platform]
+        total = counts.sum()
+        if not total or not sums.sum():
+            self.scores[platform] = PRIOR.copy()
+            return
+        overall = sums.sum() / total
+        slot_mean = np.divide(sums, counts, out=np.zeros(SLOTS), where=counts > 0)
+        learned = np.clip(5.0 * slot_mean / overall, 0.0, 10.0)
+        self.scores[platform] = (PRIOR * self.prior_weight + learned * counts) / (self.prior_weight + counts)
+
+    def _add(self, platform: str, slot: int, count: float, engagement: float):
+        for key in (platform or 'unknown', ALL_PLATFORMS):
+            if key not in self.counts:
+                self.counts[key] = np.zeros(SLOTS)
+                self.sums[key] = np.zeros(SLOTS)
+            self.counts[key][slot] += count
+            self.sums[key][slot] += engagement
+
+    def table(self, platform: Optional[str] = None) -> np.ndarray:
+        """Scores by slot; platforms without data fall back to the pooled table, then the prior"""
+        return self.scores.get(platform) if platform in self.scores else self.scores.get(ALL_PLATFORMS, PRIOR)
+
+    def score(self, publish_time, platform: Optional[str] = None) -> float:
+        slot = hour_of_week(publish_time)
+        if slot is None:
+            return 5.0
+        return float(self.table(platform)[slot])
+
+    def observe(self, readings: Iterable[Dict[str, Any]]) -> int:
+        """Fold performance readings into the tables; returns how many were used.
+
+        A reading is a metrics sample carrying the post's platform, status,
+        posted_at and previous views/engagement. A post counts once it has
+        views, like the rebuild query; later readings replace its engagement.
+        """
+        used = 0
+        touched = set()
+        for reading in readings:
+            slot = hour_of_week(reading.get('posted_at'))
+            if reading.get('status') != 'published' or slot is None or not (reading.get('views') or 0):
+                continue
+            engagement = reading.get('engagement_rate', 0) or 0
+            if reading.get('previous_views'):
+                self._add(reading.get('platform'), slot, 0, engagement - (reading.get('previous_engagement_rate') or 0))
+            else:
+                self._add(reading.get('platform'), slot, 1, engagement)
+            touched.update((reading.get('platform') or 'unknown', ALL_PLATFORMS))
+            used += 1
+        for platform in touched:
+            self._recompute(platform)
+        return used
+
+    async def rebuild(self, db):
+        """Recount every published post with metrics, grouped server-side by platform and slot"""
+        rows = await db.post_plans.aggregate([
+            {'$match': {'status': 'published', 'posted_at': {'$ne': None}, 'views': {'$gt': 0}}},
+            {'$project': {
+                'platform': 1,
+                'engagement_rate': {'$ifNull': ['$engagement_rate', 0]},
+                'posted': {'$dateFromString': {'dateString': '$posted_at', 'onError': None}}
+            }},
+            {'$match': {'posted': {'$ne': None}}},
+            {'$group': {
+                '_id': {'platform': '$platform', 'day': {'$isoDayOfWeek': '$posted'}, 'hour': {'$hour': '$posted'}},
+                'count': {'$sum': 1},
+                'engagement': {'$sum': '$engagement_rate'}
+            }}
+        ]).to_list(None)
+
+        fresh = TimingTables(self.prior_weight, self.refresh_seconds)
+        for row in rows:
+            slot = (row['_id']['day'] - 1) * 24 + row['_id']['hour']
+            fresh._add(row['_id'].get('platform'), slot, row['count'], row['engagement'])
+        for platform in fresh.counts:
+            fresh._recompute(platform)
+
+        # Swap whole dicts so lookups never see a half-built table
+        self.counts, self.sums, self.scores = fresh.counts, fresh.sums, fresh.scores
+        self._loaded_at = time.monotonic()
+
+    async def ensure_fresh(self, db):
+        """Recount at most every refresh_seconds to pick up other processes' readings"""
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        # Stamp before awaiting so concurrent requests don't each start an aggregation
+        self._loaded_at = time.monotonic()
+        await self.rebuild(db)
+
+    def best_slots(self, platform: Optional[str], after: Optional[datetime] = None, count: int = 3,
+                   taken: Iterable[datetime] = (), horizon_hours: int = SLOTS) -> List[Dict[str, Any]]:
+        """Highest-scoring free hour starts (UTC) within the horizon, best first"""
+        start = (after or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        start = start.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        busy = {t.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0) for t in taken}
+
+        table = self.table(platform)
+        first_slot = start.weekday() * 24 + start.hour
+        slot_scores = table[(first_slot + np.arange(horizon_hours)) % SLOTS]
+        # Stable sort: equal scores keep the earlier hour
+        ranked = np.argsort(-slot_scores, kind='stable')
+
+        slots = []
+        for offset in ranked.tolist():
+            when = start + timedelta(hours=offset)
+            if when in busy:
+                continue
+            slots.append({'scheduled_time': when, 'timing_score': round(float(slot_scores[offset]), 2)})
+            if len(slots) == count:
+                break
+        return slots
+
+# Singleton instance
+timing_tables = TimingTables(
+    prior_weight=float(os.environ.get('TIMING_PRIOR_WEIGHT', '20')),
+    refresh_seconds=float(os.environ.get('TIMING_REFRESH_SECONDS', '600'))
+)
@@ -0,0 +1,26 @@
+from typing import Tuple
+from functools import lru_cache
+import os
+
+# Scripts are scored by several services (hook analysis, safety length check)
+# and often many times (batches, retries, dashboards); split each distinct
+# text once per process. Only script-sized texts are cached: the safety
+# endpoints accept transcripts of any length, which are split every time.
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+TOKEN_CACHE_MAX_CHARS = int(os.environ.get('TOKEN_CACHE_MAX_CHARS', '2000'))
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _cached_tokens(text: str) -> Tuple[str, ...]:
+    return tuple(text.split())
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Whitespace tokens of text (same as str.split), cached per distinct short text"""
+    if len(text) > TOKEN_CACHE_MAX_CHARS:
+        return tuple(text.split())
+    return _cached_tokens(text)
+
+
+def word_count(text: str) -> int:
+    return len(tokenize(text))
@@ -0,0 +1,249 @@
+from typing import Dict, List, Any, Optional
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+import httpx
+from pymongo import UpdateOne
+
+from services.minhash import MinHasher, LSHIndex, normalize
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ('youtube', 'tiktok', 'google', 'twitter')
+
+# counters document bumped after every scan that saved trends, so API processes
+# drop their dashboard snapshot even when the scan ran in a worker process
+TRENDS_COUNTER = 'trends'
+
+# Used when no source is configured, so a fresh install still gets a trend brief
+SAMPLE_TRENDS = {
+    'youtube': [{
+        'title': "AI Automation for Small Business",
+        'summary': "Trending topic about AI automation tools for entrepreneurs",
+        'tags': ["AI", "automation", "business"],
+        'audience_fit_score': 9.2,
+        'suggested_angles': ["How AI reduces burnout", "Systems that work while you sleep"]
+    }],
+    'tiktok': [{
+        'title': "Gen X Catching Up with Tech",
+        'summary': "Content about Gen X learning modern productivity tools",
+        'tags': ["tech", "productivity", "gen-x"],
+        'audience_fit_score': 8.5,
+        'suggested_angles': ["It's not too late to automate", "Tools your kids already use"]
+    }]
+}
+
+
+class TrendSource(ABC):
+    """A trend feed; subclasses implement fetch() returning raw trend dicts"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abstractmethod
+    async def fetch(self) -> List[Dict[str, Any]]:
+        """Raw trend dicts; malformed items are skipped by the scanner"""
+
+
+class StaticTrendSource(TrendSource):
+    """Fixed list of items (sample data and tests)"""
+
+    def __init__(self, name: str, items: List[Dict[str, Any]]):
+        super().__init__(name)
+        self.items = items
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        return list(self.items)
+
+
+class FixtureTrendSource(TrendSource):
+    """Reads <fixtures_dir>/<name>.json, a JSON list of trend items"""
+
+    def __init__(self, name: str, path: Path):
+        super().__init__(name)
+        self.path = Path(path)
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        text = await asyncio.to_thread(self.path.read_text)
+        return json.loads(text)
+
+
+class HttpTrendSource(TrendSource):
+    """Fetches a JSON list (or {"items": [...]}) of trend items from a URL"""
+
+    def __init__(self, name: str, url: str, timeout: float = 10.0):
+        super().__init__(name)
+        self.url = url
+        self.timeout = timeout
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        async with httpx.AsyncClient(timeout=self.timeout) as http:
+            response = await http.get(self.url)
+            response.raise_for_status()
+            data = response.json()
+            return data.get('items', []) if isinstance(data, dict) else data
+
+
+def build_sources_from_env() -> List[TrendSource]:
+    """TREND_SOURCE_<NAME>_URL selects a live feed, TREND_FIXTURES_DIR local fixtures"""
+    fixtures_dir = os.environ.get('TREND_FIXTURES_DIR')
+    sources = []
+    for name in SOURCES:
+        url = os.environ.get(f"TREND_SOURCE_{name.upper()}_URL")
+        if url:
+            sources.append(HttpTrendSource(name, url))
+        elif fixtures_dir and (Path(fixtures_dir) / f"{name}.json").exists():
+            sources.append(FixtureTrendSource(name, Path(fixtures_dir) / f"{name}.json"))
+
+    if not sources:
+        sources = [StaticTrendSource(name, items) for name, items in SAMPLE_TRENDS.items()]
+    return sources
+
+
+class TrendScanner:
+    """Fetches all sources concurrently, merges near-duplicates and upserts once"""
+
+    def __init__(self,
+                 sources: Optional[List[TrendSource]] = None,
+                 timeout_seconds: float = 20.0,
+                 similarity_threshold: float = 0.6,
+                 num_perm: int = 64):
+        self.sources = sources
+        self.timeout_seconds = timeout_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.num_perm = num_perm
+
+    async def fetch_all(self) -> List[Dict[str, Any]]:
+        """One round of concurrent fetches; sources that miss the global timeout are dropped"""
+        sources = self.sources if self.sources is not None else build_sources_from_env()
+        tasks = {asyncio.create_task(source.fetch()): source for source in sources}
+        if not tasks:
+            return []
+
+        done, pending = await asyncio.wait(tasks, timeout=self.timeout_seconds)
+        for task in pending:
+            task.cancel()
+            logger.warning(f"Trend source {tasks[task].name} timed out")
+
+        items = []
+        for task in done:
+            source = tasks[task]
+            if task.exception():
+                logger.error(f"Trend source {source.name} failed: {task.exception()}")
+                continue
+            try:
+                raws = list(task.result())
+            except TypeError as e:
+                logger.error(f"Trend source {source.name} returned a non-list payload: {e}")
+                continue
+            for raw in raws:
+                # One malformed item is skipped, not the whole scan
+                try:
+                    item = self._normalize_item(source.name, raw)
+                except (AttributeError, TypeError, ValueError) as e:
+                    logger.error(f"Trend source {source.name} sent a malformed item: {e}")
+                    continue
+                if item:
+                    items.append(item)
+        return items
+
+    def _normalize_item(self, source: str, raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        title = (raw.get('title') or '').strip()
+        if not title:
+            return None
+        return {
+            'source': raw.get('source', source),
+            'title': title,
+            'summary': raw.get('summary', ''),
+            'tags': list(raw.get('tags', [])),
+            'risk_flags': list(raw.get('risk_flags', [])),
+            'audience_fit_score': float(raw.get('audience_fit_score', 0.0)),
+            'suggested_angles': list(raw.get('suggested_angles', []))
+        }
+
+    def _text(self, item: Dict[str, Any]) -> str:
+        return f"{item['title']} {item.get('summary', '')}"
+
+    def _signature(self, item: Dict[str, Any]):
+        return self.hasher.text_signature(self._text(item))
+
+    def _fingerprint(self, item: Dict[str, Any]) -> str:
+        """Upsert key of a cluster, taken from its first member's title and summary (the text
+        LSH clusters on), so distinct trends that share a headline are not merged by the upsert"""
+        return hashlib.blake2b(normalize(self._text(item)).encode(), digest_size=8).hexdigest()
+
+    def _merge(self, kept: Dict[str, Any], duplicate: Dict[str, Any]):
+        """Fold a near-duplicate into the kept item; the better-fit item supplies the text"""
+        if duplicate['audience_fit_score'] > kept['audience_fit_score']:
+            for field in ('source', 'title', 'summary', 'audience_fit_score'):
+                kept[field] = duplicate[field]
+        for field in ('sources', 'tags', 'risk_flags', 'suggested_angles'):
+            kept[field] = list(dict.fromkeys(kept.get(field, []) + duplicate.get(field, [])))
+
+    def deduplicate(self, items: List[Dict[str, Any]],
+                    existing: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Cluster near-duplicates with MinHash LSH; items matching an existing trend reuse its fingerprint"""
+        lsh = LSHIndex(num_perm=self.num_perm)
+        kept: List[Dict[str, Any]] = []
+
+        for doc in existing or []:
+            doc = {**doc, 'sources': doc.get('sources') or [doc.get('source')], '_existing': True}
+            doc.setdefault('fingerprint', self._fingerprint(doc))
+            lsh.insert(len(kept), self._signature(doc))
+            kept.append(doc)
+
+        for item in items:
+            item = {**item, 'sources': [item['source']]}
+            signature = self._signature(item)
+            matches = lsh.query(signature, threshold=self.similarity_threshold)
+            if matches:
+                self._merge(kept[matches[0][0]], item)
+                kept[matches[0][0]]['_touched'] = True
+                continue
+            item['fingerprint'] = self._fingerprint(item)
+            item['_touched'] = True
+            lsh.insert(len(kept), signature)
+            kept.append(item)
+
+        return [doc for doc in kept if doc.get('_touched')]
+
+    async def scan(self, db) -> Dict[str, Any]:
+        """Fetch, dedupe against today's trends and bulk-upsert keyed on (date, fingerprint)"""
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        fetched, existing = await asyncio.gather(
+            self.fetch_all(),
+            db.trends.find({"date": today}, {"_id": 0}).to_list(None)
+        )
+        merged = self.deduplicate(fetched, existing)
+
+        now = datetime.now(timezone.utc).isoformat()
+        writes = []
+        for item in merged:
+            fields = {k: v for k, v in item.items()
+                      if k not in ('_existing', '_touched', 'id', 'created_at', 'date')}
+            if item.get('_existing'):
+                # Matched today's stored trend (possibly saved before fingerprints existed)
+                writes.append(UpdateOne({"id": item['id']}, {"$set": fields}))
+            else:
+                writes.append(UpdateOne(
+                    {"date": today, "fingerprint": item['fingerprint']},
+                    {"$set": fields, "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}},
+                    upsert=True
+                ))
+
+        if writes:
+            await db.trends.bulk_write(writes, ordered=False)
+            await db.counters.update_one({'name': TRENDS_COUNTER}, {'$inc': {'version': 1}}, upsert=True)
+
+        return {'fetched': len(fetched), 'saved': len(writes)}
+
+# Singleton instance
+trend_scanner = TrendScanner()
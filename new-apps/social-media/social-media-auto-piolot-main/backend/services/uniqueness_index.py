@@ -0,0 +1,144 @@
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timezone, timedelta
+import heapq
+import logging
+import os
+import time
+
+from services.minhash import MinHasher, LSHIndex, normalize
+
+logger = logging.getLogger(__name__)
+
+
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value or '')
+
+
+class UniquenessIndex:
+    """MinHash LSH over the last window_days of draft scripts and trend titles.
+
+    Keys are "video:<id>" / "trend:<id>". A query costs one signature plus the
+    LSH candidates, independent of how many scripts are indexed. Documents
+    inserted by other processes (n8n, the worker, the trend scanner) are picked
+    up by ensure_fresh, which reloads from overlap_seconds before the newest
+    created_at it has read from Mongo, so writes that commit late are not missed.
+    """
+
+    def __init__(self,
+                 window_days: float = 7.0,
+                 num_perm: int = 64,
+                 bands: int = 16,
+                 refresh_seconds: float = 30.0,
+                 overlap_seconds: float = 300.0):
+        self.window = timedelta(days=window_days)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.refresh_seconds = refresh_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.lsh = LSHIndex(num_perm=num_perm, bands=bands)
+        self._created: Dict[str, str] = {}
+        self._expiry: List[Tuple[str, str]] = []  # heap of (created_at, key)
+        # Newest created_at loaded from Mongo; local add() calls never move it
+        self._watermark = ''
+        self._loaded_at = 0.0
+
+    def add(self, key: str, text: str, created_at=None):
+        """Index (or re-index) one document's text; re-adding a document is idempotent"""
+        if not normalize(text):
+            return
+        created = _iso(created_at or datetime.now(timezone.utc))
+        self.lsh.insert(key, self.hasher.text_signature(text))
+        if self._created.get(key) != created:
+            self._created[key] = created
+            heapq.heappush(self._expiry, (created, key))
+
+    def add_script(self, draft: Dict[str, Any]):
+        self.add(f"video:{draft['id']}", draft.get('script', ''), draft.get('created_at'))
+
+    def add_trend(self, trend: Dict[str, Any]):
+        self.add(f"trend:{trend['id']}", f"{trend.get('title', '')} {trend.get('summary', '')}", trend.get('created_at'))
+
+    def evict_expired(self, now: Optional[datetime] = None) -> int:
+        """Drop documents older than the window; returns how many were removed"""
+        cutoff = ((now or datetime.now(timezone.utc)) - self.window).isoformat()
+        removed = 0
+        while self._expiry and self._expiry[0][0] < cutoff:
+            created, key = heapq.heappop(self._expiry)
+            # Stale heap entry if the key was re-indexed with a newer timestamp
+            if self._created.get(key) == created:
+                del self._created[key]
+                self.lsh.remove(key)
+                removed += 1
+        return removed
+
+    async def _load_since(self, db, since: str):
+        newest = self._watermark
+        drafts = db.video_drafts.find({'created_at': {'$gte': since}}, {'_id': 0, 'id': 1, 'script': 1, 'created_at': 1})
+        async for draft in drafts:
+            self.add_script(draft)
+            newest = max(newest, _iso(draft.get('created_at')))
+        trends = db.trends.find({'created_at': {'$gte': since}}, {'_id': 0, 'id': 1, 'title': 1, 'summary': 1, 'created_at': 1})
+        async for trend in trends:
+            self.add_trend(trend)
+            newest = max(newest, _iso(trend.get('created_at')))
+        self._watermark = newest
+
+    def _reload_from(self) -> str:
+        """Watermark minus the overlap window (the watermark itself if it is not a timestamp)"""
+        try:
+            return (datetime.fromisoformat(self._watermark) - self.overlap).isoformat()
+        except ValueError:
+            return self._watermark
+
+    async def rebuild(self, db):
+        """Reload the whole window from Mongo"""
+        fresh = UniquenessIndex(self.window.total_seconds() / 86400, self.num_perm, self.bands,
+                                self.refresh_seconds, self.overlap.total_seconds())
+        await fresh._load_since(db, (datetime.now(timezone.utc) - self.window).isoformat())
+        # Swap in one step so queries never see a half-built index
+        self.lsh, self._created, self._expiry, self._watermark = fresh.lsh, fresh._created, fresh._expiry, fresh._watermark
+        self._loaded_at = time.monotonic()
+        logger.info(f"Uniqueness index rebuilt: {len(self.lsh)} documents")
+
+    async def ensure_fresh(self, db):
+        """Pick up documents created since the last load, at most every refresh_seconds"""
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        self._loaded_at = time.monotonic()
+        if self._watermark:
+            await self._load_since(db, self._reload_from())
+        else:
+            await self.rebuild(db)
+        self.evict_expired()
+
+    def nearest(self, text: str, limit: int = 5, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most similar indexed documents: [{'kind', 'id', 'similarity'}], most similar first"""
+        if not normalize(text):
+            return []
+        matches = []
+        for key, similarity in self.lsh.query(self.hasher.text_signature(text)):
+            if key == exclude:
+                continue
+            kind, _, doc_id = key.partition(':')
+            matches.append({'kind': kind, 'id': doc_id, 'similarity': round(similarity, 3)})
+            if len(matches) == limit:
+                break
+        return matches
+
+    def uniqueness(self, text: str, exclude: Optional[str] = None, default: float = 7.0) -> float:
+        """0-10 score: 10 when nothing recent is similar, 0 for a verbatim repeat"""
+        if not normalize(text):
+            return default
+        nearest = self.nearest(text, limit=1, exclude=exclude)
+        return 10.0 * (1 - nearest[0]['similarity']) if nearest else 10.0
+
+    def __len__(self):
+        return len(self.lsh)
+
+# Singleton instance
+uniqueness_index = UniquenessIndex(
+    window_days=float(os.environ.get('UNIQUENESS_WINDOW_DAYS', '7')),
+    refresh_seconds=float(os.environ.get('UNIQUENESS_REFRESH_SECONDS', '30')),
+    overlap_seconds=float(os.environ.get('UNIQUENESS_OVERLAP_SECONDS', '300'))
+)
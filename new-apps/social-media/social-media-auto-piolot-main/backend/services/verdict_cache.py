@@ -0,0 +1,98 @@
+from typing import Dict, List, Any
+from collections import OrderedDict
+from datetime import datetime, timezone
+import hashlib
+import logging
+import os
+
+from pymongo import UpdateOne
+
+from services.safety_matcher import fold_case
+
+logger = logging.getLogger(__name__)
+
+
+class VerdictCache:
+    """Bounded in-process LRU in front of a Mongo collection of verdicts keyed by content hash + ruleset version"""
+
+    def __init__(self, collection: str, max_entries: int = 10000):
+        self.collection = collection
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def key(self, text: str, ruleset_version: str) -> str:
+        # The version is part of the key, so a rule change misses every old verdict.
+        # Case is folded the way the matcher folds it, so casing variants share a verdict;
+        # whitespace is kept because verdicts carry match offsets into the text
+        return hashlib.sha256(f"{ruleset_version}\0{fold_case(text)}".encode()).hexdigest()
+
+    def _remember(self, key: str, verdict: Dict[str, Any]):
+        self._entries[key] = verdict
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, db, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[key] = self._entries[key]
+                self.memory_hits += 1
+            else:
+                missing.append(key)
+
+        if missing and db is not None:
+            try:
+                docs = await db[self.collection].find(
+                    {'key': {'$in': missing}}, {'_id': 0, 'key': 1, 'verdict': 1}
+                ).to_list(None)
+            except Exception as e:
+                # The persistent layer is an optimization; a failed read just recomputes
+                logger.warning(f"Verdict cache read error: {str(e)}")
+                docs = []
+            for doc in docs:
+                found[doc['key']] = doc['verdict']
+                self._remember(doc['key'], doc['verdict'])
+            self.persistent_hits += len(docs)
+
+        self.misses += len(missing) - sum(1 for key in missing if key in found)
+        return found
+
+    async def put_many(self, db, verdicts: Dict[str, Dict[str, Any]], ruleset_version: str):
+        for key, verdict in verdicts.items():
+            self._remember(key, verdict)
+
+        if verdicts and db is not None:
+            now = datetime.now(timezone.utc)
+            try:
+                await db[self.collection].bulk_write([
+                    UpdateOne({'key': key},
+                              {'$setOnInsert': {'verdict': verdict, 'ruleset_version': ruleset_version,
+                                                'created_at': now}},
+                              upsert=True)
+                    for key, verdict in verdicts.items()
+                ], ordered=False)
+            except Exception as e:
+                logger.warning(f"Verdict cache write error: {str(e)}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'memory_hits': self.memory_hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else 0.0
+        }
+
+# Singleton instance
+safety_verdicts = VerdictCache('safety_verdicts', int(os.environ.get('SAFETY_CACHE_SIZE', '10000')))
@@ -0,0 +1,177 @@
+from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import uuid
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Every segment is encoded with identical stream parameters so the final
+# concat can copy packets instead of re-encoding.
+WIDTH, HEIGHT, FPS = 1080, 1920, 30
+VIDEO_CODEC_ARGS = {
+    'vcodec': 'libx264', 'pix_fmt': 'yuv420p', 'r': FPS, 'preset': 'veryfast', 'crf': 20,
+    'acodec': 'aac', 'ar': 44100, 'ac': 2, 'audio_bitrate': '128k'
+}
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# BrandSettings fields that change how a scene looks; ids/timestamps must not bust the cache
+BRAND_RENDER_FIELDS = ('primary_color', 'secondary_color', 'font_heading', 'font_body',
+                       'logo_url', 'watermark_enabled', 'caption_style')
+
+
+def scene_cache_key(scene: Dict[str, Any], brand: Dict[str, Any]) -> str:
+    """Content address of a rendered segment: the scene spec plus the brand fields it depends on"""
+    spec = {
+        'scene': scene,
+        'brand': {field: brand.get(field) for field in BRAND_RENDER_FIELDS},
+        'format': [WIDTH, HEIGHT, FPS, VIDEO_CODEC_ARGS]
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _temp_path(out_path: str) -> str:
+    """Sibling temp file, unique per process and call, so concurrent writers never share one"""
+    return f"{out_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp.mp4"
+
+
+def render_scene(scene: Dict[str, Any], brand: Dict[str, Any], out_path: str) -> str:
+    """Encode one scene to a normalized 9:16 segment (runs in a worker process)"""
+    source = scene.get('url')
+    duration = float(scene.get('duration', 3))
+    if source and source.lower().split('?')[0].endswith(IMAGE_EXTENSIONS):
+        video = ffmpeg.input(source, loop=1, t=duration).video
+    elif source:
+        video = ffmpeg.input(source, t=duration).video
+    else:
+        video = ffmpeg.input(f"color=c=black:s={WIDTH}x{HEIGHT}:r={FPS}", f='lavfi', t=duration).video
+
+    # Fill the vertical frame, cropping the overflow
+    video = (video
+             .filter('scale', WIDTH, HEIGHT, force_original_aspect_ratio='increase')
+             .filter('crop', WIDTH, HEIGHT)
+             .filter('setsar', 1))
+
+    caption = scene.get('caption') or scene.get('text')
+    if caption:
+        video = video.drawtext(
+            text=caption,
+            font=brand.get('font_body', 'Manrope'),
+            fontcolor='white',
+            fontsize=64,
+            box=1,
+            boxcolor=f"{brand.get('primary_color', '#0EA5E9')}@0.6",
+            boxborderw=24,
+            x='(w-text_w)/2',
+            y='h*0.72'
+        )
+
+    if brand.get('watermark_enabled') and brand.get('logo_url'):
+        logo = ffmpeg.input(brand['logo_url']).filter('scale', 180, -1)
+        video = ffmpeg.overlay(video, logo, x='W-w-40', y=40)
+
+    audio = ffmpeg.input('anullsrc=channel_layout=stereo:sample_rate=44100', f='lavfi', t=duration).audio
+
+    # Write to a temp file and rename so a crashed encode never leaves a truncated cache entry
+    tmp_path = _temp_path(out_path)
+    try:
+        (ffmpeg
+         .output(video, audio, tmp_path, t=duration, movflags='+faststart', **VIDEO_CODEC_ARGS)
+         .overwrite_output()
+         .run(quiet=True))
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return out_path
+
+
+def concat_segments(segment_paths: List[str], out_path: str) -> str:
+    """Join segments with the concat demuxer, copying streams (no re-encode)"""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+        for path in segment_paths:
+            listing.write(f"file '{Path(path).resolve()}'\n")
+        list_path = listing.name
+    # Two renders of one draft (e.g. a retried job) must not write the same temp file
+    tmp_path = _temp_path(out_path)
+    try:
+        (ffmpeg
+         .input(list_path, f='concat', safe=0)
+         .output(tmp_path, c='copy', movflags='+faststart')
+         .overwrite_output()
+         .run(quiet=True))
+        os.replace(tmp_path, out_path)
+    finally:
+        os.unlink(list_path)
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return out_path
+
+
+class VideoRenderer:
+    """Renders drafts scene-by-scene in a process pool with a content-addressed segment cache"""
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 output_dir: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        backend_dir = Path(__file__).parent.parent
+        self.cache_dir = Path(cache_dir or os.environ.get('RENDER_CACHE_DIR', backend_dir / 'render_cache'))
+        self.output_dir = Path(output_dir or os.environ.get('RENDER_OUTPUT_DIR', backend_dir / 'renders'))
+        self.max_workers = max_workers or int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 1))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def segment_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.mp4"
+
+    async def render_draft(self, draft: Dict[str, Any], brand: Dict[str, Any]) -> Dict[str, Any]:
+        """Render (or reuse) every scene segment concurrently, then concatenate them"""
+        scenes = draft.get('scenes') or []
+        if not scenes:
+            raise ValueError(f"Draft {draft.get('id')} has no scenes")
+
+        loop = asyncio.get_running_loop()
+        keys = [scene_cache_key(scene, brand) for scene in scenes]
+        paths = [self.segment_path(key) for key in keys]
+
+        pending = {}
+        for scene, path in zip(scenes, paths):
+            # Identical scenes within one draft are encoded once
+            if not path.exists() and str(path) not in pending:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                pending[str(path)] = loop.run_in_executor(self.pool, render_scene, scene, brand, str(path))
+
+        if pending:
+            await asyncio.gather(*pending.values())
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        out_path = self.output_dir / f"{draft['id']}.mp4"
+        await loop.run_in_executor(self.pool, concat_segments, [str(p) for p in paths], str(out_path))
+
+        return {
+            'video_path': str(out_path),
+            'scenes': len(scenes),
+            'scenes_encoded': len(pending),
+            'scenes_cached': len(scenes) - len(pending)
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+# Singleton instance
+video_renderer = VideoRenderer()
@@ -0,0 +1,182 @@
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timezone
+import hashlib
+import json
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+EVENTS_COLLECTION = 'webhook_events'
+DUPLICATE_KEY = 11000
+
+
+class WebhookBatchIngestor:
+    """Applies batches of n8n events with one unordered bulk_write per collection"""
+
+    def idempotency_key(self, event: Dict) -> str:
+        """Caller-supplied key, or a hash of the event body so exact redeliveries dedupe"""
+        if event.get('idempotency_key'):
+            return str(event['idempotency_key'])
+        body = json.dumps({'event_type': event.get('event_type'), 'payload': event.get('payload', {})},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    def build_operation(self, event_type: str, payload: Dict) -> Optional[Tuple[str, Any, UpdateOne]]:
+        """Map an event to (collection, document id, write), mirroring the single-event webhook"""
+        now = datetime.now(timezone.utc).isoformat()
+
+        if event_type == 'video_generated':
+            return 'video_drafts', payload.get('video_id'), UpdateOne(
+                {"id": payload.get('video_id')},
+                {"$set": {"status": "pending_approval", "updated_at": now}}
+            )
+
+        if event_type == 'publishing_completed':
+            return 'post_plans', payload.get('post_id'), UpdateOne(
+                {"id": payload.get('post_id')},
+                {"$set": {
+                    "status": "published",
+                    "platform_post_id": payload.get('platform_post_id'),
+                    "posted_at": now
+                }}
+            )
+
+        if event_type == 'performance_update':
+            metrics = payload.get('metrics', {})
+            return 'post_plans', payload.get('post_id'), UpdateOne(
+                {"id": payload.get('post_id')},
+                {"$set": {
+                    "views": metrics.get('views', 0),
+                    "engagement_rate": metrics.get('engagement_rate', 0),
+                    "watch_time": metrics.get('watch_time', 0)
+                }}
+            )
+
+        return None
+
+    async def _reserve_keys(self, db, keys: List[str]) -> set:
+        """Insert idempotency keys; returns the indexes that were already present"""
+        received_at = datetime.now(timezone.utc)
+        docs = [{'key': key, 'received_at': received_at} for key in keys]
+        try:
+            await db[EVENTS_COLLECTION].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            return {err['index'] for err in e.details.get('writeErrors', []) if err.get('code') == DUPLICATE_KEY}
+        return set()
+
+    async def ingest(self, db, events: List[Dict]) -> Dict[str, Any]:
+        """Dedupe, group by target collection and apply; returns per-event results in input order"""
+        results: List[Dict[str, Any]] = [{} for _ in events]
+        keys = [self.idempotency_key(event) for event in events]
+
+        # Duplicates inside the batch itself are resolved before touching the database
+        first_index: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if key in first_index:
+                results[i] = {'idempotency_key': key, 'status': 'duplicate'}
+            else:
+                first_index[key] = i
+
+        unique_indexes = list(first_index.values())
+        already_seen = await self._reserve_keys(db, [keys[i] for i in unique_indexes])
+
+        # Unordered bulk writes may apply in any order, so only the last event per
+        # (type, document) in a batch is written; earlier ones would be overwritten anyway.
+        # Each surviving write keeps its coalesced group, which shares its outcome.
+        latest: Dict[Tuple[str, Any], Tuple[str, UpdateOne, List[int]]] = {}
+        for position, i in enumerate(unique_indexes):
+            event = events[i]
+            if position in already_seen:
+                results[i] = {'idempotency_key': keys[i], 'status': 'duplicate'}
+                continue
+
+            operation = self.build_operation(event.get('event_type'), event.get('payload', {}))
+            if operation is None:
+                results[i] = {'idempotency_key': keys[i], 'status': 'ignored'}
+                continue
+
+            collection, doc_id, write = operation
+            target = (event.get('event_type'), doc_id)
+            group = latest[target][2] if target in latest else []
+            group.append(i)
+            latest[target] = (collection, write, group)
+            # Provisional until the group's write has run
+            results[i] = {'idempotency_key': keys[i], 'status': 'applied'}
+
+        grouped: Dict[str, List[Tuple[List[int], UpdateOne]]] = {}
+        for collection, write, group in latest.values():
+            grouped.setdefault(collection, []).append((group, write))
+
+        # Readings before this batch, so time-series samples can carry their growth
+        perf_indexes = [i for i in unique_indexes
+                        if results[i].get('status') == 'applied' and events[i].get('event_type') == 'performance_update']
+        previous = {}
+        if perf_indexes:
+            perf_post_ids = list({events[i].get('payload', {}).get('post_id') for i in perf_indexes})
+            projection = {'_id': 0, 'id': 1, 'platform': 1, 'views': 1, 'engagement_rate': 1, 'status': 1, 'posted_at': 1}
+            async for post in db.post_plans.find({'id': {'$in': perf_post_ids}}, projection):
+                previous[post['id']] = post
+
+        failed_keys = []
+        try:
+            for collection, entries in grouped.items():
+                try:
+                    await db[collection].bulk_write([write for _, write in entries], ordered=False)
+                except BulkWriteError as e:
+                    for err in e.details.get('writeErrors', []):
+                        for i in entries[err['index']][0]:
+                            results[i] = {'idempotency_key': keys[i], 'status': 'error', 'error': err.get('errmsg')}
+                            failed_keys.append(keys[i])
+        except Exception:
+            # Nothing is known to be applied; release every reserved key so n8n can redeliver,
+            # including events coalesced into a write that never ran
+            reserved = [keys[i] for entries in grouped.values() for group, _ in entries for i in group]
+            await db[EVENTS_COLLECTION].delete_many({'key': {'$in': reserved}})
+            raise
+
+        # Failed events must stay retryable, so release their idempotency keys
+        if failed_keys:
+            await db[EVENTS_COLLECTION].delete_many({'key': {'$in': failed_keys}})
+
+        post_ids = list({
+            events[group[-1]].get('payload', {}).get('post_id')
+            for group, _ in grouped.get('post_plans', [])
+            if results[group[-1]]['status'] == 'applied'
+        } - {None})
+
+        performance_samples = []
+        received_at = datetime.now(timezone.utc)
+        for i in perf_indexes:
+            if results[i]['status'] != 'applied':
+                continue
+            payload = events[i].get('payload', {})
+            post = previous.get(payload.get('post_id'))
+            if post is None:
+                continue
+            metrics = payload.get('metrics', {})
+            performance_samples.append({
+                'post_id': post['id'],
+                'platform': post.get('platform'),
+                'ts': received_at,
+                'views': metrics.get('views', 0),
+                'engagement_rate': metrics.get('engagement_rate', 0),
+                'watch_time': metrics.get('watch_time', 0),
+                'previous_views': post.get('views', 0),
+                # Timing tables slot the reading by when and where the post went out
+                'status': post.get('status'),
+                'posted_at': post.get('posted_at'),
+                'previous_engagement_rate': post.get('engagement_rate', 0)
+            })
+            # Chain readings for the same post inside one batch
+            post['views'] = metrics.get('views', 0)
+            post['engagement_rate'] = metrics.get('engagement_rate', 0)
+
+        counts: Dict[str, int] = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+
+        return {'results': results, 'counts': counts, 'updated_post_ids': post_ids,
+                'performance_samples': performance_samples}
+
+# Singleton instance
+webhook_ingestor = WebhookBatchIngestor()
@@ -0,0 +1,103 @@
+"""Job worker process: python worker.py
+
+Runs the heavy jobs the API enqueues (trend scans, video generation) outside
+the web workers' event loops. Start as many processes as needed; jobs are
+claimed with leases so each runs once. JOB_WORKER_CONCURRENCY sets the number
+of jobs one process runs at a time.
+"""
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import Dict, Any
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import logging
+import os
+import signal
+
+from services.job_queue import JobWorker, JobContext
+from services.trend_scanner import trend_scanner
+from services.video_renderer import video_renderer
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+# ==================== HANDLERS ====================
+
+async def scan_trends_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Scan all trend sources and upsert today's trends"""
+    await ctx.progress(10, "Fetching trend sources")
+    result = await trend_scanner.scan(ctx.db)
+    logger.info(f"Trend scan complete: {result['fetched']} fetched, {result['saved']} trends saved")
+    return result
+
+async def render_draft(db, draft: Dict[str, Any], brand: Dict[str, Any]) -> Dict[str, Any]:
+    result = await video_renderer.render_draft(draft, brand)
+    public_base = os.environ.get('RENDER_PUBLIC_BASE_URL')
+    video_url = f"{public_base.rstrip('/')}/{draft['id']}.mp4" if public_base else result['video_path']
+    await db.video_drafts.update_one(
+        {"id": draft['id']},
+        {"$set": {"video_url": video_url, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    return {**result, "video_id": draft['id'], "video_url": video_url}
+
+async def load_brand(db) -> Dict[str, Any]:
+    return await db.brand_settings.find_one({}, {"_id": 0}) or {}
+
+async def generate_videos_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Render every draft that has scenes but no video yet"""
+    logger.info("Starting video generation...")
+    brand = await load_brand(ctx.db)
+    drafts = await ctx.db.video_drafts.find(
+        {"video_url": None, "scenes.0": {"$exists": True}, "status": {"$in": ["pending_approval", "approved"]}},
+        {"_id": 0}
+    ).to_list(int(params.get('limit', 20)))
+
+    rendered = []
+    for i, draft in enumerate(drafts):
+        await ctx.progress(100 * i / len(drafts), f"Rendering {draft['id']}")
+        rendered.append(await render_draft(ctx.db, draft, brand))
+
+    logger.info(f"Video generation complete: {len(rendered)} drafts rendered")
+    return {"generated": len(rendered), "videos": rendered}
+
+async def render_video_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Re-render one draft; unchanged scenes come from the segment cache"""
+    draft = await ctx.db.video_drafts.find_one({"id": params['video_id']}, {"_id": 0})
+    if not draft:
+        raise ValueError(f"Video {params['video_id']} not found")
+    await ctx.progress(0, "Rendering scenes")
+    return await render_draft(ctx.db, draft, await load_brand(ctx.db))
+
+def register_handlers(worker: JobWorker):
+    worker.register('scan_trends', scan_trends_job)
+    worker.register('generate_videos', generate_videos_job)
+    worker.register('render_video', render_video_job)
+
+# ==================== MAIN ====================
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    worker = JobWorker(
+        client[os.environ['DB_NAME']],
+        concurrency=int(os.environ.get('JOB_WORKER_CONCURRENCY', '2')),
+        lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', '60'))
+    )
+    register_handlers(worker)
+    worker.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    await worker.stop()
+    video_renderer.shutdown()
+    client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -15,7 +15,7 @@ export default function Affiliates() {
   const fetchOffers = async () => {
     try {
       const response = await affiliatesAPI.getAll();
-      setOffers(response.data);
+      setOffers(response.data.items);
     } catch (error) {
       toast.error('Failed to load affiliates');
     } finally {
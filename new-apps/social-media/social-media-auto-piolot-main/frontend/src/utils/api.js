@@ -28,26 +28,26 @@ export const trendsAPI = {
 };
 
 export const videosAPI = {
-  getQueue: () => apiClient.get('/videos/queue'),
+  getQueue: (params) => apiClient.get('/videos/queue', { params }),
   approve: (id) => apiClient.post(`/videos/approve/${id}`),
   reject: (id) => apiClient.post(`/videos/reject/${id}`),
   generate: () => apiClient.post('/videos/generate'),
 };
 
 export const scheduleAPI = {
-  getPosts: () => apiClient.get('/schedule/posts'),
+  getPosts: (params) => apiClient.get('/schedule/posts', { params }),
   createPost: (data) => apiClient.post('/schedule/create', data),
 };
 
 export const affiliatesAPI = {
-  getAll: () => apiClient.get('/affiliates'),
+  getAll: (params) => apiClient.get('/affiliates', { params }),
   create: (data) => apiClient.post('/affiliates', data),
   update: (id, data) => apiClient.put(`/affiliates/${id}`, data),
   delete: (id) => apiClient.delete(`/affiliates/${id}`),
 };
 
 export const capabilitiesAPI = {
-  getAll: (search) => apiClient.get('/capabilities', { params: { search } }),
+  getAll: (search, params) => apiClient.get('/capabilities', { params: { search, ...params } }),
   create: (data) => apiClient.post('/capabilities', data),
 };
 
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+# Backend modules import each other as `services.*`, relative to backend/
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-benchmarks', action='store_true',
+                     help='also run the wall-clock benchmarks marked @pytest.mark.benchmark')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: wall-clock timing test, skipped unless --run-benchmarks')
+
+
+def pytest_collection_modifyitems(config, items):
+    # Timing thresholds are flaky on shared CI machines; benchmarks run on request only
+    if config.getoption('--run-benchmarks'):
+        return
+    skip = pytest.mark.skip(reason='timing benchmark; run with --run-benchmarks')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,306 @@
+"""Small in-memory stand-in for the Motor collections the services use.
+
+Supports the filter operators, update operators and cursor methods the
+backend issues; unique fields raise pymongo's DuplicateKeyError /
+BulkWriteError like a unique index would. Index DDL is recorded in
+`indexes` (index_information() format) without affecting queries.
+"""
+from typing import Dict, List, Any, Optional
+import copy
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+DUPLICATE_KEY = 11000
+
+
+def _compare(value, op: str, arg) -> bool:
+    if op == '$in':
+        return value in arg
+    if op == '$nin':
+        return value not in arg
+    if op == '$ne':
+        return value != arg
+    if op == '$exists':
+        return (value is not None) == bool(arg)
+    if value is None:
+        return False
+    if op == '$lt':
+        return value < arg
+    if op == '$lte':
+        return value <= arg
+    if op == '$gt':
+        return value > arg
+    if op == '$gte':
+        return value >= arg
+    raise NotImplementedError(op)
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == '$expr':
+            if not _evaluate(doc, condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            if not all(_compare(doc.get(key), op, arg) for op, arg in condition.items()):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [field for field, flag in projection.items() if flag and field != '_id']
+    if included:
+        return {field: doc[field] for field in included if field in doc}
+    return {field: value for field, value in doc.items() if projection.get(field, 1)}
+
+
+def _evaluate(doc: Dict[str, Any], expression):
+    """Aggregation expressions used in pipeline updates and $expr: field paths, $literal, $cond, comparisons, objects"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return doc.get(expression[1:])
+    if isinstance(expression, dict):
+        if '$literal' in expression:
+            return copy.deepcopy(expression['$literal'])
+        if '$cond' in expression:
+            condition, then, otherwise = expression['$cond']
+            return _evaluate(doc, then if _evaluate(doc, condition) else otherwise)
+        if len(expression) == 1 and next(iter(expression)) in ('$lt', '$lte', '$gt', '$gte'):
+            op, (left, right) = next(iter(expression.items()))
+            return _compare(_evaluate(doc, left), op, _evaluate(doc, right))
+        return {key: _evaluate(doc, value) for key, value in expression.items()}
+    return expression
+
+
+class Result:
+    def __init__(self, matched: int = 0, modified: int = 0, deleted: int = 0, upserted_id=None):
+        self.matched_count = matched
+        self.modified_count = modified
+        self.deleted_count = deleted
+        self.upserted_id = upserted_id
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = docs
+
+    def sort(self, keys, direction: Optional[int] = None):
+        if isinstance(keys, str):
+            keys = [(keys, direction or 1)]
+        for field, order in reversed(list(keys)):
+            self.docs.sort(key=lambda d: (d.get(field) is not None, d.get(field)), reverse=order == -1)
+        return self
+
+    def limit(self, n: int):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, unique: tuple = ()):
+        self.docs: List[Dict[str, Any]] = []
+        self.unique = unique
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        self.fail_next: Optional[Exception] = None  # raised by the next write, once
+
+    def _check_fail(self):
+        if self.fail_next is not None:
+            error, self.fail_next = self.fail_next, None
+            raise error
+
+    def _violates(self, doc: Dict[str, Any], ignore: Optional[Dict[str, Any]] = None) -> bool:
+        return any(
+            field in doc and any(other is not ignore and other.get(field) == doc[field] for other in self.docs)
+            for field in self.unique
+        )
+
+    def _apply(self, doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False):
+        if isinstance(update, list):  # pipeline update; $set stages only
+            for stage in update:
+                doc.update({field: _evaluate(doc, value) for field, value in stage['$set'].items()})
+            return
+        for field, value in update.get('$set', {}).items():
+            doc[field] = copy.deepcopy(value)
+        if inserting:
+            for field, value in update.get('$setOnInsert', {}).items():
+                doc[field] = copy.deepcopy(value)
+        for field, value in update.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + value
+        for field in update.get('$unset', {}):
+            doc.pop(field, None)
+        for field, value in update.get('$max', {}).items():
+            doc[field] = value if doc.get(field) is None else max(doc[field], value)
+        for field, value in update.get('$push', {}).items():
+            items = doc.setdefault(field, [])
+            if isinstance(value, dict) and '$each' in value:
+                items.extend(copy.deepcopy(value['$each']))
+                if '$slice' in value:
+                    doc[field] = items[value['$slice']:] if value['$slice'] < 0 else items[:value['$slice']]
+            else:
+                items.append(copy.deepcopy(value))
+
+    def _upsert_doc(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: copy.deepcopy(v) for k, v in query.items()
+                if not k.startswith('$') and not (isinstance(v, dict) and any(op.startswith('$') for op in v))}
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return {'_id_': {'key': [('_id', 1)]}, **copy.deepcopy(self.indexes)}
+
+    async def create_index(self, keys, name: str, unique: bool = False, **options):
+        fields = [field for field, _ in keys]
+        if unique:
+            seen = [tuple(doc.get(field) for field in fields) for doc in self.docs]
+            if len(seen) != len(set(seen)):
+                raise DuplicateKeyError(f'E11000 duplicate key error index: {name}', DUPLICATE_KEY)
+        self.indexes[name] = {'key': list(keys), **({'unique': True} if unique else {}), **options}
+        return name
+
+    async def drop_index(self, name: str):
+        del self.indexes[name]
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, int]] = None):
+        return FakeCursor([_project(d, projection) for d in self.docs if matches(d, query or {})])
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, int]] = None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        self._check_fail()
+        if self._violates(doc):
+            raise DuplicateKeyError('E11000 duplicate key error', DUPLICATE_KEY)
+        self.docs.append(copy.deepcopy(doc))
+        return Result()
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = True):
+        self._check_fail()
+        errors = []
+        for index, doc in enumerate(docs):
+            if self._violates(doc):
+                errors.append({'index': index, 'code': DUPLICATE_KEY, 'errmsg': 'E11000 duplicate key error'})
+                if ordered:
+                    break
+                continue
+            self.docs.append(copy.deepcopy(doc))
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+        return Result()
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        self._check_fail()
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                self._apply(doc, update)
+                return Result(matched=1, modified=int(doc != before))
+        if upsert:
+            doc = self._upsert_doc(query)
+            self._apply(doc, update, inserting=True)
+            if self._violates(doc):
+                raise DuplicateKeyError('E11000 duplicate key error', DUPLICATE_KEY)
+            self.docs.append(doc)
+            return Result(upserted_id=len(self.docs))
+        return Result()
+
+    async def find_one_and_update(self, query: Dict[str, Any], update: Dict[str, Any],
+                                  sort=None, projection=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE):
+        self._check_fail()
+        candidates = [d for d in self.docs if matches(d, query)]
+        if sort:
+            candidates = FakeCursor(candidates).sort(sort).docs
+        if candidates:
+            doc = candidates[0]
+            before = _project(doc, projection)
+            self._apply(doc, update)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+        if upsert:
+            doc = self._upsert_doc(query)
+            self._apply(doc, update, inserting=True)
+            self.docs.append(doc)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any]):
+        self._check_fail()
+        matched = [doc for doc in self.docs if matches(doc, query)]
+        for doc in matched:
+            self._apply(doc, update)
+        return Result(matched=len(matched), modified=len(matched))
+
+    async def delete_one(self, query: Dict[str, Any]):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return Result(deleted=1)
+        return Result()
+
+    async def delete_many(self, query: Dict[str, Any]):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not matches(d, query)]
+        return Result(deleted=before - len(self.docs))
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True):
+        """UpdateOne requests only, read through their public-ish attributes"""
+        self._check_fail()
+        errors = []
+        for index, request in enumerate(requests):
+            query, update, upsert = request._filter, request._doc, bool(request._upsert)
+            try:
+                await self.update_one(query, update, upsert=upsert)
+            except DuplicateKeyError:
+                errors.append({'index': index, 'code': DUPLICATE_KEY, 'errmsg': 'E11000 duplicate key error'})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+        return Result()
+
+
+class FakeDatabase(dict):
+    """db.<name> and db[<name>] both return a FakeCollection, created on first use"""
+
+    def __init__(self, unique: Optional[Dict[str, tuple]] = None):
+        super().__init__()
+        self._unique = unique or {}
+
+    def __missing__(self, name: str) -> FakeCollection:
+        collection = self[name] = FakeCollection(self._unique.get(name, ()))
+        return collection
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,65 @@
+import asyncio
+import random
+
+from services.affiliate_engine import AffiliateEngine, OfferIndex
+from tests.fake_mongo import FakeDatabase
+
+WORDS = ['ai', 'tools', 'software', 'auto', 'automation', 'saas', 'grow', 'sales', 'video', 'productivity', '', 'a']
+CATEGORIES = ['software', 'tools', 'saas', 'ai', 'business', 'marketing', 'automation', '', 'productivity']
+THEMES = ['AI automation', 'business growth', 'productivity hacks', 'random', 'Marketing']
+
+
+def random_offer(rng: random.Random, i: int):
+    return {
+        'id': f"o{i}",
+        'category': rng.choice(CATEGORIES),
+        'keywords': rng.sample(WORDS, rng.randint(0, 4)),
+        'commission': rng.choice(['15%', '30%', '$20', '0', '200%', '12.5%', '']),
+        'epc': rng.choice([0, 1.234, 5, 12]),
+        'reputation_score': rng.choice([5.0, 7.5, 10, 3.21]),
+        'enabled': rng.random() < 0.9
+    }
+
+
+def reference_selection(engine, offers, theme, script, k):
+    """The original scoring: every enabled offer scored, stable sort, top k"""
+    scored = [{**offer, 'relevance_score': engine._calculate_offer_score(offer, theme, script)}
+              for offer in offers if offer.get('enabled', True)]
+    scored.sort(key=lambda offer: offer['relevance_score'], reverse=True)
+    return scored[:k]
+
+
+def test_indexed_selection_matches_full_scoring():
+    rng = random.Random(3)
+    engine = AffiliateEngine()
+    for _ in range(1000):
+        offers = [random_offer(rng, i) for i in range(rng.randint(1, 40))]
+        theme = rng.choice(THEMES)
+        script = ' '.join(rng.choices(WORDS, k=rng.randint(0, 15)))
+        k = rng.randint(1, 6)
+
+        selected = OfferIndex(offers).select(theme, script, k)
+
+        expected = reference_selection(engine, offers, theme, script, k)
+        assert [(o['id'], o['relevance_score']) for o in selected] == \
+               [(o['id'], o['relevance_score']) for o in expected]
+
+
+def test_edits_through_another_worker_reach_this_index():
+    async def run():
+        db = FakeDatabase()
+        db.affiliate_offers.docs.append({'id': 'o1', 'category': 'software', 'keywords': ['ai'],
+                                         'commission': '20%', 'enabled': True})
+        this_worker = AffiliateEngine(refresh_seconds=0)
+        other_worker = AffiliateEngine(refresh_seconds=0)
+        await this_worker.load_offers(db)
+        assert [o['id'] for o in await this_worker.select_offers_for_content('AI', 'ai')] == ['o1']
+
+        # Same document count, different content: only the catalog version reveals it
+        db.affiliate_offers.docs[0]['enabled'] = False
+        await other_worker.catalog_changed(db)
+
+        await this_worker.ensure_fresh(db)
+        assert await this_worker.select_offers_for_content('AI', 'ai') == []
+
+    asyncio.run(run())
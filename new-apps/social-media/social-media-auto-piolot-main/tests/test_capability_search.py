@@ -0,0 +1,18 @@
+from services.capability_search import CapabilitySearchIndex
+
+
+def test_highlights_escape_stored_markup():
+    index = CapabilitySearchIndex()
+    index.build([{
+        'id': 'c1',
+        'name': 'Auto <b>reply</b>',
+        'tags': ['<script>reply</script>', 'other'],
+        'problem_solved': 'Replies to "comments" & DMs'
+    }])
+
+    hits, _ = index.search('reply')
+
+    highlights = hits[0]['highlights']
+    assert highlights['name'] == 'Auto &lt;b&gt;<mark>reply</mark>&lt;/b&gt;'
+    assert highlights['tags'] == '<mark>&lt;script&gt;reply&lt;/script&gt;</mark>'
+    assert '<b>' not in str(highlights) and '<script>' not in str(highlights)
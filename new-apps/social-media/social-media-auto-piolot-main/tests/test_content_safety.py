@@ -0,0 +1,97 @@
+import asyncio
+import random
+import re
+
+from services.content_safety import ContentSafetyChecker
+
+VOCAB = [
+    'hello', 'world', 'Fuck', 'shit', 'damn', 'hello', 'hellish', 'crap', 'class', 'ass', 'Explicit', 'NSFW',
+    '18+', '18+x', 'politics', 'geopolitics', 'Religion', 'medical_claims', 'financial_advice', 'link',
+    'linked', 'Commission', 'disclosure', 'guarantee', 'guaranteed', 'guarantees', 'promise', 'CURE', 'cured',
+    'make $100', 'make  $5', 'make $', 'tips', 'today', 'video', 'the', 'and', 'a', 'product'
+]
+
+PROFANITY = [r'\b(fuck|shit|damn|hell|crap|ass)\b', r'\b(explicit|nsfw|18\+)\b']
+TOPICS = ['politics', 'religion', 'medical_claims', 'financial_advice']
+CLAIMS = [r'\bguarantee\b', r'\bpromise\b', r'\bguaranteed\b', r'\bcure\b', r'\bmake\s+\$\d+\b']
+
+
+def reference_check(script: str):
+    """check_script as it was before the rules moved into compiled rule packs"""
+    score, flags, warnings = 10.0, [], []
+    for pattern in PROFANITY:
+        if re.search(pattern, script, re.IGNORECASE):
+            score -= 2.0
+            flags.append('profanity_detected')
+            warnings.append(f'Profanity pattern matched: {pattern}')
+    script_lower = script.lower()
+    for topic in TOPICS:
+        if topic in script_lower:
+            score -= 1.0
+            warnings.append(f'Sensitive topic detected: {topic}')
+    if ('link' in script_lower or 'commission' in script_lower) and 'disclosure' not in script_lower:
+        score -= 3.0
+        flags.append('missing_ftc_disclosure')
+        warnings.append('Affiliate content missing FTC disclosure')
+    word_count = len(script.split())
+    if word_count < 40 or word_count > 120:
+        score -= 1.0
+        warnings.append(f'Word count outside optimal range: {word_count}')
+    for pattern in CLAIMS:
+        if re.search(pattern, script, re.IGNORECASE):
+            score -= 2.0
+            flags.append('unrealistic_claim')
+            warnings.append(f'Potential unrealistic claim: {pattern}')
+    status = 'approved' if score >= 9.0 else 'review' if score >= 6.0 else 'rejected'
+    return {'score': max(0, score), 'status': status, 'flags': flags, 'warnings': warnings}
+
+
+def random_script(rng: random.Random) -> str:
+    words = rng.choices(VOCAB, k=rng.randint(0, 140))
+    separators = [' ', ' ', ' ', ', ', '. ', '\n', '!']
+    return ''.join(word + rng.choice(separators) for word in words)
+
+
+def test_compiled_rules_match_the_original_checks():
+    checker = ContentSafetyChecker()
+    rng = random.Random(12)
+
+    for _ in range(1000):
+        script = random_script(rng)
+        verdict = asyncio.run(checker.check_script(script))
+        expected = reference_check(script)
+        assert {key: verdict[key] for key in expected} == expected, script
+
+
+async def _chunks(text: str, rng: random.Random):
+    position = 0
+    while position < len(text):
+        size = rng.choice([0, 1, 3, 17, 64, 500])
+        yield text[position:position + size]
+        position += size
+
+
+async def _scan(checker, text: str, rng: random.Random):
+    return [event async for event in checker.scan_stream(_chunks(text, rng))]
+
+
+def test_stream_scan_matches_whole_text_scan_at_any_chunking():
+    checker = ContentSafetyChecker()
+    pack = checker.rule_packs.current
+    rng = random.Random(16)
+
+    for _ in range(200):
+        # Long enough to span many chunks and several overlap windows
+        text = ''.join(random_script(rng) for _ in range(rng.randint(1, 6)))
+        events = asyncio.run(_scan(checker, text, rng))
+        matches, summary = events[:-1], events[-1]
+
+        expected = pack.matcher.scan(text)
+        assert [(m['rule_id'], m['start'], m['end']) for m in matches] == \
+               [(m['rule_id'], m['start'], m['end']) for m in expected]
+
+        whole = checker._score(pack, {m['rule_id'] for m in expected}, None)
+        assert summary['type'] == 'summary'
+        assert (summary['score'], summary['flags'], summary['warnings']) == (whole['score'], whole['flags'], whole['warnings'])
+        assert summary['word_count'] == len(text.split())
+        assert summary['characters'] == len(text)
@@ -0,0 +1,67 @@
+import asyncio
+
+from services.index_manager import IndexManager
+from tests.fake_mongo import FakeDatabase
+
+REGISTRY = {
+    'users': [
+        {'name': 'email_unique', 'keys': [('email', 1)], 'unique': True},
+    ],
+    'jobs': [
+        {'name': 'status_run_at', 'keys': [('status', 1), ('run_at', 1)]},
+        {'name': 'dedupe_key_active_unique', 'keys': [('dedupe_key', 1)], 'unique': True,
+         'partial_filter': {'active': True}},
+    ],
+}
+
+
+def _reconcile(db, registry=REGISTRY, **kwargs):
+    return asyncio.run(IndexManager(registry=registry, query_shapes=[]).reconcile(db, **kwargs))
+
+
+def test_missing_indexes_are_created_then_left_alone():
+    db = FakeDatabase()
+
+    first = _reconcile(db)
+    second = _reconcile(db)
+
+    assert sorted(first['created']) == ['jobs.dedupe_key_active_unique', 'jobs.status_run_at', 'users.email_unique']
+    assert db.jobs.indexes['dedupe_key_active_unique']['partialFilterExpression'] == {'active': True}
+    assert second == {'created': [], 'rebuilt': [], 'unknown': [], 'dropped': [], 'failed': []}
+
+
+def test_changed_spec_is_rebuilt():
+    db = FakeDatabase()
+    _reconcile(db)
+    changed = {**REGISTRY, 'jobs': [{'name': 'status_run_at', 'keys': [('status', 1), ('run_at', -1)]},
+                                    REGISTRY['jobs'][1]]}
+
+    report = _reconcile(db, changed)
+
+    assert report['rebuilt'] == ['jobs.status_run_at']
+    assert db.jobs.indexes['status_run_at']['key'] == [('status', 1), ('run_at', -1)]
+
+
+def test_unknown_indexes_are_reported_not_dropped_by_default():
+    db = FakeDatabase()
+    _reconcile(db)
+    db.users.indexes['legacy_name'] = {'key': [('name', 1)]}
+
+    report = _reconcile(db)
+
+    assert report['unknown'] == ['users.legacy_name'] and report['dropped'] == []
+    assert 'legacy_name' in db.users.indexes
+    assert _reconcile(db, drop_unknown=True)['dropped'] == ['users.legacy_name']
+    assert 'legacy_name' not in db.users.indexes
+
+
+def test_duplicate_rows_skip_the_unique_index_without_aborting():
+    db = FakeDatabase()
+    db.users.docs = [{'email': 'a@example.com'}, {'email': 'a@example.com'}]
+
+    report = _reconcile(db)
+
+    assert report['failed'] == ['users.email_unique']
+    assert 'email_unique' not in db.users.indexes
+    # The rest of the registry is still reconciled
+    assert sorted(report['created']) == ['jobs.dedupe_key_active_unique', 'jobs.status_run_at']
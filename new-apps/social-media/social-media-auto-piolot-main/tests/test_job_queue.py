@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from services.job_queue import JobQueue, JobWorker, JOBS_COLLECTION
+from tests.fake_mongo import FakeDatabase
+
+
+def _expired(job_id: str, attempts: int, max_attempts: int = 3):
+    past = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    return {'id': job_id, 'type': 'scan', 'status': 'running', 'active': True, 'attempts': attempts,
+            'max_attempts': max_attempts, 'run_at': past, 'lease_owner': 'dead-worker', 'lease_expires_at': past}
+
+
+async def _noop(ctx, params):
+    return None
+
+
+def test_expired_lease_on_the_last_attempt_fails_instead_of_rerunning():
+    db = FakeDatabase()
+    worker = JobWorker(db, owner='w1')
+    worker.register('scan', _noop)
+    db[JOBS_COLLECTION].docs = [_expired('spent', attempts=3), _expired('retry', attempts=1)]
+
+    async def run():
+        first, second = await worker.claim(), await worker.claim()
+        return first, second, await worker.fail_expired()
+
+    first, second, failed = asyncio.run(run())
+
+    assert first['id'] == 'retry' and first['attempts'] == 2 and first['lease_owner'] == 'w1'
+    assert second is None
+    assert failed == 1
+    spent = db[JOBS_COLLECTION].docs[0]
+    assert (spent['status'], spent['active']) == ('failed', False)
+    assert 'lease_owner' not in spent
+
+
+def test_lost_lease_cancels_the_handler_without_finishing_the_job():
+    db = FakeDatabase()
+    worker = JobWorker(db, lease_seconds=0.03, owner='w1')
+    cancelled = asyncio.Event()
+
+    async def slow(ctx, params):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    worker.register('scan', slow)
+
+    async def run():
+        await JobQueue().enqueue(db, 'scan')
+        job = await worker.claim()
+        # Another worker reclaims the job while this one is still running it
+        db[JOBS_COLLECTION].docs[0]['lease_owner'] = 'w2'
+        await asyncio.wait_for(worker.run_job(job), timeout=1)
+
+    asyncio.run(run())
+
+    assert cancelled.is_set()
+    job = db[JOBS_COLLECTION].docs[0]
+    assert (job['status'], job['lease_owner']) == ('running', 'w2')
+
+
+def test_heartbeat_survives_a_failed_write():
+    db = FakeDatabase()
+    worker = JobWorker(db, lease_seconds=0.03, owner='w1')
+
+    async def steady(ctx, params):
+        await asyncio.sleep(0.1)
+        return 'ok'
+
+    worker.register('scan', steady)
+
+    async def run():
+        await JobQueue().enqueue(db, 'scan')
+        job = await worker.claim()
+        # The first heartbeat write raises; later beats and the finish still go through
+        db[JOBS_COLLECTION].fail_next = RuntimeError('connection reset')
+        await worker.run_job(job)
+
+    asyncio.run(run())
+
+    job = db[JOBS_COLLECTION].docs[0]
+    assert (job['status'], job['result']) == ('succeeded', 'ok')
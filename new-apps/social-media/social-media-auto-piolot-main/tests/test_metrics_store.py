@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from pymongo.errors import BulkWriteError
+
+from services.metrics_store import MetricsStore, POST_METRICS
+from tests.fake_mongo import DUPLICATE_KEY, FakeCollection, FakeDatabase
+
+T0 = datetime(2026, 10, 17, 12, 5, tzinfo=timezone.utc)
+
+
+def reading(minutes: int, views: int, previous_views: int):
+    return {'post_id': 'p1', 'platform': 'tiktok', 'ts': T0 + timedelta(minutes=minutes),
+            'views': views, 'engagement_rate': 2.0, 'previous_views': previous_views}
+
+
+class RacingCollection(FakeCollection):
+    """First bulk_write loses the race to create the first bucket: E11000 for write 0, the rest applied"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls.append((len(requests), ordered))
+        if len(self.calls) == 1:
+            await super().bulk_write(requests[1:], ordered)
+            raise BulkWriteError({'writeErrors': [{'index': 0, 'code': DUPLICATE_KEY, 'errmsg': 'E11000'}]})
+        return await super().bulk_write(requests, ordered)
+
+
+def test_readings_for_one_bucket_merge_in_arrival_order():
+    async def run():
+        db = FakeDatabase()
+        await MetricsStore().record_many(db, [reading(0, 100, 0), reading(10, 250, 100), reading(20, 240, 250)])
+
+        hour = next(d for d in db[POST_METRICS].docs if d['resolution'] == 'hour')
+        assert hour['count'] == 3
+        assert hour['first_views'] == 100 and hour['last_views'] == 240 and hour['max_views'] == 250
+        assert hour['views_delta'] == 250
+        assert [s['views'] for s in hour['samples']] == [100, 250, 240]
+        assert len(db[POST_METRICS].docs) == 2  # one hour and one day bucket
+
+    asyncio.run(run())
+
+
+def test_duplicate_key_upserts_are_retried_unordered():
+    async def run():
+        db = FakeDatabase()
+        db[POST_METRICS] = RacingCollection()
+        await MetricsStore().record_many(db, [reading(0, 100, 0)])
+
+        assert db[POST_METRICS].calls == [(2, False), (1, False)]
+        assert {d['resolution'] for d in db[POST_METRICS].docs} == {'hour', 'day'}
+
+    asyncio.run(run())
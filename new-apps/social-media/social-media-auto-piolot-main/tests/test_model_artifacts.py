@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from services.model_artifacts import ModelArtifact, ModelRegistry, artifact_path
+from services.timing_tables import SLOTS
+from services.viral_predictor import FEATURES, ViralPredictor
+
+CANDIDATES = [
+    {'id': f"c{i}", 'script': f"what if you never had to post manually again, tip number {i}",
+     'trend_score': 4.0 + i % 6, 'audience_fit_score': 9.0 - i % 5, 'platform': 'tiktok',
+     'publish_time': f"2026-03-0{i % 7 + 2}T{8 + i % 12:02d}:00:00+00:00"}
+    for i in range(40)
+]
+
+
+def _weights(**overrides):
+    return {**ViralPredictor().weights, **overrides}
+
+
+def _timing(seed: int):
+    rng = np.random.default_rng(seed)
+    return {'tiktok': rng.uniform(0, 10, SLOTS), 'youtube': rng.uniform(0, 10, SLOTS)}
+
+
+def _registry(tmp_path) -> ModelRegistry:
+    return ModelRegistry(model_dir=tmp_path, predictor=ViralPredictor(), check_interval=0)
+
+
+def test_publish_load_round_trip(tmp_path):
+    registry = _registry(tmp_path)
+    weights, timing = _weights(trend_score=0.4, uniqueness=0.01), _timing(1)
+    calibration = {'base_views': 8000.0, 'center': 4.5, 'scale': 1.5}
+
+    version = registry.publish(weights, timing, calibration=calibration, metadata={'samples': 12})
+    artifact = ModelArtifact(artifact_path(tmp_path, version))
+
+    assert version == 1
+    assert artifact.weights == pytest.approx(weights)
+    assert artifact.calibration == calibration
+    assert sorted(artifact.timing.scores) == ['tiktok', 'youtube']
+    for platform, table in timing.items():
+        np.testing.assert_array_equal(artifact.timing.scores[platform], table)
+    assert artifact.metadata == {'samples': 12}
+
+
+def test_publish_never_overwrites_a_version_claimed_concurrently(tmp_path):
+    registry = _registry(tmp_path)
+    registry.publish(_weights(), _timing(1))
+    # A second publisher that listed the directory before v1 appeared
+    registry.versions = lambda: []
+
+    version = registry.publish(_weights(trend_score=0.5), _timing(2))
+
+    assert version == 2
+    assert ModelArtifact(artifact_path(tmp_path, 1)).weights['trend_score'] == pytest.approx(0.25)
+    assert ModelArtifact(artifact_path(tmp_path, 2)).weights['trend_score'] == pytest.approx(0.5)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['viral-000001.model', 'viral-000002.model']
+
+
+def test_refresh_picks_up_a_new_live_pointer(tmp_path):
+    publisher, server = _registry(tmp_path), _registry(tmp_path)
+    publisher.publish(_weights(trend_score=0.3), _timing(1), role='live')
+
+    assert server.refresh()
+    assert server.predictor.model_version == 1
+    assert not server.refresh()  # pointers unchanged: nothing reloaded
+
+    publisher.publish(_weights(trend_score=0.6), _timing(2), role='live')
+    server.ensure_fresh()
+
+    assert server.live.version == 2
+    assert server.predictor.weights['trend_score'] == pytest.approx(0.6)
+    np.testing.assert_array_equal(server.predictor.timing_tables.scores['tiktok'], _timing(2)['tiktok'])
+
+
+def test_shadow_score_records_deltas_against_live(tmp_path):
+    registry = _registry(tmp_path)
+    registry.publish(_weights(), _timing(1), role='live')
+    registry.publish(_weights(trend_score=0.45, audience_fit=0.05), _timing(1), role='shadow')
+
+    live = registry.predictor.predict_batch(CANDIDATES)
+    factors = live['factors']
+    reused = {'hook_quality': factors[:, FEATURES.index('hook_quality')].tolist(),
+              'uniqueness': factors[:, FEATURES.index('uniqueness')].tolist()}
+    registry.shadow_score(CANDIDATES, live['viral_score'].tolist(), reused)
+
+    expected = registry.shadow_predictor.predict_batch(CANDIDATES)['viral_score'] - live['viral_score']
+    stats = registry.shadow_stats.summary()
+    assert stats['scored'] == len(CANDIDATES)
+    assert stats['mean_delta'] == pytest.approx(expected.mean(), abs=1e-4)
+    assert stats['max_abs_delta'] == pytest.approx(np.abs(expected).max(), abs=1e-4)
+    assert stats['mean_delta'] != 0.0
@@ -0,0 +1,135 @@
+import asyncio
+import math
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from services.online_trainer import OnlineWeightTrainer, FIXED_FEATURES, MODEL_STATE
+from services.viral_predictor import FEATURES, ViralPredictor
+from tests.fake_mongo import FakeDatabase, Result
+
+SCRIPT = 'what if you never had to post manually again, here is the secret tool I use every day'
+
+
+def _trainer(**kwargs) -> OnlineWeightTrainer:
+    return OnlineWeightTrainer(predictor=ViralPredictor(), **kwargs)
+
+
+def _posted(db, post_id: str, hours_ago: float, **fields):
+    posted_at = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+    db.post_plans.docs.append({'id': post_id, 'video_draft_id': f"d-{post_id}", 'platform': 'tiktok',
+                               'status': 'published', 'posted_at': posted_at.isoformat(), **fields})
+    db.video_drafts.docs.append({'id': f"d-{post_id}", 'script': SCRIPT})
+
+
+@pytest.mark.parametrize('score', [1.5, 5.0, 8.25])
+def test_target_inverts_the_view_projection(score):
+    trainer = _trainer()
+    calibration = trainer.predictor.calibration
+    views = calibration['base_views'] * math.exp((score - calibration['center']) / calibration['scale'])
+
+    assert trainer.target(views) == pytest.approx(score)
+    assert trainer.target(0) == 0.0
+    assert trainer.target(1e12) == 10.0
+
+
+def test_nlms_step_closes_the_error_and_keeps_fixed_weights():
+    trainer = _trainer(learning_rate=1.0)
+    weights = dict(trainer.weights)
+    features = {'trend_score': 8.0, 'audience_fit': 3.0, 'hook_quality': 6.5, 'visual_appeal': 7.0,
+                'timing': 9.0, 'platform_algorithm': 6.5, 'uniqueness': 7.0}
+
+    updated = trainer.step(weights, features, target=9.0)
+
+    assert sum(features[name] * updated[name] for name in FEATURES) == pytest.approx(9.0)
+    for name in FIXED_FEATURES:
+        assert updated[name] == weights[name]
+
+    # Unobserved inputs are not learned either; weights never go negative
+    partial = trainer.step(weights, features, target=0.0, learned=['hook_quality', 'timing'])
+    assert {name for name in FEATURES if partial[name] != weights[name]} == {'hook_quality', 'timing'}
+    assert min(partial.values()) >= 0.0
+
+
+def test_cas_conflict_is_retried_on_the_latest_version():
+    db = FakeDatabase()
+    first, second = _trainer(), _trainer()
+    features = dict(first.weights)
+    sample = (features, 9.0, ['hook_quality', 'timing'])
+
+    async def run():
+        await first.load(db)
+        await second.load(db)
+        assert await first.apply(db, [sample])
+        # second still holds version 0: its first write misses, it re-reads and applies on top
+        assert await second.apply(db, [sample])
+        return await db[MODEL_STATE].find_one({'name': 'viral_predictor'})
+
+    state = asyncio.run(run())
+
+    expected = first.step(first.step(dict(_trainer().weights), *sample), *sample)
+    assert state['version'] == 2 and state['samples'] == 2
+    assert state['weights'] == pytest.approx(expected)
+    assert second.version == 2
+
+
+def test_min_age_and_retrain_interval_gate_training():
+    db = FakeDatabase()
+    trainer = _trainer(min_age_hours=24, retrain_interval_hours=24)
+    _posted(db, 'young', hours_ago=2)
+    _posted(db, 'old', hours_ago=30)
+    readings = [{'post_id': 'young', 'views': 4000}, {'post_id': 'old', 'views': 9000}]
+
+    async def run():
+        await trainer.load(db)
+        first = await trainer.observe(db, readings)
+        again = await trainer.observe(db, readings)
+        # A day later the same post is due again
+        old = next(p for p in db.post_plans.docs if p['id'] == 'old')
+        old['viral_trained_at'] = (datetime.now(timezone.utc) - timedelta(hours=25)).isoformat()
+        later = await trainer.observe(db, readings)
+        return first, again, later
+
+    assert asyncio.run(run()) == (1, 0, 1)
+    young = next(p for p in db.post_plans.docs if p['id'] == 'young')
+    assert 'viral_trained_at' not in young
+
+
+def test_failed_apply_releases_the_claims():
+    db = FakeDatabase()
+    trainer = _trainer(min_age_hours=1)
+    _posted(db, 'p1', hours_ago=30)
+    _posted(db, 'p2', hours_ago=30, viral_trained_at=(datetime.now(timezone.utc) - timedelta(days=3)).isoformat())
+    previous = db.post_plans.docs[1]['viral_trained_at']
+
+    async def always_conflicts(*args, **kwargs):
+        return Result()
+
+    async def run():
+        await trainer.load(db)
+        db[MODEL_STATE].update_one = always_conflicts
+        return await trainer.observe(db, [{'post_id': 'p1', 'views': 100}, {'post_id': 'p2', 'views': 100}])
+
+    assert asyncio.run(run()) == 0
+    assert 'viral_trained_at' not in db.post_plans.docs[0]
+    assert db.post_plans.docs[1]['viral_trained_at'] == previous
+
+
+def test_training_uses_the_features_the_draft_was_scored_with():
+    db = FakeDatabase()
+    trainer = _trainer(min_age_hours=1)
+    _posted(db, 'p1', hours_ago=30)
+
+    async def run():
+        await trainer.load(db)
+        await trainer.record_features(db, {'id': 'd-p1', 'script': SCRIPT, 'trend_score': 9.5})
+        await trainer.observe(db, [{'post_id': 'p1', 'views': 50000}])
+
+    asyncio.run(run())
+
+    post = db.post_plans.docs[0]
+    assert post['viral_features']['trend_score'] == 9.5
+    assert 'trend_score' in post['viral_observed'] and 'audience_fit' not in post['viral_observed']
+    # audience_fit was a default (5.0) for this draft, so its weight didn't move
+    assert trainer.weights['audience_fit'] == _trainer().weights['audience_fit']
+    assert trainer.weights['trend_score'] != _trainer().weights['trend_score']
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from services.pagination import paginate, encode_cursor, decode_cursor, InvalidCursorError
+from tests.fake_mongo import FakeCollection
+
+
+def _walk(collection, sort_field, direction, limit):
+    async def run():
+        pages, cursor = [], None
+        while True:
+            page = await paginate(collection, {}, sort_field, direction=direction, cursor=cursor, limit=limit)
+            pages.append([row['id'] for row in page['items']])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return pages
+    return asyncio.run(run())
+
+
+def _jobs():
+    collection = FakeCollection()
+    # Many rows share a created_at so page boundaries fall inside runs of ties
+    collection.docs = [{'id': f'job-{i:03d}', 'created_at': f'2026-01-0{i % 3 + 1}'} for i in range(40)]
+    return collection
+
+
+def test_ties_are_neither_skipped_nor_repeated():
+    collection = _jobs()
+    pages = _walk(collection, 'created_at', -1, limit=7)
+
+    seen = [doc_id for page in pages for doc_id in page]
+    expected = [d['id'] for d in sorted(collection.docs, key=lambda d: (d['created_at'], d['id']), reverse=True)]
+    assert seen == expected
+    assert all(len(page) == 7 for page in pages[:-1])
+
+
+def test_id_sorted_pages_cover_every_row_once():
+    collection = _jobs()
+    pages = _walk(collection, 'id', 1, limit=9)
+
+    assert [doc_id for page in pages for doc_id in page] == sorted(d['id'] for d in collection.docs)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('2026-01-02T00:00:00+00:00', 'job-007')
+    assert decode_cursor(cursor) == ('2026-01-02T00:00:00+00:00', 'job-007')
+    assert '=' not in cursor
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', encode_cursor('x', 'y')[:-3], 'WzEsMl0'])
+def test_foreign_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
@@ -0,0 +1,79 @@
+import asyncio
+
+from services.performance_rollups import PerformanceRollups, ROLLUP_COLLECTION, SUMMARY_COLLECTION, SUMMARY_ID
+from tests.fake_mongo import FakeDatabase
+
+
+class CountingRollups(PerformanceRollups):
+    """Counts rankings instead of running the top-decile aggregation"""
+
+    def __init__(self, rank_seconds: float):
+        super().__init__(rank_seconds)
+        self.rankings = 0
+
+    async def rank(self, db):
+        self.rankings += 1
+
+
+def _row(post_id: str, views: int, engagement_rate: float = 1.0, eligible: bool = True):
+    return {'post_id': post_id, 'views': views, 'engagement_rate': engagement_rate,
+            'theme': 'tech', 'eligible': eligible}
+
+
+def test_totals_follow_row_changes_without_rescanning():
+    db = FakeDatabase()
+    rollups = CountingRollups(rank_seconds=3600)
+    rows = db[ROLLUP_COLLECTION]
+    rows.docs = [_row('a', 100, 2.0), _row('b', 300, 4.0), _row('c', 50, eligible=False)]
+
+    async def run():
+        await rollups._count(db, ['a', 'b', 'c'])
+        first = await rollups.summarize(db)
+
+        # New metrics for a, b becomes ineligible, c becomes eligible
+        rows.docs[0]['views'] = 500
+        rows.docs[1]['eligible'] = False
+        rows.docs[2]['eligible'] = True
+        await rollups._count(db, ['a', 'b', 'c', 'missing'])
+        second = await rollups.summarize(db)
+
+        # Counting the same state again changes nothing
+        await rollups._count(db, ['a', 'b', 'c'])
+        return first, second, await rollups.summarize(db)
+
+    first, second, third = asyncio.run(run())
+
+    assert (first['total'], first['avg_views'], first['avg_engagement_rate']) == (2, 200, 3.0)
+    assert (second['total'], second['avg_views'], second['avg_engagement_rate']) == (2, 275, 1.5)
+    assert third == second
+
+
+def test_concurrent_refreshes_of_one_post_count_once():
+    db = FakeDatabase()
+    rollups = CountingRollups(rank_seconds=3600)
+    db[ROLLUP_COLLECTION].docs = [_row('a', 100)]
+
+    async def run():
+        await rollups._count(db, ['a'])
+        db[ROLLUP_COLLECTION].docs[0]['views'] = 700
+        await asyncio.gather(*(rollups._count(db, ['a']) for _ in range(10)))
+        return await db[SUMMARY_COLLECTION].find_one({'_id': SUMMARY_ID})
+
+    summary = asyncio.run(run())
+
+    assert (summary['total'], summary['views_sum']) == (1, 700)
+
+
+def test_burst_of_refreshes_ranks_once_per_interval():
+    db = FakeDatabase()
+    rollups = CountingRollups(rank_seconds=3600)
+    db[ROLLUP_COLLECTION].docs = [_row(f"p{i}", i) for i in range(50)]
+
+    async def run():
+        await asyncio.gather(*(rollups._count(db, [f"p{i}"]) for i in range(50)))
+        return await rollups.summarize(db)
+
+    summary = asyncio.run(run())
+
+    assert rollups.rankings == 1
+    assert summary['total'] == 50 and summary['avg_views'] == sum(range(50)) / 50
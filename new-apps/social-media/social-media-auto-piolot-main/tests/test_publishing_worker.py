@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from services.publishing_worker import PublishingWorker
+from tests.fake_mongo import FakeDatabase
+
+T0 = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+class RecordingPublisher:
+    """Fake platform honouring idempotency keys, like HttpPlatformPublisher's backends"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.posts = {}
+
+    async def publish(self, plan):
+        self.calls.append(plan['id'])
+        # The platform accepts the post before the (possibly slow) response arrives
+        post_id = self.posts.setdefault(plan['id'], f"post-{len(self.posts) + 1}")
+        await asyncio.sleep(self.delay)
+        return post_id
+
+
+def worker_at(db, publisher, owner: str, now: datetime, **kwargs) -> PublishingWorker:
+    worker = PublishingWorker(db, publisher, owner=owner, lease_seconds=60, **kwargs)
+    worker._now = lambda: now
+    return worker
+
+
+def scheduled_plan(db):
+    db.post_plans.docs.append({'id': 'p1', 'platform': 'tiktok', 'status': 'scheduled',
+                               'scheduled_time': (T0 - timedelta(minutes=1)).isoformat()})
+
+
+def test_expired_lease_is_reclaimed_and_stale_owner_is_fenced():
+    async def run():
+        db = FakeDatabase()
+        scheduled_plan(db)
+        publisher = RecordingPublisher()
+        crashed = worker_at(db, publisher, 'a', T0)
+        rescuer = worker_at(db, publisher, 'b', T0 + timedelta(seconds=61))
+
+        first = await crashed.claim('tiktok')
+        assert first['lease_owner'] == 'a'
+        # Lease still live: nobody else can take it
+        assert await worker_at(db, publisher, 'c', T0 + timedelta(seconds=30)).claim('tiktok') is None
+
+        second = await rescuer.claim('tiktok')
+        assert second['lease_owner'] == 'b' and second['publish_attempts'] == 2
+
+        # _publish releases the concurrency slot _run_platform took for it
+        rescuer.semaphores['tiktok'] = asyncio.Semaphore(0)
+        await rescuer._publish('tiktok', second)
+        # The crashed worker finishing late cannot overwrite the new owner's result
+        assert await crashed._complete(first, 'late-post') is False
+
+        plan = db.post_plans.docs[0]
+        assert plan['status'] == 'published' and plan['platform_post_id'] == 'post-1'
+        assert 'lease_owner' not in plan
+
+    asyncio.run(run())
+
+
+def test_publish_timeout_must_be_shorter_than_lease():
+    with pytest.raises(ValueError):
+        PublishingWorker(FakeDatabase(), RecordingPublisher(), lease_seconds=60, publish_timeout_seconds=60)
+    assert PublishingWorker(FakeDatabase(), RecordingPublisher(), lease_seconds=60).publish_timeout_seconds == 30
+
+
+def test_timed_out_publish_is_retried_with_the_same_plan_id():
+    async def run():
+        db = FakeDatabase()
+        scheduled_plan(db)
+        publisher = RecordingPublisher(delay=0.05)
+        worker = worker_at(db, publisher, 'a', T0, publish_timeout_seconds=0.01, retry_backoff_seconds=0)
+        worker.semaphores['tiktok'] = asyncio.Semaphore(0)
+
+        plan = await worker.claim('tiktok')
+        await worker._publish('tiktok', plan)
+        assert db.post_plans.docs[0]['status'] == 'publishing'  # waiting for retry
+
+        publisher.delay = 0
+        worker._now = lambda: T0 + timedelta(seconds=1)
+        retry = await worker.claim('tiktok')
+        await worker._publish('tiktok', retry)
+
+        # Both attempts carried the same key, so the platform kept a single post
+        assert publisher.calls == ['p1', 'p1']
+        assert len(publisher.posts) == 1
+        assert db.post_plans.docs[0]['status'] == 'published'
+
+    asyncio.run(run())
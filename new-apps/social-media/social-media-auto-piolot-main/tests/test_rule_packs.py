@@ -0,0 +1,40 @@
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from services import rule_packs
+from services.rule_packs import RulePackStore
+
+RULES_DIR = Path(__file__).resolve().parent.parent / 'backend' / 'rules' / 'safety'
+
+
+def test_due_reload_runs_off_the_calling_thread(tmp_path, monkeypatch):
+    for path in RULES_DIR.glob('*.yaml'):
+        shutil.copy(path, tmp_path / path.name)
+    store = RulePackStore(tmp_path, check_interval=0)
+    old_pack = store._pack
+
+    compiling = threading.Event()
+    release = threading.Event()
+    real_load = rule_packs.load_rule_pack
+
+    def slow_load(rules_dir):
+        compiling.set()
+        release.wait(5)
+        return real_load(rules_dir)
+
+    monkeypatch.setattr(rule_packs, 'load_rule_pack', slow_load)
+    pack_file = sorted(tmp_path.glob('*.yaml'))[0]
+    pack_file.write_text(pack_file.read_text() + '\n# edited\n')
+
+    # The request path returns the old pack immediately while the recompile is blocked
+    assert store.current is old_pack
+    assert compiling.wait(5)
+    assert store.current is old_pack
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while store._pack is old_pack and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.current is not old_pack
@@ -0,0 +1,69 @@
+import asyncio
+
+from services.short_codes import ShortCodeAllocator, encode_base62, decode_base62
+from tests.fake_mongo import FakeDatabase
+
+
+class CountingDatabase(FakeDatabase):
+    """Counts the block reservations made on the counters collection"""
+
+    def __init__(self):
+        super().__init__()
+        self.reservations = 0
+        counters = self['counters']
+        reserve = counters.find_one_and_update
+
+        async def counted(*args, **kwargs):
+            self.reservations += 1
+            return await reserve(*args, **kwargs)
+
+        counters.find_one_and_update = counted
+
+
+def test_codes_come_from_one_reservation_per_block():
+    db = CountingDatabase()
+    allocator = ShortCodeAllocator(name='links', block_size=10, min_length=4)
+
+    async def run():
+        return [await allocator.next_code(db) for _ in range(25)]
+
+    codes = asyncio.run(run())
+
+    assert codes == [encode_base62(n, 4) for n in range(25)]
+    assert db.reservations == 3
+    assert allocator.remaining == 5
+
+
+def test_bulk_request_reserves_what_it_needs_in_one_round_trip():
+    db = CountingDatabase()
+    allocator = ShortCodeAllocator(name='links', block_size=10)
+
+    async def run():
+        first = await allocator.allocate(db, 4)
+        bulk = await allocator.allocate(db, 50)
+        return first, bulk
+
+    first, bulk = asyncio.run(run())
+
+    # 6 left from the first block, then exactly the 44 still missing
+    assert [decode_base62(code) for code in first + bulk] == list(range(54))
+    assert db.reservations == 2
+    assert allocator.remaining == 0
+
+
+def test_processes_sharing_a_counter_never_collide():
+    db = CountingDatabase()
+    allocators = [ShortCodeAllocator(name='links', block_size=7) for _ in range(3)]
+
+    async def worker(allocator):
+        codes = []
+        for size in (1, 3, 9, 2):
+            codes.extend(await allocator.allocate(db, size))
+        return codes
+
+    async def run():
+        return await asyncio.gather(*(worker(allocator) for allocator in allocators * 2))
+
+    codes = [code for batch in asyncio.run(run()) for code in batch]
+
+    assert len(codes) == len(set(codes)) == 6 * 15
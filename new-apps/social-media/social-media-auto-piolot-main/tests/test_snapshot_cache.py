@@ -0,0 +1,80 @@
+import asyncio
+
+from services.snapshot_cache import SnapshotCache
+
+
+def test_version_bump_from_another_process_drops_the_snapshot():
+    loads, version = [], {'value': 0}
+
+    async def loader():
+        loads.append(version['value'])
+        return {'trends': version['value']}
+
+    async def read_version():
+        return version['value']
+
+    cache = SnapshotCache(loader, ttl_seconds=3600, version=read_version)
+
+    async def run():
+        first = await cache.get()
+        cached = await cache.get()
+        version['value'] = 1  # e.g. a worker's trend scan bumped the counter
+        return first, cached, await cache.get()
+
+    assert asyncio.run(run()) == ({'trends': 0}, {'trends': 0}, {'trends': 1})
+    assert loads == [0, 1]
+
+
+def _counting_loader(delay: float = 0.0):
+    calls = []
+
+    async def loader():
+        calls.append(len(calls))
+        await asyncio.sleep(delay)
+        return {'load': len(calls)}
+
+    return loader, calls
+
+
+def test_snapshot_is_reused_until_the_ttl_expires():
+    loader, calls = _counting_loader()
+    cache = SnapshotCache(loader, ttl_seconds=0.05)
+
+    async def run():
+        first, second = await cache.get(), await cache.get()
+        await asyncio.sleep(0.08)
+        return first, second, await cache.get()
+
+    assert asyncio.run(run()) == ({'load': 1}, {'load': 1}, {'load': 2})
+    assert len(calls) == 2
+
+
+def test_invalidate_during_a_load_keeps_its_result_out_of_the_cache():
+    loader, calls = _counting_loader(delay=0.05)
+    cache = SnapshotCache(loader, ttl_seconds=3600)
+
+    async def run():
+        in_flight = asyncio.create_task(cache.get())
+        await asyncio.sleep(0.01)
+        cache.invalidate()  # a write lands while the snapshot is being built
+        stale = await in_flight
+        return stale, await cache.get()
+
+    stale, fresh = asyncio.run(run())
+
+    # The caller that started the load still gets its result, but it is not stored
+    assert stale == {'load': 1} and fresh == {'load': 2}
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    loader, calls = _counting_loader(delay=0.02)
+    cache = SnapshotCache(loader, ttl_seconds=3600)
+
+    async def run():
+        return await asyncio.gather(*(cache.get() for _ in range(20)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert results == [{'load': 1}] * 20
@@ -0,0 +1,33 @@
+import asyncio
+
+from services.timing_tables import TimingTables
+
+
+class CountingPostPlans:
+    def __init__(self):
+        self.aggregations = 0
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+
+        class Cursor:
+            async def to_list(self, length=None):
+                await asyncio.sleep(0.01)
+                return []
+
+        return Cursor()
+
+
+class Db:
+    def __init__(self):
+        self.post_plans = CountingPostPlans()
+
+
+def test_concurrent_requests_share_one_refresh():
+    async def run():
+        db, tables = Db(), TimingTables(refresh_seconds=600)
+        await asyncio.gather(*[tables.ensure_fresh(db) for _ in range(20)])
+        await tables.ensure_fresh(db)
+        return db.post_plans.aggregations
+
+    assert asyncio.run(run()) == 1
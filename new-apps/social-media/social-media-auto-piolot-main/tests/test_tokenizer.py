@@ -0,0 +1,13 @@
+from services.tokenizer import TOKEN_CACHE_MAX_CHARS, _cached_tokens, tokenize, word_count
+
+
+def test_long_texts_are_tokenized_but_not_cached():
+    _cached_tokens.cache_clear()
+    short = 'what if you never had to post manually again'
+    long = 'word ' * (TOKEN_CACHE_MAX_CHARS // 5 + 10)
+
+    assert tokenize(short) == tuple(short.split())
+    assert word_count(long) == len(long.split())
+    assert tokenize(long) == tuple(long.split())
+
+    assert _cached_tokens.cache_info().currsize == 1
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from services.trend_scanner import StaticTrendSource, TrendScanner, TrendSource
+
+
+def test_fetch_all_skips_malformed_items_and_sources():
+    good = {'title': 'AI tools for creators', 'summary': 'x', 'tags': ['ai'], 'audience_fit_score': 8}
+    scanner = TrendScanner(sources=[
+        StaticTrendSource('youtube', [
+            good,
+            {'title': 'Null fit', 'audience_fit_score': None},
+            {'title': 42},
+            {'title': 'Bad tags', 'tags': 7},
+            'not a dict',
+        ]),
+        StaticTrendSource('tiktok', [{'title': 'Gen X tech', 'audience_fit_score': '7.5'}]),
+    ])
+
+    items = asyncio.run(scanner.fetch_all())
+
+    assert sorted(item['title'] for item in items) == ['AI tools for creators', 'Gen X tech']
+    assert {item['source'] for item in items} == {'youtube', 'tiktok'}
+
+
+def test_trend_source_requires_fetch():
+    class Incomplete(TrendSource):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete('youtube')
+
+
+def test_same_headline_with_different_stories_keeps_both():
+    scanner = TrendScanner(sources=[])
+    items = [
+        {'source': 'youtube', 'title': 'Apple event', 'summary': 'New iPhone cameras and a thinner chassis revealed',
+         'tags': [], 'risk_flags': [], 'audience_fit_score': 6.0, 'suggested_angles': []},
+        {'source': 'tiktok', 'title': 'Apple event', 'summary': 'Orchard festival in Vermont draws record crowds',
+         'tags': [], 'risk_flags': [], 'audience_fit_score': 5.0, 'suggested_angles': []},
+    ]
+
+    merged = scanner.deduplicate(items)
+
+    assert len(merged) == 2
+    assert merged[0]['fingerprint'] != merged[1]['fingerprint']
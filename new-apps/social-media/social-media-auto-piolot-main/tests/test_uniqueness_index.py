@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from services.uniqueness_index import UniquenessIndex
+from tests.fake_mongo import FakeDatabase
+
+SCRIPT = ('Stop posting by hand. Here is the exact system I use to schedule a month of short videos '
+          'in one afternoon, with captions, hashtags and links filled in automatically.')
+NEAR_DUPLICATE = SCRIPT.replace('one afternoon', 'a single afternoon')
+UNRELATED = 'Three cheap houseplants that survive a dark apartment and almost no watering at all.'
+
+
+def _ago(**delta) -> str:
+    return (datetime.now(timezone.utc) - timedelta(**delta)).isoformat()
+
+
+def test_near_duplicate_is_found_and_scores_low():
+    index = UniquenessIndex()
+    index.add_script({'id': 'v1', 'script': SCRIPT})
+    index.add_trend({'id': 't1', 'title': 'Houseplants for dark rooms', 'summary': 'Low light plants'})
+
+    nearest = index.nearest(NEAR_DUPLICATE)
+
+    assert nearest[0]['kind'] == 'video' and nearest[0]['id'] == 'v1'
+    assert nearest[0]['similarity'] > 0.6
+    assert index.uniqueness(NEAR_DUPLICATE) < 4.0
+    assert index.uniqueness(UNRELATED) == 10.0
+
+
+def test_exclude_skips_the_document_being_scored():
+    index = UniquenessIndex()
+    index.add_script({'id': 'v1', 'script': SCRIPT})
+    index.add_script({'id': 'v2', 'script': NEAR_DUPLICATE})
+
+    assert [m['id'] for m in index.nearest(SCRIPT, exclude='video:v1')] == ['v2']
+    assert index.uniqueness(SCRIPT, exclude='video:v1') > 0.0
+    assert index.uniqueness(SCRIPT) == 0.0
+
+
+def test_documents_leave_the_window():
+    index = UniquenessIndex(window_days=7)
+    index.add_script({'id': 'old', 'script': SCRIPT, 'created_at': _ago(days=8)})
+    index.add_script({'id': 'new', 'script': UNRELATED, 'created_at': _ago(days=1)})
+    # Re-indexing refreshes the timestamp; the stale heap entry must not evict it
+    index.add_script({'id': 'new', 'script': UNRELATED, 'created_at': _ago(hours=1)})
+
+    assert index.evict_expired() == 1
+    assert index.nearest(SCRIPT) == []
+    assert [m['id'] for m in index.nearest(UNRELATED)] == ['new']
+
+
+def test_late_commits_inside_the_overlap_are_still_loaded():
+    db = FakeDatabase()
+    index = UniquenessIndex(refresh_seconds=0, overlap_seconds=300)
+    db.video_drafts.docs.append({'id': 'v1', 'script': SCRIPT, 'created_at': _ago(minutes=1)})
+
+    async def run():
+        await index.ensure_fresh(db)
+        # A local add with a newer timestamp must not move the Mongo watermark
+        index.add_script({'id': 'local', 'script': 'a freshly generated script about morning routines'})
+        # Another process commits a draft stamped before the newest one already loaded
+        db.video_drafts.docs.append({'id': 'v2', 'script': UNRELATED, 'created_at': _ago(minutes=3)})
+        await index.ensure_fresh(db)
+
+    asyncio.run(run())
+
+    assert [m['id'] for m in index.nearest(UNRELATED)] == ['v2']
+    assert len(index) == 3
@@ -0,0 +1,76 @@
+import asyncio
+import random
+
+from services.content_safety import content_safety
+from services.verdict_cache import VerdictCache
+from tests.fake_mongo import FakeDatabase
+from tests.test_content_safety import random_script
+
+
+def _recase(text: str, rng: random.Random) -> str:
+    """Randomly uppercase characters that have a one-character uppercase form"""
+    return ''.join(ch.upper() if rng.random() < 0.5 and len(ch.upper()) == 1 else ch for ch in text)
+
+
+def test_casing_variants_share_a_key_and_a_verdict():
+    cache = VerdictCache('safety_verdicts')
+    rng = random.Random(14)
+
+    for _ in range(300):
+        script = random_script(rng) + rng.choice(['', ' İstanbul', ' ẞtraße KELVIN'])
+        variant = _recase(script, rng)
+        original, recased = content_safety.verdict(script), content_safety.verdict(variant)
+        original.pop('timestamp'), recased.pop('timestamp')
+
+        assert cache.key(script, 'v1') == cache.key(variant, 'v1')
+        assert recased == original, variant
+    # Whitespace is significant: the cached match offsets depend on it
+    assert cache.key('buy  now', 'v1') != cache.key('buy now', 'v1')
+
+
+def test_counters_track_memory_persistent_hits_and_misses():
+    db = FakeDatabase()
+    cache = VerdictCache('safety_verdicts')
+    stored = cache.key('stored elsewhere', 'v1')
+    db.safety_verdicts.docs.append({'key': stored, 'verdict': {'score': 8.0}})
+
+    async def run():
+        await cache.put_many(db, {cache.key('fresh', 'v1'): {'score': 10.0}}, 'v1')
+        return await cache.get_many(db, [cache.key('fresh', 'v1'), stored, cache.key('unknown', 'v1')])
+
+    found = asyncio.run(run())
+
+    assert set(found) == {cache.key('fresh', 'v1'), stored}
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['persistent_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['hit_rate'] == round(2 / 3, 4)
+    # Persistent hits are promoted into memory
+    asyncio.run(cache.get_many(None, [stored]))
+    assert cache.stats()['memory_hits'] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerdictCache('safety_verdicts', max_entries=2)
+
+    async def run():
+        await cache.put_many(None, {'a': {'score': 1}, 'b': {'score': 2}}, 'v1')
+        await cache.get_many(None, ['a'])  # a is now the most recent
+        await cache.put_many(None, {'c': {'score': 3}}, 'v1')
+        return await cache.get_many(None, ['a', 'b', 'c'])
+
+    assert set(asyncio.run(run())) == {'a', 'c'}
+    assert cache.stats()['entries'] == 2
+
+
+def test_ruleset_version_change_misses_old_verdicts():
+    db = FakeDatabase()
+    cache = VerdictCache('safety_verdicts')
+    script = 'this tool is guaranteed to work'
+
+    async def run():
+        await cache.put_many(db, {cache.key(script, 'v1'): {'score': 8.0}}, 'v1')
+        return await cache.get_many(db, [cache.key(script, 'v2')])
+
+    assert asyncio.run(run()) == {}
+    assert cache.key(script, 'v1') != cache.key(script, 'v2')
+    assert cache.stats()['misses'] == 1
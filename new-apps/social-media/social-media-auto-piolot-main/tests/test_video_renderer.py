@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from services import video_renderer as renderer_module
+from services.video_renderer import VideoRenderer, scene_cache_key
+
+BRAND = {'id': 'b1', 'primary_color': '#0EA5E9', 'font_body': 'Manrope', 'caption_style': 'bold',
+         'updated_at': '2026-01-01T00:00:00+00:00'}
+SCENES = [{'url': 'https://cdn.example/a.png', 'duration': 3, 'caption': 'Stop posting by hand'},
+          {'url': 'https://cdn.example/b.mp4', 'duration': 4, 'caption': 'Let the system do it'},
+          {'duration': 2, 'caption': 'Link in bio'}]
+
+
+def test_caption_edit_changes_only_that_scenes_key():
+    keys = [scene_cache_key(scene, BRAND) for scene in SCENES]
+    edited = [dict(scene) for scene in SCENES]
+    edited[1]['caption'] = 'Let the machine do it'
+
+    changed = [a != b for a, b in zip(keys, (scene_cache_key(scene, BRAND) for scene in edited))]
+
+    assert changed == [False, True, False]
+
+
+def test_brand_render_field_changes_every_key_but_bookkeeping_does_not():
+    keys = [scene_cache_key(scene, BRAND) for scene in SCENES]
+    recolored = {**BRAND, 'primary_color': '#F97316'}
+    touched = {**BRAND, 'id': 'b2', 'updated_at': '2026-02-01T00:00:00+00:00'}
+
+    assert all(a != b for a, b in zip(keys, (scene_cache_key(scene, recolored) for scene in SCENES)))
+    assert keys == [scene_cache_key(scene, touched) for scene in SCENES]
+
+
+def test_rerender_encodes_only_changed_segments(tmp_path, monkeypatch):
+    encoded = []
+
+    def fake_render(scene, brand, out_path):
+        encoded.append(scene['caption'])
+        with open(out_path, 'wb') as f:
+            f.write(b'segment')
+        return out_path
+
+    def fake_concat(segment_paths, out_path):
+        with open(out_path, 'w') as f:
+            f.write('\n'.join(segment_paths))
+        return out_path
+
+    monkeypatch.setattr(renderer_module, 'render_scene', fake_render)
+    monkeypatch.setattr(renderer_module, 'concat_segments', fake_concat)
+    renderer = VideoRenderer(cache_dir=str(tmp_path / 'cache'), output_dir=str(tmp_path / 'out'))
+    renderer._pool = ThreadPoolExecutor(max_workers=2)
+
+    edited = [dict(scene) for scene in SCENES]
+    edited[2]['caption'] = 'Link in my bio'
+
+    async def run():
+        first = await renderer.render_draft({'id': 'd1', 'scenes': SCENES}, BRAND)
+        second = await renderer.render_draft({'id': 'd1', 'scenes': edited}, BRAND)
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        renderer.shutdown()
+
+    assert (first['scenes_encoded'], first['scenes_cached']) == (3, 0)
+    assert (second['scenes_encoded'], second['scenes_cached']) == (1, 2)
+    assert sorted(encoded[:3]) == sorted(scene['caption'] for scene in SCENES)
+    assert encoded[3:] == ['Link in my bio']
@@ -0,0 +1,129 @@
+import asyncio
+import random
+
+import pytest
+
+from services.hook_analyzer import HookAnalyzer
+from services.viral_predictor import PerformanceAccumulator, ViralPredictor, _benchmark
+
+WORDS = ("you your what if imagine never always secret truth why how this changed hey guys "
+         "in this video today i welcome to the a automation business tools sleep").split()
+
+
+def random_candidates(rng: random.Random, n: int):
+    candidates = []
+    for i in range(n):
+        candidate = {
+            'id': f"v{i}",
+            'trend_score': rng.choice([rng.uniform(0, 10), None]),
+            'audience_fit_score': rng.uniform(0, 10),
+            'script': rng.choice([' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 40))), '']),
+            'publish_time': rng.choice([f"2026-10-{rng.randint(10, 16)}T{rng.randint(0, 23):02d}:00:00Z",
+                                        'not a date', None]),
+            'platform': rng.choice(['tiktok', 'youtube', None]),
+            'historical_data_points': rng.randint(0, 50)
+        }
+        candidates.append(candidate)
+    return candidates
+
+
+def test_predict_batch_matches_scalar():
+    rng = random.Random(7)
+    predictor = ViralPredictor()
+    candidates = random_candidates(rng, 500)
+
+    result = predictor.batch_to_json(predictor.predict_batch(candidates))
+
+    for i, candidate in enumerate(candidates):
+        scalar_input = {k: v for k, v in candidate.items() if v is not None}
+        expected = asyncio.run(predictor.predict_viral_score(scalar_input))
+        assert result['ids'][i] == candidate['id']
+        assert result['viral_score'][i] == expected['viral_score']
+        assert result['confidence'][i] == expected['confidence']
+        assert result['predicted_views']['mid'][i] == expected['predicted_views']['mid']
+        assert result['recommendation'][i] == expected['recommendation']
+        for name, value in expected['factors'].items():
+            assert result['factors'][name][i] == value, name
+
+
+def test_predict_batch_repeated_scripts_use_memo():
+    predictor = ViralPredictor()
+    columns = {'script': ['what if you never sleep again and this changed everything for me'] * 3}
+
+    first = predictor.predict_batch(columns)['factors'][:, 2].tolist()
+    second = predictor.predict_batch(columns)['factors'][:, 2].tolist()
+
+    assert first == second
+    assert len(predictor.hook_analyzer._cache) >= 1
+
+
+def test_score_many_matches_score_on_new_scripts():
+    rng = random.Random(17)
+    analyzer = HookAnalyzer.from_file()
+    # Words and separators the whole-array pass must either get right or leave to score()
+    words = WORDS + ['YOU', 'Why', 'WHAT-if', 'héllo', 'x\x00y', 'a' * 120]
+    separators = [' ', ' ', ' ', '  ', '\n', '\t', ' \x1e', '\x01']
+    scripts = [''.join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randint(0, 25)))
+               .lstrip(rng.choice(['', ' ', 'x'])) for _ in range(3000)]
+    scripts += ['', ' ', 'you ' * 9, 'you ' * 10, 'you ' * 9 + 'you', None]
+
+    scores = analyzer.score_many(scripts).tolist()
+
+    assert scores == [analyzer.score(script) for script in scripts]
+    assert analyzer.score_many(scripts).tolist() == scores  # memoized
+
+
+@pytest.mark.benchmark
+def test_predict_batch_speedup_on_10k_candidates():
+    timings = _benchmark(10000)
+
+    assert timings['scalar'] / timings['batch'] >= 50
+    assert timings['scalar'] / timings['batch_cold'] >= 4
+
+
+def reference_summary(rows):
+    """analyze_performance_trends' aggregation as it was before streaming: full sort, slice the decile"""
+    if not rows:
+        return {'total': 0, 'avg_views': 0, 'avg_engagement_rate': 0, 'top_n': 0, 'theme_counts': []}
+    top = sorted(rows, key=lambda row: row.get('views', 0), reverse=True)[:max(1, len(rows) // 10)]
+    themes = {}
+    for row in top:
+        themes[row.get('theme', 'unknown')] = themes.get(row.get('theme', 'unknown'), 0) + 1
+    return {
+        'total': len(rows),
+        'avg_views': sum(row.get('views', 0) for row in rows) / len(rows),
+        'avg_engagement_rate': sum(row.get('engagement_rate', 0) for row in rows) / len(rows),
+        'top_n': len(top),
+        'theme_counts': list(themes.items())
+    }
+
+
+async def _stream(rows):
+    for row in rows:
+        yield row
+
+
+@pytest.mark.parametrize('size', [0, 1, 9, 10, 11, 57, 400])
+def test_accumulator_matches_the_materialized_analysis(size):
+    rng = random.Random(size)
+    # Few distinct view counts, so the decile boundary regularly falls inside a run of ties
+    rows = [{'views': rng.choice([100, 250, 250, 900, 4000]), 'engagement_rate': rng.uniform(0, 12),
+             'theme': rng.choice(['tech', 'business', 'productivity', 'ai'])} for _ in range(size)]
+    if size:
+        rows[0].pop('theme')  # falls back to 'unknown'
+    expected = reference_summary(rows)
+
+    for top_n in (max(1, size // 10), None):
+        accumulator = PerformanceAccumulator(top_n=top_n)
+        for row in rows:
+            accumulator.add(row)
+        summary = accumulator.summary()
+        assert summary['avg_views'] == pytest.approx(expected['avg_views'])
+        assert summary['avg_engagement_rate'] == pytest.approx(expected['avg_engagement_rate'])
+        assert {key: summary[key] for key in ('total', 'top_n', 'theme_counts')} == \
+               {key: expected[key] for key in ('total', 'top_n', 'theme_counts')}
+
+    predictor = ViralPredictor()
+    from_list = asyncio.run(predictor.analyze_performance_trends(rows))
+    from_cursor = asyncio.run(predictor.analyze_performance_trends(_stream(rows), total=size))
+    assert from_list == from_cursor == predictor.summarize_performance_rollup(expected)
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from services.webhook_ingest import WebhookBatchIngestor
+from tests.fake_mongo import FakeDatabase
+
+
+def performance(post_id: str, views: int, key: str):
+    return {'event_type': 'performance_update', 'idempotency_key': key,
+            'payload': {'post_id': post_id, 'metrics': {'views': views, 'engagement_rate': 1.0}}}
+
+
+def new_db():
+    db = FakeDatabase(unique={'webhook_events': ('key',)})
+    db.post_plans.docs.append({'id': 'p1', 'platform': 'tiktok', 'status': 'published', 'views': 0})
+    return db
+
+
+def statuses(report):
+    return [result['status'] for result in report['results']]
+
+
+def test_redelivered_batch_is_not_applied_twice():
+    async def run():
+        db, ingestor = new_db(), WebhookBatchIngestor()
+        batch = [performance('p1', 10, 'k1'), performance('p1', 20, 'k2'), performance('p1', 20, 'k2')]
+
+        first = await ingestor.ingest(db, batch)
+        db.post_plans.docs[0]['views'] = 999  # changed since; a redelivery must not overwrite it
+        second = await ingestor.ingest(db, batch)
+
+        assert statuses(first) == ['applied', 'applied', 'duplicate']
+        assert statuses(second) == ['duplicate', 'duplicate', 'duplicate']
+        assert db.post_plans.docs[0]['views'] == 999
+
+    asyncio.run(run())
+
+
+def test_failed_write_fails_and_releases_its_whole_coalesced_group():
+    async def run():
+        db, ingestor = new_db(), WebhookBatchIngestor()
+        batch = [performance('p1', 10, 'k1'), performance('p1', 20, 'k2')]
+        db.post_plans.fail_next = BulkWriteError({'writeErrors': [{'index': 0, 'code': 2, 'errmsg': 'boom'}]})
+
+        failed = await ingestor.ingest(db, batch)
+        retried = await ingestor.ingest(db, batch)
+
+        assert statuses(failed) == ['error', 'error']
+        assert statuses(retried) == ['applied', 'applied']
+        assert db.post_plans.docs[0]['views'] == 20
+
+    asyncio.run(run())
+
+
+def test_unexpected_error_releases_keys_of_coalesced_events():
+    async def run():
+        db, ingestor = new_db(), WebhookBatchIngestor()
+        batch = [performance('p1', 10, 'k1'), performance('p1', 20, 'k2')]
+        db.post_plans.fail_next = RuntimeError('connection reset')
+
+        with pytest.raises(RuntimeError):
+            await ingestor.ingest(db, batch)
+        retried = await ingestor.ingest(db, batch)
+
+        assert db.webhook_events.docs and statuses(retried) == ['applied', 'applied']
+        assert db.post_plans.docs[0]['views'] == 20
+
+    asyncio.run(run())